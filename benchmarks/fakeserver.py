@@ -0,0 +1,334 @@
+# coding: utf-8
+"""
+A local stand-in for the SciELO Manager API, for benchmarking purposes.
+
+It mimics the behaviour of the Tastypie resources the client relies on:
+
+* ``GET /api/v1/`` lists the endpoints.
+* ``GET /api/v1/<endpoint>/?limit=&offset=`` pages over the items, with
+  `meta.total_count` and `meta.next`.
+* ``GET /api/v1/<endpoint>/<id>/`` gets an item.
+* ``GET /api/v1/<endpoint>/set/<id>;<id>/`` gets many items at once.
+* ``POST /api/v1/<endpoint>/`` creates an item, returning its `Location`.
+* ``PATCH /api/v1/<endpoint>/`` creates items in bulk, returning them.
+
+Latency, payload size and the rate of ``503 Service Unavailable`` responses
+are configurable. Items are generated deterministically from their ids, so
+the server holds no state other than created items counters.
+
+Usage::
+
+    $ python -m benchmarks.fakeserver --port 8000 --latency 0.05 --error-rate 0.01
+"""
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import multiprocessing
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+except ImportError:  # python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+
+
+API_PREFIX = '/api/v1/'
+ENDPOINTS = ('collections', 'journals', 'issues', 'sections', 'sponsors',
+             'uselicenses', 'pressreleases')
+MAX_LIMIT = 1000
+
+DETAIL_PATH = re.compile(r'^/api/v1/(\w+)/(\d+)/$')
+SET_PATH = re.compile(r'^/api/v1/(\w+)/set/([\d;]+)/$')
+LIST_PATH = re.compile(r'^/api/v1/(\w+)/$')
+
+
+class Dataset(object):
+    """
+    Generates the items served by the fake server.
+
+    :param counts: a mapping of endpoint names to the number of items.
+    :param payload_size: approximate size, in bytes, of the padding added to each item.
+    """
+    def __init__(self, counts, payload_size=0):
+        self.counts = counts
+        self.payload_size = payload_size
+        self._padding = 'x' * payload_size
+
+    def uri(self, endpoint, resource_id):
+        return '%s%s/%s/' % (API_PREFIX, endpoint, resource_id)
+
+    def item(self, endpoint, resource_id):
+        if not 1 <= resource_id <= self.counts.get(endpoint, 0):
+            return None
+
+        item = {
+            'id': resource_id,
+            'resource_uri': self.uri(endpoint, resource_id),
+            'title': u'%s %s' % (endpoint, resource_id),
+            'is_trashed': resource_id % 97 == 0,
+            'updated': '2014-02-10T10:00:00',
+            'padding': self._padding,
+        }
+
+        # relations, to exercise `Client.fetch_relations`.
+        if endpoint == 'issues':
+            item['journal'] = self.uri('journals', self._related_id('journals', resource_id))
+            item['sections'] = [self.uri('sections', self._related_id('sections', resource_id + i))
+                                for i in range(3)]
+        elif endpoint == 'journals':
+            item['collections'] = self.uri('collections', self._related_id('collections', resource_id))
+            item['use_license'] = self.uri('uselicenses', self._related_id('uselicenses', resource_id))
+
+        return item
+
+    def _related_id(self, endpoint, seed):
+        return (seed % max(self.counts.get(endpoint, 1), 1)) + 1
+
+
+class FakeManagerHandler(BaseHTTPRequestHandler):
+    """
+    Handles requests as the SciELO Manager API does.
+    """
+    protocol_version = 'HTTP/1.1'
+    # responses are written at once, to keep delayed ACKs from
+    # stalling kept-alive connections.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, data=None, headers=None):
+        body = json.dumps(data).encode('utf-8') if data is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length).decode('utf-8')) if length else None
+
+    def _simulate(self):
+        """
+        Applies the configured latency and error injection.
+
+        :returns: `True` if the request must fail with 503.
+        """
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+
+        with server.lock:
+            server.requests_count += 1
+            return server.random.random() < server.error_rate
+
+    def do_GET(self):
+        if self._simulate():
+            return self._send_json(503)
+
+        url = urlparse(self.path)
+        dataset = self.server.dataset
+
+        if url.path == API_PREFIX:
+            return self._send_json(200, dict(
+                (ep, {'list_endpoint': '%s%s/' % (API_PREFIX, ep),
+                      'schema': '%s%s/schema/' % (API_PREFIX, ep)})
+                for ep in ENDPOINTS))
+
+        match = SET_PATH.match(url.path)
+        if match:
+            endpoint, ids = match.groups()
+            objects, not_found = [], []
+            for resource_id in ids.split(';'):
+                item = dataset.item(endpoint, int(resource_id))
+                if item is None:
+                    not_found.append(resource_id)
+                else:
+                    objects.append(item)
+            return self._send_json(200, {'objects': objects, 'not_found': not_found})
+
+        match = DETAIL_PATH.match(url.path)
+        if match:
+            endpoint, resource_id = match.groups()
+            item = dataset.item(endpoint, int(resource_id))
+            if item is None:
+                return self._send_json(404)
+            return self._send_json(200, item)
+
+        match = LIST_PATH.match(url.path)
+        if match and match.group(1) in ENDPOINTS:
+            return self._send_list(match.group(1), parse_qs(url.query))
+
+        return self._send_json(404)
+
+    def _send_list(self, endpoint, query):
+        dataset = self.server.dataset
+        limit = min(int(query.get('limit', ['20'])[0]), MAX_LIMIT)
+        offset = int(query.get('offset', ['0'])[0])
+        total_count = dataset.counts.get(endpoint, 0)
+
+        ids = range(offset + 1, min(offset + limit, total_count) + 1)
+        next_uri = None
+        if offset + limit < total_count:
+            next_uri = '%s%s/?limit=%s&offset=%s' % (API_PREFIX, endpoint, limit, offset + limit)
+
+        return self._send_json(200, {
+            'meta': {'limit': limit, 'offset': offset, 'total_count': total_count,
+                     'next': next_uri, 'previous': None},
+            'objects': [dataset.item(endpoint, i) for i in ids],
+        })
+
+    def _create(self, endpoint):
+        with self.server.lock:
+            self.server.created[endpoint] = self.server.created.get(endpoint, 0) + 1
+            return self.server.dataset.counts.get(endpoint, 0) + self.server.created[endpoint]
+
+    def do_POST(self):
+        # the body is read even if not used, to keep the connection usable.
+        self._read_body()
+        if self._simulate():
+            return self._send_json(503)
+
+        match = LIST_PATH.match(urlparse(self.path).path)
+        if not match:
+            return self._send_json(405)
+
+        endpoint = match.group(1)
+        location = 'http://%s:%s%s' % (self.server.server_address[0],
+                                       self.server.server_address[1],
+                                       self.server.dataset.uri(endpoint, self._create(endpoint)))
+        return self._send_json(201, headers={'Location': location})
+
+    def do_PATCH(self):
+        body = self._read_body()
+        if self._simulate():
+            return self._send_json(503)
+
+        match = LIST_PATH.match(urlparse(self.path).path)
+        if not match:
+            return self._send_json(405)
+
+        endpoint = match.group(1)
+        objects = []
+        for obj in body.get('objects', []):
+            resource_id = self._create(endpoint)
+            objects.append(dict(obj, id=resource_id,
+                                resource_uri=self.server.dataset.uri(endpoint, resource_id)))
+
+        return self._send_json(202, {'objects': objects})
+
+
+class FakeManagerServer(ThreadingMixIn, HTTPServer):
+    """
+    Threaded fake SciELO Manager API server.
+
+    :param address: a ``(host, port)`` pair. Port 0 picks a free port.
+    :param dataset: instance of :class:`Dataset`.
+    :param latency: (optional) seconds to wait before answering each request.
+    :param error_rate: (optional) probability of answering with 503.
+    :param seed: (optional) seed of the errors injection.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, dataset, latency=0.0, error_rate=0.0, seed=0):
+        HTTPServer.__init__(self, address, FakeManagerHandler)
+        self.dataset = dataset
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests_count = 0
+        self.created = {}
+
+    @property
+    def api_uri(self):
+        """
+        The `api_uri` to be passed to :class:`scieloapi.Client`.
+        """
+        return 'http://%s:%s/api/' % self.server_address
+
+    def start(self):
+        """
+        Serves requests in a background thread.
+        """
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def _serve(address, dataset, latency, error_rate, addresses):
+    server = FakeManagerServer(address, dataset, latency=latency, error_rate=error_rate)
+    addresses.put(server.server_address)
+    server.serve_forever()
+
+
+class ServerProcess(object):
+    """
+    Runs a :class:`FakeManagerServer` in its own process, so its CPU time
+    and memory are not accounted to the client being measured.
+
+    :param dataset: instance of :class:`Dataset`.
+    :param latency: (optional) seconds to wait before answering each request.
+    :param error_rate: (optional) probability of answering with 503.
+    :param address: (optional) a ``(host, port)`` pair. Defaults to a free port of localhost.
+    """
+    def __init__(self, dataset, latency=0.0, error_rate=0.0, address=('127.0.0.1', 0)):
+        addresses = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=_serve, args=(address, dataset, latency, error_rate, addresses))
+        self.process.daemon = True
+        self.process.start()
+        self.server_address = tuple(addresses.get(timeout=30))
+
+    @property
+    def api_uri(self):
+        """
+        The `api_uri` to be passed to :class:`scieloapi.Client`.
+        """
+        return 'http://%s:%s/api/' % self.server_address
+
+    def stop(self):
+        self.process.terminate()
+        self.process.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fake SciELO Manager API server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--items', type=int, default=1000,
+                        help='number of items of each endpoint')
+    parser.add_argument('--payload-size', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    dataset = Dataset(dict((ep, args.items) for ep in ENDPOINTS), args.payload_size)
+    server = FakeManagerServer((args.host, args.port), dataset,
+                               latency=args.latency, error_rate=args.error_rate)
+    print('Serving at %s' % server.api_uri)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# coding: utf-8
+"""
+Measures how long it takes to import `scieloapi` in a fresh interpreter.
+
+Usage::
+
+    $ python -m benchmarks.import_time --runs 20 --max-ms 150
+
+Each run spawns a new process, so the numbers reflect what short-lived
+jobs pay on startup. The baseline interpreter startup is measured too and
+subtracted from the results. Exits with status 1 if the median import time
+is above `--max-ms`, what makes it suitable to be used in CI.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_process(code):
+    """
+    Returns the wall time, in seconds, to run `code` in a new interpreter.
+    """
+    started = time.time()
+    subprocess.check_call([sys.executable, '-c', code], cwd=PROJECT_ROOT)
+    return time.time() - started
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def measure(runs):
+    baseline = [time_process('pass') for _ in range(runs)]
+    with_import = [time_process('import scieloapi') for _ in range(runs)]
+
+    baseline_ms = median(baseline) * 1000
+    import_ms = max(median(with_import) * 1000 - baseline_ms, 0.0)
+
+    return {
+        'runs': runs,
+        'python': sys.version.split()[0],
+        'interpreter_startup_ms': round(baseline_ms, 2),
+        'import_ms': round(import_ms, 2),
+        'heavy_modules_loaded': heavy_modules_loaded(),
+    }
+
+
+def heavy_modules_loaded():
+    """
+    Lists the heavy modules that are loaded as a side effect of
+    importing `scieloapi`.
+    """
+    code = ("import sys, scieloapi; "
+            "print(','.join(m for m in ('requests', 'pkg_resources') "
+            "if m in sys.modules))")
+    output = subprocess.check_output([sys.executable, '-c', code],
+                                     cwd=PROJECT_ROOT)
+    return [mod for mod in output.decode('ascii').strip().split(',') if mod]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='fail if the median import time is above this value')
+    args = parser.parse_args(argv)
+
+    result = measure(args.runs)
+    print(json.dumps(result, indent=2, sort_keys=True))
+
+    if args.max_ms is not None and result['import_ms'] > args.max_ms:
+        return 1
+    if result['heavy_modules_loaded']:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
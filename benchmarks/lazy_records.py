@@ -0,0 +1,136 @@
+# coding: utf-8
+"""
+Compares the CPU time of reading top-level fields of lazy records against
+decoding the whole page with `json.loads`.
+
+Usage::
+
+    $ python -m benchmarks.lazy_records --pages 20 --fields id --fields id,title,updated
+
+Pages are journal-like documents, with lists of relations and nested
+objects, serialized with sorted keys like Tastypie does. Eager and lazy
+reads are run alternately and the best of `--runs` is kept for each, so
+the numbers are comparable on a busy machine. Exits with status 1 if lazy
+reads take more than `--max-ratio` times the CPU of eager ones.
+"""
+import sys
+import json
+import time
+import argparse
+
+from scieloapi import records
+
+
+DEFAULT_FIELDS = ('id', 'id,title,updated')
+
+try:
+    cpu_time = time.process_time
+except AttributeError:  # python 2
+    cpu_time = time.clock
+
+
+def journal(journal_id):
+    uri = '/api/v1/%s/%s/'
+    return {
+        'id': journal_id,
+        'resource_uri': uri % ('journals', journal_id),
+        'title': u'Revista Brasileira de Ciências %s' % journal_id,
+        'short_title': u'Rev. Bras. Ciênc. %s' % journal_id,
+        'acronym': 'rbc%s' % journal_id,
+        'print_issn': '1234-5678',
+        'eletronic_issn': '8765-4321',
+        'publisher_name': u'Sociedade Brasileira de "Ciências"',
+        'publisher_country': 'BR',
+        'publication_city': u'São Paulo',
+        'init_year': '1990',
+        'final_year': None,
+        'frequency': 'Q',
+        'pub_status': 'current',
+        'is_trashed': False,
+        'created': '2012-01-01T10:00:00',
+        'updated': '2014-01-01T10:00:00',
+        'collections': [uri % ('collections', 1)],
+        'languages': ['pt', 'en', 'es'],
+        'issues': [uri % ('issues', i) for i in range(40)],
+        'sections': [uri % ('sections', i) for i in range(10)],
+        'missions': [{'description': u'Publicar artigos originais ' * 5, 'language': 'pt'},
+                     {'description': u'Publish original articles ' * 5, 'language': 'en'}],
+        'other_titles': [{'category': 'other', 'title': u'Other %s' % journal_id}],
+        'pub_status_history': [{'date': '2012-01-01T10:00:00', 'status': 'current'}],
+        'use_license': {'license_code': 'BY', 'reference_url': None},
+        'notes': u'',
+    }
+
+
+def make_page(offset, limit=50):
+    """
+    Returns the JSON text of a page of journals.
+    """
+    page = {
+        'meta': {'limit': limit, 'offset': offset, 'total_count': offset + limit,
+                 'next': None, 'previous': None},
+        'objects': [journal(offset + i + 1) for i in range(limit)],
+    }
+    return json.dumps(page, sort_keys=True, ensure_ascii=False)
+
+
+def read_eager(pages, fields):
+    for text in pages:
+        for doc in json.loads(text)['objects']:
+            for field in fields:
+                doc[field]
+
+
+def read_lazy(pages, fields):
+    for text in pages:
+        for doc in records.parse_page(text)['objects']:
+            for field in fields:
+                doc[field]
+
+
+def best_time(func, *args):
+    started = cpu_time()
+    func(*args)
+    return cpu_time() - started
+
+
+def measure(pages, fields, runs):
+    eager, lazy = [], []
+    for _ in range(runs):
+        eager.append(best_time(read_eager, pages, fields))
+        lazy.append(best_time(read_lazy, pages, fields))
+
+    return {
+        'fields': list(fields),
+        'eager_ms': round(min(eager) * 1000, 2),
+        'lazy_ms': round(min(lazy) * 1000, 2),
+        'ratio': round(min(lazy) / min(eager), 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--fields', action='append',
+                        help='comma separated fields read from each document; '
+                             'can be repeated')
+    parser.add_argument('--max-ratio', type=float, default=None,
+                        help='fail if lazy reads take more than this times '
+                             'the CPU of eager ones')
+    args = parser.parse_args(argv)
+
+    pages = [make_page(i * 50) for i in range(args.pages)]
+    results = [measure(pages, fields.split(','), args.runs)
+               for fields in args.fields or DEFAULT_FIELDS]
+    print(json.dumps({'python': sys.version.split()[0], 'pages': args.pages,
+                      'results': results}, indent=2, sort_keys=True))
+
+    if args.max_ratio is not None and any(result['ratio'] > args.max_ratio
+                                          for result in results):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
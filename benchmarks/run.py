@@ -0,0 +1,328 @@
+# coding: utf-8
+"""
+Throughput benchmarks against a local fake SciELO Manager API.
+
+Each scenario runs in its own process against a fresh
+:class:`benchmarks.fakeserver.FakeManagerServer`, that runs in another
+process, for every combination of the configurations passed in the command
+line, and reports throughput, latency percentiles, peak memory of the
+client and the number of requests failed by the injected errors. Results can be saved as JSON and
+compared with the results of a previous run, e.g. of the last release::
+
+    $ python -m benchmarks.run --output baseline.json
+    $ git checkout my-branch
+    $ python -m benchmarks.run --compare baseline.json --tolerance 0.1
+
+Available scenarios: iter_docs, fetch_relations, endpoint_get and post.
+"""
+import sys
+import json
+import time
+import argparse
+import traceback
+import itertools
+import multiprocessing
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+try:
+    import queue
+except ImportError:  # python 2
+    import Queue as queue
+
+import scieloapi
+from scieloapi import exceptions
+from scieloapi.instrumentation import Instrumentation
+
+from . import fakeserver
+
+
+class LatencyRecorder(Instrumentation):
+    """
+    Records the latency of each successful request.
+    """
+    def __init__(self):
+        self.latencies = []
+
+    def after_response(self, event):
+        self.latencies.append(event['elapsed'])
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of `values`.
+    """
+    if not values:
+        return None
+
+    values = sorted(values)
+    rank = max(int(round(pct / 100.0 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def peak_memory_kb():
+    """
+    Peak resident memory of the current process, in KiB.
+    """
+    if resource is None:
+        return None
+
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB elsewhere.
+    return usage // 1024 if sys.platform == 'darwin' else usage
+
+
+# requests that fail by the injected errors, when not retried by the client.
+INJECTED_ERRORS = (exceptions.ServiceUnavailable,)
+
+# seconds to wait for the result of a scenario.
+SCENARIO_TIMEOUT = 3600
+
+
+def make_client(server, recorder, pooled, attempts=100):
+    """
+    Creates a client of `server`. The endpoints listing is not retried by
+    the client, so it is attempted again here on injected errors.
+
+    :returns: a pair of the client and the number of failed attempts.
+    """
+    def connector(*args, **kwargs):
+        return scieloapi.Connector(*args, pooled=pooled,
+                                   instrumentation=[recorder], **kwargs)
+
+    for errors in range(attempts):
+        try:
+            return scieloapi.Client('bench.user', 'bench.apikey',
+                                    api_uri=server.api_uri, connector_dep=connector), errors
+        except INJECTED_ERRORS:
+            continue
+
+    raise RuntimeError('unable to list the endpoints after %s attempts' % attempts)
+
+
+# scenarios return the number of items processed and of injected errors.
+
+def scenario_iter_docs(client, config):
+    return sum(1 for _ in client.query('issues').all()), 0
+
+
+def scenario_fetch_relations(client, config):
+    count = 0
+    for issue in itertools.islice(client.query('issues').all(), config['operations']):
+        client.fetch_relations(issue, only=('journal', 'sections'))
+        count += 1
+    return count, 0
+
+
+def scenario_endpoint_get(client, config):
+    journals = client.query('journals')
+    for resource_id in range(1, config['operations'] + 1):
+        journals.get(resource_id)
+    return config['operations'], 0
+
+
+def scenario_post(client, config):
+    pressreleases = client.query('pressreleases')
+    count = errors = 0
+    for i in range(config['operations']):
+        try:
+            pressreleases.post({'title': 'press release %s' % i,
+                                'padding': 'x' * config['payload_size']})
+        except INJECTED_ERRORS:
+            # POST requests are not retried by the client.
+            errors += 1
+        else:
+            count += 1
+    return count, errors
+
+
+SCENARIOS = {
+    'iter_docs': scenario_iter_docs,
+    'fetch_relations': scenario_fetch_relations,
+    'endpoint_get': scenario_endpoint_get,
+    'post': scenario_post,
+}
+
+
+def run_scenario(name, config):
+    """
+    Runs a scenario against a new fake server and returns its measurements.
+    """
+    dataset = fakeserver.Dataset(
+        dict((ep, config['items']) for ep in fakeserver.ENDPOINTS),
+        payload_size=config['payload_size'])
+    server = fakeserver.ServerProcess(dataset, latency=config['latency'],
+                                      error_rate=config['error_rate'])
+    recorder = LatencyRecorder()
+    try:
+        client, errors = make_client(server, recorder, config['pooled'])
+        del recorder.latencies[:]  # endpoints introspection
+
+        started = time.time()
+        items, scenario_errors = SCENARIOS[name](client, config)
+        elapsed = time.time() - started
+    finally:
+        server.stop()
+
+    latencies = recorder.latencies
+    return {
+        'scenario': name,
+        'config': config,
+        'items': items,
+        'requests': len(latencies),
+        'errors': errors + scenario_errors,
+        'seconds': round(elapsed, 4),
+        'items_per_second': round(items / elapsed, 2) if elapsed else None,
+        'latency_ms': dict(
+            ('p%s' % pct, round(percentile(latencies, pct) * 1000, 3) if latencies else None)
+            for pct in (50, 90, 99)),
+        'peak_memory_kb': peak_memory_kb(),
+    }
+
+
+def _run_in_child(name, config, results):
+    try:
+        results.put((True, run_scenario(name, config)))
+    except BaseException:
+        results.put((False, traceback.format_exc()))
+
+
+def run_isolated(name, config, timeout=SCENARIO_TIMEOUT):
+    """
+    Runs a scenario in a new process, so peak memory is measured apart.
+    Failures of the scenario are raised as RuntimeError, with the
+    traceback of the child process.
+    """
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run_in_child, args=(name, config, results))
+    process.start()
+
+    deadline = time.time() + timeout
+    try:
+        while True:
+            try:
+                ok, result = results.get(timeout=1)
+                break
+            except queue.Empty:
+                if not process.is_alive():
+                    raise RuntimeError('%s died with exit code %s' % (name, process.exitcode))
+                if time.time() > deadline:
+                    raise RuntimeError('%s timed out after %ss' % (name, timeout))
+    finally:
+        if process.is_alive():
+            process.join(5)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+    if not ok:
+        raise RuntimeError('%s failed:\n%s' % (name, result))
+    return result
+
+
+def describe(config):
+    """
+    Describes the configuration that varies between the runs of a sweep,
+    e.g. `latency=0.05 payload_size=256 error_rate=0.0 pooled=1`.
+    """
+    return ' '.join('%s=%s' % (key, config[key]) for key in CONFIG_KEYS)
+
+
+# keys of the configurations combined by a sweep.
+CONFIG_KEYS = ('latency', 'payload_size', 'error_rate', 'pooled')
+
+
+def configurations(args):
+    for values in itertools.product(args.latency, args.payload_size,
+                                    args.error_rate, args.pooled):
+        config = dict(zip(CONFIG_KEYS, values))
+        config.update(items=args.items, operations=args.operations)
+        yield config
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compares throughput with `baseline`.
+
+    :returns: a list of human readable regressions.
+    """
+    def key(result):
+        return result['scenario'], json.dumps(result['config'], sort_keys=True)
+
+    previous = dict((key(r), r) for r in baseline['results'])
+    regressions = []
+    for result in results:
+        old = previous.get(key(result))
+        if not old or not old['items_per_second'] or not result['items_per_second']:
+            continue
+
+        ratio = result['items_per_second'] / old['items_per_second']
+        line = '%s [%s]: %.2f -> %.2f items/s (%+.1f%%)' % (
+            result['scenario'], describe(result['config']), old['items_per_second'],
+            result['items_per_second'], (ratio - 1) * 100)
+        print(line)
+        if ratio < 1 - tolerance:
+            regressions.append(line)
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='scieloapi throughput benchmarks.')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='scenario to run. Defaults to all.')
+    parser.add_argument('--items', type=int, default=2000,
+                        help='number of items of each endpoint')
+    parser.add_argument('--operations', type=int, default=200,
+                        help='number of operations of the get, post and relations scenarios')
+    parser.add_argument('--latency', type=float, nargs='+', default=[0.0],
+                        help='server latency, in seconds')
+    parser.add_argument('--payload-size', type=int, nargs='+', default=[256],
+                        help='padding added to each item, in bytes')
+    parser.add_argument('--error-rate', type=float, nargs='+', default=[0.0],
+                        help='probability of 503 responses')
+    parser.add_argument('--pooled', type=int, nargs='+', default=[0, 1], choices=(0, 1),
+                        help='use pooled connections')
+    parser.add_argument('--output', help='file to save the results as JSON')
+    parser.add_argument('--compare', help='results of a previous run, as JSON')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='throughput loss accepted when comparing')
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.scenario or sorted(SCENARIOS):
+        for config in configurations(args):
+            result = run_isolated(name, config)
+            results.append(result)
+            print('%(scenario)s [%(config)s]: %(items_per_second)s items/s, '
+                  'p50 %(p50)s ms, p99 %(p99)s ms, peak %(peak)s KiB, '
+                  '%(errors)s errors' % dict(
+                      result, config=describe(config), peak=result['peak_memory_kb'],
+                      **result['latency_ms']))
+
+    report = {
+        'version': scieloapi.__version__,
+        'python': sys.version.split()[0],
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print('Regressions:\n' + '\n'.join(regressions))
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,12 @@
-import pkg_resources
 import logging
 
 # Setting up a do-nothing handler. We expect the application to define
 # the handler for `scieloapi`.
 logging.getLogger(__name__).addHandler(logging.NullHandler())
 
-__version__ = pkg_resources.get_distribution('scieloapi').version
+# Keep in sync with `setup.py`, that reads it from here. The version is
+# hardcoded to avoid scanning all installed distributions at import time.
+__version__ = '0.6'
 __user_agent__ = 'scieloapi/%s' % __version__
 
 from .core import Connector, Endpoint, Client
-
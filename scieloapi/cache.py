@@ -0,0 +1,213 @@
+# coding: utf-8
+"""
+Local cache of fetched data, with policies to keep serving reads while the
+SciELO Manager API is slow or down.
+
+A :class:`Cache` is passed to :class:`scieloapi.Connector` via the `cache`
+kwarg, and answers :meth:`scieloapi.Connector.fetch_data` and the pages
+produced by :meth:`scieloapi.Connector.iter_pages`, thus
+:meth:`scieloapi.Endpoint.get` and :meth:`scieloapi.Endpoint.filter`::
+
+    >>> from scieloapi.cache import Cache, ShelveStore
+    >>> cache = Cache(ShelveStore('manager.cache'), ttl=600,
+    ...               policy='stale-while-revalidate')
+    >>> conn = Connector('some.user', 'some.apikey', cache=cache)
+
+The policies are:
+
+* `fresh`: entries younger than `ttl` are served, the others are fetched again.
+* `stale-while-revalidate`: expired entries are served right away, while they
+  are fetched again in a background thread. Entries older than `ttl` plus
+  `max_stale` are fetched again before being served.
+* `offline`: the network is never touched. All entries are served regardless
+  of their age, and requests not cached raise
+  :class:`scieloapi.exceptions.NotCached`.
+
+The freshness of the data served is available at
+:attr:`scieloapi.Connector.last_freshness`, and at `meta['freshness']` of
+each page. It is a dict with the keys `status`, i.e. `hit`, `stale`, `miss`
+or `offline`, `age`, in seconds, and `stored_at`, a timestamp.
+
+Cached values are shared by all reads, and must not be modified.
+"""
+import json
+import time
+import shelve
+import logging
+import threading
+
+from . import exceptions
+from . import httpbroker
+
+
+__all__ = ['Cache', 'MemoryStore', 'ShelveStore']
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ('fresh', 'stale-while-revalidate', 'offline')
+
+
+def request_key(api_uri, endpoint=None, resource_id=None, params=None, raw=False):
+    """
+    Identifies a GET request.
+    """
+    if resource_id is not None:
+        resource_id = str(resource_id)
+
+    key = [api_uri, endpoint, resource_id, httpbroker.prepare_params(params) or []]
+    if raw:
+        # raw and decoded bodies are cached apart.
+        key.append('raw')
+
+    return str(json.dumps(key, sort_keys=True))
+
+
+class MemoryStore(object):
+    """
+    Keeps entries in a dict, for the lifetime of the process.
+    """
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, entry):
+        self._entries[key] = entry
+
+    def close(self):
+        pass
+
+
+class ShelveStore(object):
+    """
+    Keeps entries in a :mod:`shelve` file, to be reused by other processes
+    later, e.g. while the API is down. The file must not be written by
+    many processes at once.
+
+    :param path: the shelve file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._shelf = shelve.open(path, protocol=2)
+
+    def get(self, key):
+        with self._lock:
+            return self._shelf.get(key)
+
+    def set(self, key, entry):
+        with self._lock:
+            self._shelf[key] = entry
+
+    def close(self):
+        with self._lock:
+            self._shelf.close()
+
+
+class Cache(object):
+    """
+    Cache of fetched data, served according to `policy`.
+
+    :param store: (optional) where entries are kept: a :class:`MemoryStore` or a :class:`ShelveStore`. Defaults to a new :class:`MemoryStore`.
+    :param ttl: (optional) seconds during which entries are fresh. Defaults to 300.
+    :param policy: (optional) `fresh`, `stale-while-revalidate` or `offline`. See :mod:`scieloapi.cache`. Defaults to `fresh`.
+    :param max_stale: (optional) seconds after `ttl` during which stale entries are served by the `stale-while-revalidate` policy. By default, they are served regardless of their age.
+    """
+    def __init__(self, store=None, ttl=300, policy='fresh', max_stale=None):
+        if policy not in POLICIES:
+            raise ValueError('unknown cache policy %s. Supported are: %s' % (
+                policy, ', '.join(POLICIES)))
+
+        # dependencies
+        self._time = time
+
+        self.store = store if store is not None else MemoryStore()
+        self.ttl = ttl
+        self.policy = policy
+        self.max_stale = max_stale
+        self._lock = threading.Lock()
+        # background refreshes in progress, by key.
+        self._refreshing = {}
+
+    def _store(self, key, value):
+        entry = {'value': value, 'stored_at': self._time.time()}
+        self.store.set(key, entry)
+        return entry
+
+    def _freshness(self, status, entry):
+        return {'status': status, 'stored_at': entry['stored_at'],
+                'age': max(self._time.time() - entry['stored_at'], 0.0)}
+
+    def _serves_stale(self, age):
+        return (self.policy == 'stale-while-revalidate' and
+                (self.max_stale is None or age < self.ttl + self.max_stale))
+
+    def fetch(self, key, fetch):
+        """
+        Gets the value of `key`, calling `fetch` to get it from the
+        network when the policy requires.
+
+        :param key: the request key.
+        :param fetch: callable that takes no args and returns the value.
+        :returns: a pair of the value and its freshness.
+        """
+        entry = self.store.get(key)
+
+        if self.policy == 'offline':
+            if entry is None:
+                raise exceptions.NotCached('not cached: %s' % key)
+            return entry['value'], self._freshness('offline', entry)
+
+        if entry is not None:
+            age = self._time.time() - entry['stored_at']
+            if age < self.ttl:
+                return entry['value'], self._freshness('hit', entry)
+            elif self._serves_stale(age):
+                self._refresh(key, fetch)
+                return entry['value'], self._freshness('stale', entry)
+
+        entry = self._store(key, fetch())
+        return entry['value'], self._freshness('miss', entry)
+
+    def _refresh(self, key, fetch):
+        """
+        Fetches `key` again in a background thread, unless it is being
+        fetched already.
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return
+
+            thread = threading.Thread(target=self._do_refresh, args=(key, fetch))
+            thread.daemon = True
+            self._refreshing[key] = thread
+
+        thread.start()
+
+    def _do_refresh(self, key, fetch):
+        try:
+            self._store(key, fetch())
+        except Exception as e:
+            # the stale entry keeps being served.
+            logger.warning('Unable to refresh %s: %s' % (key, e))
+        finally:
+            with self._lock:
+                self._refreshing.pop(key, None)
+
+    def join(self, timeout=None):
+        """
+        Waits for the background refreshes in progress to finish.
+        """
+        with self._lock:
+            threads = list(self._refreshing.values())
+
+        for thread in threads:
+            thread.join(timeout)
+
+    def close(self):
+        """
+        Waits for the background refreshes and closes the store.
+        """
+        self.join()
+        self.store.close()
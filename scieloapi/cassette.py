@@ -0,0 +1,273 @@
+# coding: utf-8
+"""
+Record-and-replay http broker.
+
+A :class:`Cassette` records the requests dispatched through a real http
+broker, and their results, to a compact file, and replays them later
+without touching the network. It is a drop-in http broker, passed to
+:class:`scieloapi.Connector` via `http_broker`::
+
+    >>> from scieloapi.cassette import Cassette
+    >>> with Cassette('harvest.cassette', mode='record') as cassette:
+    ...     conn = Connector('some.user', 'some.apikey', http_broker=cassette)
+    ...     docs = list(conn.iter_docs('journals'))
+
+Then, anywhere, even offline::
+
+    >>> cassette = Cassette('harvest.cassette', latency='recorded')
+    >>> conn = Connector('any.user', 'any.apikey', http_broker=cassette)
+    >>> docs = list(conn.iter_docs('journals'))
+
+Credentials are never written to the cassette, and requests are matched by
+HTTP method, URL path, query string params and data, regardless of the host.
+Results are kept serialized, so each replay produces new objects, unaffected
+by changes made by consumers to the objects produced before.
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import hashlib
+import importlib
+import threading
+from collections import defaultdict
+
+from . import httpbroker
+from . import exceptions
+
+
+__all__ = ['Cassette']
+
+MODES = ('record', 'replay', 'once')
+
+
+def _request_key(method, api_uri, endpoint=None, resource_id=None,
+                 params=None, data=None, raw=False):
+    """
+    Identifies a request regardless of the host it is sent to.
+    """
+    url = httpbroker._make_full_url(api_uri, endpoint, resource_id)
+    path = '/' + url.split('://', 1)[-1].split('/', 1)[-1]
+
+    key = [method, path, httpbroker.prepare_params(params) or []]
+    if data is not None:
+        prepared = httpbroker.prepare_data(data)
+        if not isinstance(prepared, bytes):
+            prepared = prepared.encode('utf-8')
+        key.append(hashlib.sha1(prepared).hexdigest())
+    if raw:
+        # raw and decoded bodies are recorded apart.
+        key.append('raw')
+
+    return json.dumps(key, sort_keys=True)
+
+
+def _encode_result(result):
+    return json.dumps(result, sort_keys=True, separators=(',', ':'))
+
+
+class Cassette(object):
+    """
+    Http broker that records and replays requests.
+
+    :param path: the cassette file. It is gzip compressed JSON lines.
+    :param mode: (optional) `replay` only replays recorded requests, `record` dispatches all requests through `broker` recording them, and `once` replays the requests already recorded and records the others. Defaults to `replay`.
+    :param broker: (optional) the http broker used to record. Defaults to :mod:`scieloapi.httpbroker`.
+    :param latency: (optional) simulated latency on replay: seconds, or `recorded` to wait as long as the recorded request took. Defaults to no latency.
+    """
+    def __init__(self, path, mode='replay', broker=None, latency=None):
+        if mode not in MODES:
+            raise ValueError('unknown mode %s. Supported modes are: %s' % (mode, ', '.join(MODES)))
+
+        self.path = path
+        self.mode = mode
+        self.broker = broker if broker is not None else httpbroker
+        self.latency = latency
+
+        self._lock = threading.Lock()
+        self._entries = defaultdict(list)
+        # position of the next entry to be replayed, for each request.
+        self._cursors = defaultdict(int)
+        self._dirty = False
+
+        if mode != 'record' and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with gzip.open(self.path, 'rb') as cassette_file:
+            for line in cassette_file:
+                entry = json.loads(line.decode('utf-8'))
+                if 'result' in entry:
+                    entry['result'] = _encode_result(entry['result'])
+                self._entries[entry['key']].append(entry)
+
+    def save(self):
+        """
+        Writes all recorded requests to the cassette file.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+
+            tmp_path = self.path + '.tmp'
+            with gzip.open(tmp_path, 'wb') as cassette_file:
+                for key in sorted(self._entries):
+                    for entry in self._entries[key]:
+                        if 'result' in entry:
+                            entry = dict(entry, result=json.loads(entry['result']))
+                        line = json.dumps(entry, sort_keys=True, separators=(',', ':'))
+                        cassette_file.write(line.encode('utf-8') + b'\n')
+            os.rename(tmp_path, self.path)
+            self._dirty = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.save()
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def __getstate__(self):
+        """
+        Only the configuration is pickled, and the cassette is loaded
+        again. Recording in many processes at once is not supported.
+        """
+        broker = self.broker
+        if isinstance(broker, type(sys)):
+            broker = broker.__name__
+
+        return {'path': self.path, 'mode': self.mode, 'broker': broker,
+                'latency': self.latency}
+
+    def __setstate__(self, state):
+        state = dict(state)
+        if isinstance(state['broker'], str):
+            state['broker'] = importlib.import_module(state['broker'])
+
+        self.__init__(**state)
+
+    def _replay(self, key, trace):
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                return None
+
+            # identical requests are replayed in the recorded order, and
+            # the last one is repeated after that.
+            index = min(self._cursors[key], len(entries) - 1)
+            self._cursors[key] += 1
+            entry = entries[index]
+
+        if self.latency == 'recorded':
+            time.sleep(entry['elapsed'])
+        elif self.latency:
+            time.sleep(self.latency)
+
+        if trace is not None:
+            trace['status'] = entry['status']
+            # as transferred when recorded, or the size of the recorded result.
+            trace['bytes'] = entry.get('bytes', len(entry.get('result') or 'null'))
+            trace['timings'] = {'ttfb': entry['elapsed'], 'download': 0.0, 'decode': 0.0}
+
+        if entry.get('error'):
+            error = getattr(exceptions, entry['error'], exceptions.APIError)
+            raise error(entry.get('message', ''))
+
+        return entry
+
+    def _record(self, key, func, args, kwargs):
+        started = time.time()
+        entry = {'key': key}
+        try:
+            result = func(*args, **kwargs)
+        except exceptions.APIError as e:
+            entry.update(error=type(e).__name__, message=str(e),
+                         status=e.status_code)
+            raise
+        else:
+            trace = kwargs.get('trace', {})
+            # serialized right away, as consumers may change the result.
+            entry.update(result=_encode_result(result),
+                         status=trace.get('status', 200))
+            if trace.get('bytes') is not None:
+                entry['bytes'] = trace['bytes']
+        finally:
+            entry['elapsed'] = round(time.time() - started, 6)
+            if 'error' in entry or 'result' in entry:
+                with self._lock:
+                    self._entries[key].append(entry)
+                    self._dirty = True
+
+        return result
+
+    def _dispatch(self, key, func, args, kwargs, trace, object_pairs_hook=None):
+        if self.mode != 'record':
+            entry = self._replay(key, trace)
+            if entry is not None:
+                return json.loads(entry['result'], object_pairs_hook=object_pairs_hook)
+
+            if self.mode == 'replay':
+                raise exceptions.UnrecordedRequest('not recorded: %s' % key)
+
+        if trace is not None:
+            kwargs['trace'] = trace
+
+        return self._record(key, func, args, kwargs)
+
+    def new_session(self):
+        """
+        Sessions are only needed when requests are recorded.
+        """
+        if self.mode == 'replay':
+            return None
+
+        return self.broker.new_session()
+
+    def _optionals(self, session):
+        return {'session': session} if session is not None else {}
+
+    def get(self, api_uri, endpoint=None, resource_id=None, params=None,
+            auth=None, check_ca=False, session=None, trace=None, raw=False,
+            object_pairs_hook=None):
+        """
+        Same as :func:`scieloapi.httpbroker.get`. The `object_pairs_hook`
+        is applied to the responses being replayed too.
+        """
+        key = _request_key('GET', api_uri, endpoint, resource_id, params, raw=raw)
+        kwargs = dict(endpoint=endpoint, resource_id=resource_id, params=params,
+                      auth=auth, check_ca=check_ca, **self._optionals(session))
+        if raw:
+            kwargs['raw'] = True
+        if object_pairs_hook is not None:
+            kwargs['object_pairs_hook'] = object_pairs_hook
+
+        return self._dispatch(key, self.broker.get, (api_uri,), kwargs, trace,
+                              object_pairs_hook)
+
+    def post(self, api_uri, data, endpoint=None, auth=None, check_ca=False,
+             session=None, trace=None):
+        """
+        Same as :func:`scieloapi.httpbroker.post`.
+        """
+        key = _request_key('POST', api_uri, endpoint, data=data)
+        kwargs = dict(endpoint=endpoint, auth=auth, check_ca=check_ca,
+                      **self._optionals(session))
+
+        return self._dispatch(key, self.broker.post, (api_uri, data), kwargs, trace)
+
+    def patch(self, api_uri, data, endpoint=None, auth=None, check_ca=False,
+              session=None, trace=None, object_pairs_hook=None):
+        """
+        Same as :func:`scieloapi.httpbroker.patch`.
+        """
+        key = _request_key('PATCH', api_uri, endpoint, data=data)
+        kwargs = dict(endpoint=endpoint, auth=auth, check_ca=check_ca,
+                      **self._optionals(session))
+        if object_pairs_hook is not None:
+            kwargs['object_pairs_hook'] = object_pairs_hook
+
+        return self._dispatch(key, self.broker.patch, (api_uri, data), kwargs, trace,
+                              object_pairs_hook)
@@ -0,0 +1,190 @@
+# coding: utf-8
+"""
+Change detection between harvests, by content fingerprints.
+
+Each document is fingerprinted with a hash of its canonical JSON, and the
+fingerprints of a harvest are kept in a compact file, mapping ids to hashes.
+The next harvest is compared against it, producing only the documents that
+are new or changed, and the ids of the documents deleted since::
+
+    >>> from scieloapi.changes import ChangeDetector
+    >>> detector = ChangeDetector('journals.fingerprints', ignore=['updated'])
+    >>> for change in detector.changes(conn.iter_docs('journals')):
+    ...     print change.kind, change.id
+    >>> detector.save()
+
+Deletions are produced after all documents are consumed, so they are only
+meaningful for complete harvests, i.e. not filtered. Fields that change
+without changing the content, e.g. `updated`, can be ignored.
+"""
+import os
+import json
+import struct
+import hashlib
+import collections
+
+
+__all__ = ['fingerprint', 'Change', 'FingerprintStore', 'ChangeDetector']
+
+NEW, CHANGED, DELETED = 'new', 'changed', 'deleted'
+
+MAGIC = b'SCLFPRT1'
+# magic and number of entries.
+HEADER = struct.Struct('<8sQ')
+# id and sha1 digest of a document.
+ENTRY = struct.Struct('<q20s')
+
+
+class Change(collections.namedtuple('Change', 'kind id doc')):
+    """
+    A change of a document: its `kind`, i.e. `new`, `changed` or `deleted`,
+    its `id` and the document itself, that is `None` when deleted.
+    """
+    __slots__ = ()
+
+
+def _canonical(doc, ignore=None):
+    if hasattr(doc, 'to_dict'):
+        # compact and lazy records.
+        doc = doc.to_dict()
+    if ignore:
+        doc = dict((key, value) for key, value in doc.items() if key not in ignore)
+
+    return json.dumps(doc, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def _digest(doc, ignore=None):
+    return hashlib.sha1(_canonical(doc, ignore)).digest()
+
+
+def fingerprint(doc, ignore=None):
+    """
+    Hash of the content of `doc`, that does not depend on the order of its
+    keys, or on it being a dict or a record.
+
+    :param doc: a dict, :class:`scieloapi.records.Record` or :class:`scieloapi.records.LazyRecord`.
+    :param ignore: (optional) top-level fields left out of the hash.
+    :returns: an hex string.
+    """
+    return hashlib.sha1(_canonical(doc, ignore)).hexdigest()
+
+
+class FingerprintStore(object):
+    """
+    Mapping of integer ids to document digests, persisted in a binary file
+    of 28 bytes per document.
+    """
+    def __init__(self, entries=None):
+        self._entries = dict(entries or {})
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads the fingerprints saved at `path`.
+        """
+        with open(path, 'rb') as store_file:
+            magic, count = HEADER.unpack(store_file.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError('%s is not a fingerprints file' % path)
+            data = store_file.read(count * ENTRY.size)
+
+        if len(data) != count * ENTRY.size:
+            raise ValueError('%s is truncated' % path)
+
+        return cls(ENTRY.unpack_from(data, i * ENTRY.size) for i in range(count))
+
+    def save(self, path):
+        """
+        Saves the fingerprints to `path`, replacing it once written.
+        """
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as store_file:
+            store_file.write(HEADER.pack(MAGIC, len(self._entries)))
+            for doc_id in sorted(self._entries):
+                store_file.write(ENTRY.pack(doc_id, self._entries[doc_id]))
+
+        os.rename(tmp_path, path)
+
+    def get(self, doc_id, default=None):
+        return self._entries.get(doc_id, default)
+
+    def __getitem__(self, doc_id):
+        return self._entries[doc_id]
+
+    def __setitem__(self, doc_id, digest):
+        self._entries[doc_id] = digest
+
+    def __delitem__(self, doc_id):
+        del self._entries[doc_id]
+
+    def __contains__(self, doc_id):
+        return doc_id in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def ids(self):
+        """
+        The ids of the documents, in order.
+        """
+        return sorted(self._entries)
+
+
+class ChangeDetector(object):
+    """
+    Compares harvests against the fingerprints of the previous one, kept
+    at `path`.
+
+    :param path: the fingerprints file. It is created on :meth:`save` if missing, i.e. on the first harvest, when all documents are new.
+    :param ignore: (optional) top-level fields left out of the fingerprints, e.g. `updated`.
+    :param id_field: (optional) the field with the integer id of the documents. Defaults to `id`.
+    """
+    def __init__(self, path, ignore=None, id_field='id'):
+        self.path = path
+        self.ignore = frozenset(ignore or ())
+        self.id_field = id_field
+
+        if os.path.exists(path):
+            self.previous = FingerprintStore.load(path)
+        else:
+            self.previous = FingerprintStore()
+
+        # starts as the previous harvest, so documents not seen by a partial
+        # harvest keep their fingerprints.
+        self.current = FingerprintStore(self.previous._entries)
+
+    def changes(self, docs, deletions=True):
+        """
+        Fingerprints `docs`, producing a :class:`Change` for each document
+        new or changed since the previous harvest. Then, if `deletions`,
+        a :class:`Change` for each document of the previous harvest that
+        was not in `docs`.
+
+        :param docs: an iterable of documents, e.g. from :meth:`scieloapi.Connector.iter_docs`.
+        :param deletions: (optional) if deletions should be produced. Must be `False` for partial harvests, e.g. filtered. Defaults to `True`.
+        """
+        seen = set()
+        for doc in docs:
+            doc_id = int(doc[self.id_field])
+            digest = _digest(doc, self.ignore)
+            seen.add(doc_id)
+            self.current[doc_id] = digest
+
+            previous = self.previous.get(doc_id)
+            if previous is None:
+                yield Change(NEW, doc_id, doc)
+            elif previous != digest:
+                yield Change(CHANGED, doc_id, doc)
+
+        if deletions:
+            for doc_id in self.previous.ids():
+                if doc_id not in seen:
+                    del self.current[doc_id]
+                    yield Change(DELETED, doc_id, None)
+
+    def save(self):
+        """
+        Saves the fingerprints of the current harvest, to be compared
+        against by the next one.
+        """
+        self.current.save(self.path)
@@ -0,0 +1,307 @@
+# coding: utf-8
+"""
+Command-line interface.
+
+Harvests endpoints concurrently, through a pooled connector, where each
+worker thread keeps its own connections alive, streaming their documents to a file per endpoint, as JSON lines or CSV, optionally
+compressed and rotated. See :mod:`scieloapi.exporters`::
+
+    $ scieloapi harvest journals issues --filter collection=brasil \\
+        --filter issues:publication_year=2013 --workers 8 --gzip --out dump/
+
+Filters are applied to all endpoints, unless prefixed by an endpoint name.
+The columns of CSV files are the fields of the endpoint schema, and other
+fields are written as JSON at the last column, `_extra`.
+Credentials are read from `--username` and `--api-key`, or from the
+`SCIELOAPI_USERNAME` and `SCIELOAPI_API_KEY` environment variables.
+
+With `--pagination keyset`, endpoints are paged ordered by id, after the
+last id of the previous page, so deep harvests do not slow down, and
+`auto` does so where the endpoint schema allows. See
+:class:`scieloapi.harvest.Harvester`.
+
+With `--adaptive`, the concurrent requests start low and grow up to
+`--workers` while the server responds timely, and are cut when it is
+overloaded. See :class:`scieloapi.concurrency.AIMDController`.
+
+Each page written is checkpointed, and `--resume` continues an interrupted
+harvest appending to the existing files. Pages written right before an
+interruption may be written again.
+"""
+import os
+import sys
+import time
+import argparse
+
+from . import __version__
+from . import exceptions
+from .core import (Connector, ITEMS_PER_REQUEST, PAGINATION_STRATEGIES,
+                   TRASH_FILTERING_STRATEGIES)
+from .concurrency import AIMDController
+from .harvest import Harvester
+from .exporters import JSONLinesExporter, CSVExporter, COMPRESSIONS
+
+
+__all__ = ['main']
+
+EXPORTERS = {'jsonl': JSONLinesExporter, 'csv': CSVExporter}
+COMPRESSED_EXTENSIONS = {'gzip': '.gz', 'xz': '.xz'}
+
+
+class UsageError(Exception):
+    """
+    Raised on invalid command-line arguments.
+    """
+
+
+def positive_int(value):
+    """
+    Parses a positive integer argument.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+
+    if number < 1:
+        raise argparse.ArgumentTypeError('must be a positive integer: %s' % value)
+    return number
+
+
+def parse_filters(specs, endpoints):
+    """
+    Parses filters in the form `field=value` or `endpoint:field=value`
+    to a mapping of endpoint names to query string params.
+
+    :param specs: a list of filter specs.
+    :param endpoints: the endpoints being harvested.
+    """
+    filters = {}
+    for spec in specs:
+        name, sep, value = spec.partition('=')
+        if not sep or not name:
+            raise UsageError('invalid filter %s. Use field=value or endpoint:field=value' % spec)
+
+        if ':' in name:
+            endpoint, name = name.split(':', 1)
+            if endpoint not in endpoints:
+                raise UsageError('filter for an endpoint not harvested: %s' % spec)
+            targets = [endpoint]
+        else:
+            targets = endpoints
+
+        for endpoint in targets:
+            filters.setdefault(endpoint, {})[name] = value
+
+    return filters
+
+
+class EndpointOutput(object):
+    """
+    Writes the pages of an endpoint with an exporter, and checkpoints
+    their offsets to a `.progress` file alongside.
+    """
+    def __init__(self, exporter, resume=False):
+        self.exporter = exporter
+        self.progress_path = exporter.path + '.progress'
+
+        self.done = set()
+        if resume and os.path.exists(self.progress_path):
+            with open(self.progress_path) as progress_file:
+                self.done = set(int(line) for line in progress_file if line.strip())
+
+        self._progress = open(self.progress_path, 'a' if resume else 'w')
+
+    def write_page(self, offset, docs):
+        self.exporter.write_many(docs)
+
+        # the page must hit the disk before it is checkpointed.
+        self.exporter.flush()
+        self._progress.write('%s\n' % offset)
+        self._progress.flush()
+
+    def close(self):
+        self.exporter.close()
+        self._progress.close()
+
+
+def _format_bytes(count):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if count < 1024 or unit == 'GB':
+            return '%.1f %s' % (count, unit)
+        count /= 1024.0
+
+
+def _report(out, name, stats):
+    out.write('%s: %s records, %s in %.1fs (%.1f records/s, %s/s)\n' % (
+        name, stats['records'], _format_bytes(stats['bytes']), stats['elapsed'],
+        stats['records_per_second'], _format_bytes(stats['bytes_per_second'])))
+
+
+def _schema_fields(connector, endpoint):
+    """
+    Gets the CSV columns of `endpoint`, the fields of its schema, or `None`
+    if the schema has none, so the columns are taken from the documents.
+    """
+    fields = connector.get_schema(endpoint).get('fields')
+    return sorted(fields) if isinstance(fields, dict) and fields else None
+
+
+def _make_exporter(args, endpoint, connector):
+    exporter_class = EXPORTERS[args.format]
+    compression = args.compress or ('gzip' if args.gzip else None)
+    filename = '%s.%s%s' % (endpoint, exporter_class.extension,
+                            COMPRESSED_EXTENSIONS.get(compression, ''))
+
+    options = {}
+    if exporter_class is CSVExporter:
+        options['fields'] = _schema_fields(connector, endpoint)
+
+    return exporter_class(os.path.join(args.out, filename),
+                          compression=compression,
+                          max_records=args.max_records,
+                          max_bytes=args.max_bytes,
+                          batch_size=ITEMS_PER_REQUEST,
+                          append=args.resume,
+                          **options)
+
+
+def harvest(args, connector, out=None):
+    """
+    Runs the `harvest` command. Throughput stats are written to `out`,
+    that defaults to stderr.
+    """
+    out = out if out is not None else sys.stderr
+    available = connector.get_endpoints()
+    endpoints = args.endpoints or sorted(available)
+    unknown = [endpoint for endpoint in endpoints if endpoint not in available]
+    if unknown:
+        raise UsageError('unknown endpoints: %s' % ', '.join(unknown))
+
+    filters = parse_filters(args.filter, endpoints)
+    if args.pagination != 'offset':
+        connector.pagination.update((endpoint, args.pagination) for endpoint in endpoints)
+
+    if not os.path.isdir(args.out):
+        os.makedirs(args.out)
+
+    outputs = {}
+    started = time.time()
+    try:
+        for endpoint in endpoints:
+            try:
+                exporter = _make_exporter(args, endpoint, connector)
+            except ValueError as e:
+                raise UsageError(str(e))
+            outputs[endpoint] = EndpointOutput(exporter, resume=args.resume)
+
+        harvester = Harvester(connector, endpoints,
+                              filters=filters,
+                              workers=args.workers,
+                              limit=ITEMS_PER_REQUEST,
+                              skip=dict((endpoint, output.done)
+                                        for endpoint, output in outputs.items()))
+
+        for endpoint, offset, docs in harvester.pages():
+            outputs[endpoint].write_page(offset, docs)
+    finally:
+        for output in outputs.values():
+            output.close()
+
+        if not args.quiet and outputs:
+            total = {'records': 0, 'bytes': 0, 'elapsed': time.time() - started}
+            for endpoint in endpoints:
+                if endpoint in outputs:
+                    stats = outputs[endpoint].exporter.stats
+                    _report(out, endpoint, stats)
+                    total['records'] += stats['records']
+                    total['bytes'] += stats['bytes']
+
+            elapsed = total['elapsed']
+            total['records_per_second'] = total['records'] / elapsed if elapsed > 0 else 0.0
+            total['bytes_per_second'] = total['bytes'] / elapsed if elapsed > 0 else 0.0
+            _report(out, 'total', total)
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog='scieloapi',
+        description='Command-line client of the SciELO Manager API.')
+    parser.add_argument('--version', action='version', version='%(prog)s ' + __version__)
+    parser.add_argument('--username', default=os.environ.get('SCIELOAPI_USERNAME'),
+        help='defaults to $SCIELOAPI_USERNAME')
+    parser.add_argument('--api-key', default=os.environ.get('SCIELOAPI_API_KEY'),
+        help='defaults to $SCIELOAPI_API_KEY')
+    parser.add_argument('--api-uri', default=None,
+        help='if connecting to a non official instance of SciELO Manager')
+    commands = parser.add_subparsers(dest='command')
+
+    harvest_parser = commands.add_parser('harvest',
+        help='harvest endpoints to files, one per endpoint')
+    harvest_parser.add_argument('endpoints', nargs='*',
+        help='endpoints to harvest. Defaults to all')
+    harvest_parser.add_argument('--filter', action='append', default=[],
+        metavar='[ENDPOINT:]FIELD=VALUE', help='filtering criteria. Can be repeated')
+    harvest_parser.add_argument('--workers', type=positive_int, default=4,
+        help='number of concurrent requests. Defaults to 4')
+    harvest_parser.add_argument('--adaptive', action='store_true',
+        help='adapt the concurrent requests to the capacity of the server, up to --workers')
+    harvest_parser.add_argument('--format', choices=sorted(EXPORTERS), default='jsonl',
+        help='output format. Defaults to jsonl')
+    harvest_parser.add_argument('--compress', choices=[c for c in COMPRESSIONS if c],
+        help='compress the output files')
+    harvest_parser.add_argument('--gzip', action='store_true',
+        help='same as --compress gzip')
+    harvest_parser.add_argument('--max-records', type=positive_int, default=None,
+        help='rotate the output files after this number of records')
+    harvest_parser.add_argument('--max-bytes', type=positive_int, default=None,
+        help='rotate the output files after this size, before compression')
+    harvest_parser.add_argument('--out', default='.',
+        help='output directory. Defaults to the current directory')
+    harvest_parser.add_argument('--resume', action='store_true',
+        help='continue an interrupted harvest')
+    harvest_parser.add_argument('--pagination', choices=PAGINATION_STRATEGIES,
+        default='offset', help='how pages are requested. Defaults to offset')
+    harvest_parser.add_argument('--trash-filtering', choices=TRASH_FILTERING_STRATEGIES,
+        default='client', help='where trashed documents are filtered out. Defaults to client')
+    harvest_parser.add_argument('--quiet', action='store_true',
+        help='do not print throughput stats')
+
+    return parser
+
+
+def main(argv=None, connector_dep=Connector):
+    """
+    Entry point of the `scieloapi` command.
+
+    :param argv: (optional) the command-line arguments. Defaults to `sys.argv[1:]`.
+    :returns: the exit status.
+    """
+    parser = make_parser()
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        parser.error('a command is required')
+    if not args.username or not args.api_key:
+        parser.error('credentials are required: --username and --api-key')
+
+    options = {}
+    if args.trash_filtering != 'client':
+        options['trash_filtering'] = args.trash_filtering
+    if args.adaptive:
+        options['concurrency'] = AIMDController(initial=min(4, args.workers),
+                                                maximum=args.workers)
+
+    connector = connector_dep(args.username, args.api_key, api_uri=args.api_uri,
+                              pooled=True, **options)
+    try:
+        harvest(args, connector)
+    except UsageError as e:
+        parser.error(str(e))
+    except exceptions.APIError as e:
+        sys.stderr.write('scieloapi: error: %s\n' % e)
+        return 1
+    except KeyboardInterrupt:
+        sys.stderr.write('scieloapi: interrupted. Use --resume to continue.\n')
+        return 130
+
+    return 0
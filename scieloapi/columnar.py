@@ -0,0 +1,136 @@
+# coding: utf-8
+"""
+Column-oriented batches of documents, for analytics workloads.
+
+Each batch is a dict mapping field names to the values of that field in
+all documents of a page, in order. Numeric and boolean fields are stored
+in typed :class:`array.array` instances, that are compact and can be
+consumed by vectorized libraries without copies, e.g. with
+``numpy.frombuffer``. Other fields, and fields with missing values, are
+stored in lists::
+
+    >>> issues = cli.query('issues')
+    >>> columns = columnar.accumulate(issues.columns(fields=['id', 'publication_year']))
+    >>> sum(columns['publication_year']) / len(columns['id'])
+"""
+import array
+import numbers
+
+
+__all__ = ['to_columns', 'accumulate', 'typecodes_from_schema']
+
+# array typecodes of the Tastypie's field types.
+SCHEMA_TYPECODES = {
+    'integer': 'l',
+    'float': 'd',
+    'boolean': 'b',
+}
+
+
+def typecodes_from_schema(schema):
+    """
+    Maps the numeric and boolean fields of an endpoint schema to array
+    typecodes. Nullable fields are not mapped.
+
+    :param schema: the endpoint schema, as returned by the API at `<endpoint>/schema/`.
+    """
+    typecodes = {}
+    for name, field in schema.get('fields', {}).items():
+        typecode = SCHEMA_TYPECODES.get(field.get('type'))
+        if typecode and not field.get('nullable'):
+            typecodes[name] = typecode
+
+    return typecodes
+
+
+def _infer_typecode(values):
+    if not values:
+        return None
+    elif all(isinstance(value, bool) for value in values):
+        return 'b'
+    elif all(isinstance(value, numbers.Integral) and not isinstance(value, bool)
+             for value in values):
+        return 'l'
+    elif all(isinstance(value, float) for value in values):
+        return 'd'
+
+    return None
+
+
+def _column(values, typecode):
+    if typecode is None or None in values:
+        return values
+
+    try:
+        return array.array(typecode, values)
+    except (TypeError, OverflowError):
+        return values
+
+
+def to_columns(docs, fields=None, typecodes=None):
+    """
+    Pivots `docs` to columns.
+
+    :param docs: an iterable of documents.
+    :param fields: (optional) the fields to be produced. By default, all fields of all documents.
+    :param typecodes: (optional) a mapping of field names to array typecodes. By default, typecodes are inferred from the values.
+    :returns: a dict mapping field names to arrays or lists. Missing values are `None`.
+    """
+    docs = list(docs)
+    typecodes = typecodes or {}
+
+    if fields is None:
+        names = set()
+        for doc in docs:
+            names.update(doc.keys())
+        fields = sorted(names)
+
+    columns = {}
+    for field in fields:
+        values = [doc.get(field) for doc in docs]
+        typecode = typecodes.get(field) or _infer_typecode(values)
+        columns[field] = _column(values, typecode)
+
+    return columns
+
+
+def _extend(column, values):
+    """
+    Appends `values` to `column`, turning the column into a list if
+    the values do not fit it.
+    """
+    if isinstance(column, array.array):
+        if isinstance(values, array.array) and values.typecode == column.typecode:
+            column.extend(values)
+            return column
+        column = column.tolist()
+
+    column.extend(values)
+    return column
+
+
+def accumulate(batches):
+    """
+    Concatenates column-oriented batches, as produced by :func:`to_columns`.
+
+    Fields missing from some batches are filled with `None`.
+
+    :param batches: an iterable of batches.
+    :returns: a dict mapping field names to arrays or lists.
+    """
+    columns = {}
+    rows = 0
+    for batch in batches:
+        size = max([len(values) for values in batch.values()] or [0])
+
+        for field in set(columns) - set(batch):
+            columns[field] = _extend(columns[field], [None] * size)
+
+        for field, values in batch.items():
+            if field not in columns:
+                columns[field] = [None] * rows if rows else values[:0]
+            columns[field] = _extend(columns[field], values)
+
+        rows += size
+
+    return columns
@@ -0,0 +1,319 @@
+# coding: utf-8
+"""
+Helpers to dispatch requests concurrently, and an adaptive limit of
+concurrent requests.
+
+An :class:`AIMDController` passed to :class:`scieloapi.Connector` via the
+`concurrency` kwarg caps the requests in flight of all its threads, e.g.
+of :meth:`scieloapi.Client.harvest`, :meth:`scieloapi.Client.fetch_relations_many`
+and :meth:`scieloapi.Endpoint.post_many`, and adapts the cap to the
+capacity of the server::
+
+    >>> from scieloapi.concurrency import AIMDController
+    >>> controller = AIMDController(maximum=16, instrumentation=[metrics])
+    >>> cli = Client('some.user', 'some.apikey', concurrency=controller)
+    >>> for endpoint, doc in cli.harvest(['journals', 'issues']):
+    ...     print controller.limit
+
+Thread pools of those methods default to `maximum` threads, and the
+threads above the current limit wait for a free slot.
+"""
+import time
+import threading
+
+try:
+    import queue
+except ImportError:  # python 2
+    import Queue as queue
+
+from . import exceptions
+
+
+__all__ = ['map_threaded', 'prefetch', 'AIMDController']
+
+# marks the end of the work for a worker thread.
+_STOP = object()
+
+DEFAULT_WORKERS = 4
+
+# name of the background threads of `prefetch`.
+PREFETCH_THREAD_NAME = 'scieloapi-prefetch'
+
+# errors that tell the server is overloaded.
+OVERLOAD_ERRORS = (exceptions.ServiceUnavailable, exceptions.Timeout)
+
+
+def pool_size(workers=None, controller=None):
+    """
+    Number of worker threads: `workers` if given, or enough threads to
+    reach the maximum limit of `controller`.
+    """
+    if workers is not None:
+        return workers
+    return controller.maximum if controller is not None else DEFAULT_WORKERS
+
+
+def map_threaded(func, items, workers=4, errors=(exceptions.APIError,)):
+    """
+    Calls `func` for each item of `items` using a pool of worker threads.
+
+    The results are returned in the same order of `items`. If `func` raises
+    one of `errors`, the exception instance takes the place of the result.
+    Any other exception is re-raised after all items are processed.
+
+    :param func: callable that takes one item.
+    :param items: an iterable.
+    :param workers: (optional) number of worker threads. Defaults to 4.
+    :param errors: (optional) exception classes to be returned as results.
+    """
+    if workers < 1:
+        raise ValueError('workers must be a positive integer')
+
+    items = list(items)
+    results = [None] * len(items)
+    failures = []
+    tasks = queue.Queue()
+
+    for task in enumerate(items):
+        tasks.put(task)
+
+    def work():
+        while True:
+            task = tasks.get()
+            if task is _STOP:
+                return
+
+            index, item = task
+            try:
+                results[index] = func(item)
+            except errors as e:
+                results[index] = e
+            except Exception as e:
+                failures.append(e)
+
+    threads = []
+    for _ in range(min(workers, len(items))):
+        thread = threading.Thread(target=work)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+        tasks.put(_STOP)
+
+    for thread in threads:
+        thread.join()
+
+    if failures:
+        raise failures[0]
+
+    return results
+
+
+def _put(items, item, stop, full=queue.Full):
+    """
+    Puts `item` in the bounded queue `items`, unless `stop` is set
+    while waiting for a free slot.
+    """
+    # `full` is bound at definition, as daemon threads may still run
+    # while the modules are torn down at interpreter shutdown.
+    while not stop.is_set():
+        try:
+            items.put(item, timeout=0.1)
+            return True
+        except full:
+            continue
+
+    return False
+
+
+def prefetch(iterable, buffer=1):
+    """
+    Iterates over `iterable` in a background thread, keeping up to `buffer`
+    items ready ahead of the consumer.
+
+    It overlaps the production of the next items, e.g. downloading the next
+    page, with the processing of the current one. Exceptions raised by
+    `iterable` are re-raised to the consumer. The background thread stops
+    when the consumer stops iterating, without pulling another item, and
+    closes `iterable` if it is a generator.
+
+    :param iterable: an iterable.
+    :param buffer: (optional) max number of items produced ahead. Defaults to 1.
+    """
+    if buffer < 1:
+        raise ValueError('buffer must be a positive integer')
+
+    items = queue.Queue(maxsize=buffer)
+    stop = threading.Event()
+
+    def produce():
+        iterator = None
+        try:
+            iterator = iter(iterable)
+            while not stop.is_set():
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    _put(items, (False, _STOP), stop)
+                    return
+
+                if not _put(items, (True, item), stop):
+                    return
+        except Exception as e:
+            _put(items, (False, e), stop)
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name=PREFETCH_THREAD_NAME)
+    thread.daemon = True
+    thread.start()
+
+    try:
+        while True:
+            produced, item = items.get()
+            if produced:
+                yield item
+            elif item is _STOP:
+                return
+            else:
+                raise item
+    finally:
+        stop.set()
+
+
+class AIMDController(object):
+    """
+    Limit of concurrent requests, adapted by additive increase and
+    multiplicative decrease (AIMD), as in TCP congestion control.
+
+    Requests completed within `latency_target` seconds raise the limit by
+    `increase` for each limit's worth of them, i.e. by about `increase`
+    per round of requests in flight. Slower requests hold the limit.
+    Requests failing with :class:`scieloapi.exceptions.ServiceUnavailable`
+    or :class:`scieloapi.exceptions.Timeout` multiply the limit by
+    `decrease`, once per round: failures of requests dispatched before the
+    last cut do not cut it again.
+
+    Changes of the limit are notified to the `concurrency_limit` hook of
+    the instrumentation, with events with the keys `controller`, `limit`,
+    `previous`, `in_flight` and `reason`, i.e. `initial`, `increase` or
+    `decrease`.
+
+    :param initial: (optional) the initial limit. Defaults to 4.
+    :param minimum: (optional) Defaults to 1.
+    :param maximum: (optional) Defaults to 32.
+    :param increase: (optional) Defaults to 1.
+    :param decrease: (optional) factor applied to the limit when the server is overloaded. Defaults to 0.5.
+    :param latency_target: (optional) seconds within which requests are healthy. Defaults to 1.0.
+    :param instrumentation: (optional) a list of :class:`scieloapi.instrumentation.Instrumentation` instances.
+    :param name: (optional) identifies the controller at the events. Defaults to `default`.
+    """
+    def __init__(self, initial=4, minimum=1, maximum=32, increase=1, decrease=0.5,
+                 latency_target=1.0, instrumentation=None, name='default'):
+        if not 1 <= minimum <= initial <= maximum:
+            raise ValueError('limits must satisfy 1 <= minimum <= initial <= maximum')
+        if not 0 < decrease < 1:
+            raise ValueError('decrease must be between 0 and 1')
+
+        # dependencies
+        self._time = time
+
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.instrumentation = list(instrumentation or [])
+        self.name = name
+
+        self._limit = float(initial)
+        self._in_flight = 0
+        # incremented at each cut, to tell the rounds of requests apart.
+        self._round = 0
+        self._cond = threading.Condition()
+
+        self._emit(self._event(initial, initial, 'initial'))
+
+    @property
+    def limit(self):
+        """
+        The current limit of concurrent requests.
+        """
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        """
+        The number of requests in flight.
+        """
+        return self._in_flight
+
+    def _event(self, limit, previous, reason):
+        return {'controller': self.name, 'limit': limit, 'previous': previous,
+                'in_flight': self._in_flight, 'reason': reason}
+
+    def _emit(self, event):
+        if event is None:
+            return
+        for instrument in self.instrumentation:
+            instrument.concurrency_limit(event)
+
+    def acquire(self):
+        """
+        Waits for a free slot and takes it.
+
+        :returns: a token to be passed to :meth:`release`.
+        """
+        with self._cond:
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+            return self._round
+
+    def release(self, token, latency=None, overloaded=False):
+        """
+        Frees the slot taken by :meth:`acquire`, adapting the limit.
+
+        :param token: returned by :meth:`acquire`.
+        :param latency: (optional) seconds the request took, if completed.
+        :param overloaded: (optional) if the server was overloaded. Defaults to `False`.
+        """
+        event = None
+        with self._cond:
+            self._in_flight -= 1
+            previous = int(self._limit)
+
+            if overloaded:
+                if token == self._round:
+                    self._round += 1
+                    self._limit = max(self.minimum, self._limit * self.decrease)
+                    event = self._event(int(self._limit), previous, 'decrease')
+            elif latency is not None and latency <= self.latency_target:
+                self._limit = min(self.maximum, self._limit + self.increase / self._limit)
+                if int(self._limit) != previous:
+                    event = self._event(int(self._limit), previous, 'increase')
+
+            self._cond.notify_all()
+
+        if event is not None and event['limit'] == event['previous']:
+            event = None
+        self._emit(event)
+
+    def call(self, func, *args, **kwargs):
+        """
+        Calls `func` within a slot, adapting the limit to its outcome.
+        """
+        token = self.acquire()
+        started = self._time.time()
+        try:
+            result = func(*args, **kwargs)
+        except OVERLOAD_ERRORS:
+            self.release(token, overloaded=True)
+            raise
+        except BaseException:
+            self.release(token)
+            raise
+
+        self.release(token, latency=self._time.time() - started)
+        return result
@@ -1,11 +1,21 @@
 # coding: utf-8
 import re
 import logging
+import sys
 import time
 import functools
+import importlib
+import threading
 
 from . import httpbroker
 from . import exceptions
+from . import harvest
+from . import concurrency
+from . import records
+from . import columnar
+from . import cache as cache_module
+from .query import QuerySet
+from .interning import InternTable
 
 
 logger = logging.getLogger(__name__)
@@ -13,6 +23,69 @@ logger = logging.getLogger(__name__)
 ITEMS_PER_REQUEST = 50
 API_VERSIONS = ('v1',)
 RESOURCE_PATH_PATTERN = re.compile(r'/api/(\w+)/(\w+)/(\d+)/')
+PAGINATION_STRATEGIES = ('offset', 'keyset', 'auto')
+TRASH_FILTERING_STRATEGIES = ('client', 'server', 'auto')
+# Tastypie's ALL and ALL_WITH_RELATIONS filtering constants.
+ALL_FILTERS = (1, 2)
+DANGLING_STRATEGIES = ('raise', 'keep', 'null')
+# max number of entries of the caches of parsed resource URIs and of
+# resources not found, kept by Client instances.
+CLIENT_CACHE_SIZE = 10000
+
+
+def _count_objects(response):
+    """
+    Counts the objects decoded from a response body.
+    """
+    if isinstance(response, dict):
+        objects = response.get('objects')
+        return len(objects) if isinstance(objects, list) else 1
+
+    return None
+
+
+def supports_keyset(schema):
+    """
+    Checks if an endpoint, given its schema, can be ordered by `id` and
+    filtered by `id__gt`, as required by keyset pagination.
+    """
+    id_filters = schema.get('filtering', {}).get('id')
+    filterable = id_filters in ALL_FILTERS or 'gt' in (id_filters or ())
+    return filterable and 'id' in schema.get('ordering', ())
+
+
+def supports_trash_filtering(schema):
+    """
+    Checks if an endpoint, given its schema, can be filtered by `is_trashed`.
+    """
+    trash_filters = schema.get('filtering', {}).get('is_trashed')
+    return trash_filters in ALL_FILTERS or 'exact' in (trash_filters or ())
+
+
+class Page(object):
+    """
+    A page of documents, as produced by :meth:`Connector.iter_pages`.
+
+    Iterating over a page produces its documents.
+
+    :param objects: the list of documents.
+    :param meta: a dict with the keys `offset`, `limit`, `total_count` and `next`, as returned by the API, and `elapsed`, the seconds spent fetching the page.
+    """
+    __slots__ = ('objects', 'meta')
+
+    def __init__(self, objects, meta):
+        self.objects = objects
+        self.meta = meta
+
+    def __iter__(self):
+        return iter(self.objects)
+
+    def __len__(self):
+        return len(self.objects)
+
+    def __repr__(self):
+        return '<Page offset=%s objects=%s total_count=%s>' % (
+            self.meta.get('offset'), len(self.objects), self.meta.get('total_count'))
 
 
 class Connector(object):
@@ -25,22 +98,62 @@ class Connector(object):
     :param version: (optional) by default the newest version is used.
     :param http_broker: (optional) a module to deal with http stuff. The reference API is implemented at :mod:`scieloapi.httpbroker`.
     :param check_ca: (optional) if certification authority should be checked during ssl sessions. Defaults to `False`.
+    :param pooled: (optional) if connections should be kept alive and reused between requests. The http broker must implement `new_session`. Defaults to `False`.
+    :param instrumentation: (optional) a list of :class:`scieloapi.instrumentation.Instrumentation` instances, notified about the lifecycle of each request. The http broker must accept the `trace` kwarg.
+    :param tracing: (optional) if the time spent on each phase of the requests should be recorded, even if not instrumented. See :attr:`last_trace`. Defaults to `False`.
+    :param interning: (optional) if strings repeated across decoded documents should be shared as a single object. Takes `True` or an instance of :class:`scieloapi.interning.InternTable`. The http broker must accept the `object_pairs_hook` kwarg. Defaults to `False`.
+    :param pagination: (optional) a mapping of endpoint names to the pagination strategy used by :meth:`iter_pages`: `offset`, `keyset` or `auto`, that uses keyset pagination if the endpoint schema supports it. Endpoints not mapped use `offset`.
+    :param trash_filtering: (optional) where trashed documents are filtered out: `client`, after they are downloaded, `server`, by the `is_trashed` filter, or `auto`, that uses the filter if the endpoint schema supports it. Defaults to `client`.
+    :param cache: (optional) a :class:`scieloapi.cache.Cache` that answers GET requests according to its policy, e.g. serving stale data while the API is down. See :attr:`last_freshness`.
+    :param concurrency: (optional) a :class:`scieloapi.concurrency.AIMDController` that limits the requests in flight of all threads, adapting the limit to the capacity of the server.
+
+    Instances can be pickled, e.g. to be sent to other processes. Pooled
+    connections, instrumentation, caches and concurrency controllers are not
+    shared: each unpickled instance creates its own session, and is neither
+    instrumented, cached nor limited.
     """
     # caches endpoints definitions
     _cache = {}
 
     def __init__(self, username, api_key, api_uri=None,
-                 version=None, http_broker=None, check_ca=False):
+                 version=None, http_broker=None, check_ca=False, pooled=False,
+                 instrumentation=None, tracing=False, interning=False,
+                 pagination=None, trash_filtering='client', cache=None,
+                 concurrency=None):
         # dependencies
         self._time = time
 
-        if http_broker:
+        if http_broker is not None:
             _httpbroker = http_broker
         else:
             _httpbroker = httpbroker  # module
 
         # setup
+        self._httpbroker = _httpbroker
         self.check_ca = check_ca
+        self.pooled = pooled
+        self.instrumentation = list(instrumentation or [])
+        self.tracing = tracing
+        self._local = threading.local()
+
+        if interning is True:
+            interning = InternTable()
+        self.intern_table = interning if isinstance(interning, InternTable) else None
+
+        self.pagination = dict(pagination or {})
+        for strategy in self.pagination.values():
+            if strategy not in PAGINATION_STRATEGIES:
+                raise ValueError('unknown pagination strategy %s. Supported are: %s' % (
+                    strategy, ', '.join(PAGINATION_STRATEGIES)))
+
+        if trash_filtering not in TRASH_FILTERING_STRATEGIES:
+            raise ValueError('unknown trash filtering strategy %s. Supported are: %s' % (
+                trash_filtering, ', '.join(TRASH_FILTERING_STRATEGIES)))
+        self.trash_filtering = trash_filtering
+        self._schemas = {}
+        self.cache = cache
+        self.concurrency = concurrency
+
         self.api_uri = api_uri if api_uri else r'http://manager.scielo.org/api/'
 
         if version :
@@ -65,14 +178,52 @@ class Connector(object):
         :param username: valid username that has access to manager.scielo.org.
         :param api_key: its respective api key.
         """
+        optionals = {}
+        if self.pooled:
+            optionals['session'] = broker.new_session()
+
+        get_optionals = dict(optionals)
+        if self.intern_table is not None:
+            get_optionals['object_pairs_hook'] = self.intern_table
+
         bound_get = functools.partial(broker.get, auth=(username, api_key),
-            check_ca=self.check_ca)
+            check_ca=self.check_ca, **get_optionals)
         bound_post = functools.partial(broker.post, auth=(username, api_key),
-            check_ca=self.check_ca)
+            check_ca=self.check_ca, **optionals)
 
         setattr(self, '_http_get', bound_get)
         setattr(self, '_http_post', bound_post)
 
+    def __getstate__(self):
+        """
+        Only the configuration is pickled. Modules are pickled by name.
+        """
+        username, api_key = self._http_get.keywords['auth']
+        broker = self._httpbroker
+        if isinstance(broker, type(sys)):
+            broker = broker.__name__
+
+        return {
+            'username': username,
+            'api_key': api_key,
+            'api_uri': self.api_uri[:-len(self.version + '/')],
+            'version': self.version,
+            'http_broker': broker,
+            'check_ca': self.check_ca,
+            'pooled': self.pooled,
+            'tracing': self.tracing,
+            'interning': self.intern_table if self.intern_table is not None else False,
+            'pagination': self.pagination,
+            'trash_filtering': self.trash_filtering,
+        }
+
+    def __setstate__(self, state):
+        state = dict(state)
+        if isinstance(state['http_broker'], str):
+            state['http_broker'] = importlib.import_module(state['http_broker'])
+
+        self.__init__(**state)
+
     def fetch_data(self, endpoint,
                          resource_id=None,
                          **kwargs):
@@ -83,19 +234,56 @@ class Connector(object):
         :param resource_id: (optional) an int representing the document.
         :param \*\*kwargs: (optional) params to be passed as query string.
         """
+        return self._fetch_cached(self._http_get, endpoint, resource_id, kwargs)
+
+    def _get_lazy_page(self, *args, **kwargs):
+        """
+        Gets a page of a list endpoint, with its objects as lazy records.
+        The http broker must accept the `raw` kwarg.
+        """
+        return records.parse_page(self._http_get(*args, raw=True, **kwargs))
+
+    def _fetch_cached(self, http_get, endpoint, resource_id, params, raw=False):
+        """
+        Same as :meth:`_fetch`, answered by the cache if configured.
+        """
+        if self.cache is None:
+            return self._fetch(http_get, endpoint, resource_id, params)
+
+        key = cache_module.request_key(self.api_uri, endpoint, resource_id, params, raw)
+        value, freshness = self.cache.fetch(
+            key, lambda: self._fetch(http_get, endpoint, resource_id, params))
+
+        self._local.freshness = freshness
+        if freshness['status'] != 'miss':
+            self._emit('cache_hit', {'method': 'GET', 'endpoint': endpoint,
+                                     'resource_id': resource_id, 'params': params,
+                                     'freshness': freshness})
+        return value
+
+    def _fetch(self, http_get, endpoint, resource_id, params):
+        """
+        Dispatches `http_get`, retrying on connection errors.
+        """
         err_count = 0
 
         while True:
+            event = {'method': 'GET', 'endpoint': endpoint,
+                     'resource_id': resource_id, 'params': params,
+                     'attempt': err_count + 1}
             try:
-                response = self._http_get(self.api_uri,
+                response = self._dispatch(http_get, event,
+                                          self.api_uri,
                                           endpoint=endpoint,
                                           resource_id=resource_id,
-                                          params=kwargs)
+                                          params=params)
 
             except (exceptions.ConnectionError, exceptions.ServiceUnavailable) as e:
                 if err_count < 10:
                     wait_secs = err_count * 5
                     logger.info('%s. Waiting %ss to retry.' % (e, wait_secs))
+                    event['wait'] = wait_secs
+                    self._emit('retry', event)
                     self._time.sleep(wait_secs)
                     err_count += 1
                     continue
@@ -107,37 +295,291 @@ class Connector(object):
                 err_count = 0
                 return response
 
-    def iter_docs(self, endpoint, **kwargs):
+    def _emit(self, hook, event):
+        """
+        Notifies all instrumentation about `event`.
+
+        :param hook: name of the :class:`scieloapi.instrumentation.Instrumentation` method.
+        :param event: a dict describing the event.
+        """
+        for instrument in self.instrumentation:
+            getattr(instrument, hook)(event)
+
+    @property
+    def last_trace(self):
+        """
+        Details about the last request dispatched by the current thread, if
+        tracing or instrumentation are enabled.
+
+        It is a dict with the keys `status`, `bytes` and `timings`. The latter
+        has the seconds spent on each phase of the request: `ttfb`, `download`,
+        `decode` and `total`. See :func:`scieloapi.httpbroker._trace_response`.
+        Failed requests have their trace attached to the exception raised,
+        as the `trace` attribute.
+        """
+        return getattr(self._local, 'trace', None)
+
+    @property
+    def last_freshness(self):
+        """
+        Freshness of the data served by the last GET request of the current
+        thread, if a cache is configured. It is a dict with the keys
+        `status`, i.e. `hit`, `stale`, `miss` or `offline`, `age`, in
+        seconds, and `stored_at`. See :mod:`scieloapi.cache`.
+        """
+        return getattr(self._local, 'freshness', None)
+
+    def _dispatch(self, http_method, event, *args, **kwargs):
+        """
+        Calls `http_method` within a slot of the concurrency controller,
+        if configured. See :meth:`_dispatch_request`.
+        """
+        if self.concurrency is None:
+            return self._dispatch_request(http_method, event, *args, **kwargs)
+
+        return self.concurrency.call(self._dispatch_request, http_method, event,
+                                     *args, **kwargs)
+
+    def _dispatch_request(self, http_method, event, *args, **kwargs):
+        """
+        Calls `http_method`, notifying the instrumentation about the
+        request lifecycle.
+
+        :param http_method: one of the bound http methods.
+        :param event: a dict describing the request.
+        """
+        if not (self.instrumentation or self.tracing):
+            return http_method(*args, **kwargs)
+
+        trace = self._local.trace = {}
+        self._emit('before_request', event)
+        started = time.time()
+        try:
+            response = http_method(*args, trace=trace, **kwargs)
+        except exceptions.APIError as e:
+            elapsed = time.time() - started
+            trace.setdefault('timings', {})['total'] = elapsed
+            e.trace = trace
+
+            event.update(trace, elapsed=elapsed, error=e)
+            event.setdefault('status', e.status_code)
+            self._emit('error', event)
+            raise
+
+        elapsed = time.time() - started
+        trace.setdefault('timings', {})['total'] = elapsed
+
+        event.update(trace, elapsed=elapsed, objects=_count_objects(response))
+        self._emit('after_response', event)
+        return response
+
+    def iter_docs(self, endpoint, shard=None, lazy=False, include_trashed=False,
+                  pagination=None, **kwargs):
         """
         Iterates over all documents of a given endpoint and collection.
 
         :param endpoint: must be a valid endpoint at http://manager.scielo.org/api/v1/
+        :param shard: (optional) a shard spec from :mod:`scieloapi.sharding`, to harvest only a slice of the endpoint.
+        :param lazy: (optional) if documents should be produced as :class:`scieloapi.records.LazyRecord`, that decode their fields on access. The http broker must accept the `raw` kwarg. Defaults to `False`.
+        :param include_trashed: (optional) if trashed documents should be produced too. Defaults to `False`.
+        :param pagination: (optional) overrides the pagination strategy of the endpoint. See :meth:`iter_pages`.
         :param \*\*kwargs: are passed thru the request as query string params
 
         Note that you need a valid API KEY in order to query the
         Manager API. Read more at: http://ref.scielo.org/ddkpmx
         """
-        offset = 0
+        for page in self.iter_pages(endpoint, shard=shard, lazy=lazy,
+                                    include_trashed=include_trashed,
+                                    pagination=pagination, **kwargs):
+            for obj in page:
+                yield obj
+
+    def iter_pages(self, endpoint, shard=None, lazy=False, include_trashed=False,
+                   pagination=None, **kwargs):
+        """
+        Iterates over all pages of documents of a given endpoint and collection.
+
+        Each page is an instance of :class:`Page`, with its non-trashed
+        documents and `meta`, e.g. to write documents in batches or
+        to report progress.
+
+        Pages are requested by offset, or by the last id of the previous
+        page for endpoints configured to use keyset pagination. See the
+        `pagination` param of :class:`Connector`. Keyset pagination orders
+        documents by `id`, so other orderings raise ValueError.
+
+        Trashed documents are filtered out as configured by the
+        `trash_filtering` param of :class:`Connector`. The ones filtered
+        out after being downloaded are counted at `meta['dropped']`.
+
+        :param endpoint: must be a valid endpoint at http://manager.scielo.org/api/v1/
+        :param shard: (optional) a shard spec from :mod:`scieloapi.sharding`, to harvest only a slice of the endpoint.
+        :param lazy: (optional) if documents should be produced as :class:`scieloapi.records.LazyRecord`. See :meth:`iter_docs`. Defaults to `False`.
+        :param include_trashed: (optional) if trashed documents should be produced too. Defaults to `False`.
+        :param pagination: (optional) overrides the pagination strategy of the endpoint, e.g. `offset` to harvest an offset range of an endpoint that uses keyset pagination.
+        :param \*\*kwargs: are passed thru the request as query string params
+        """
+        if pagination is not None and pagination not in ('offset', 'keyset'):
+            raise ValueError('unknown pagination strategy %s. Supported are: offset, keyset' %
+                             pagination)
+
+        if not include_trashed:
+            kwargs = dict(kwargs, **self.trash_params(endpoint))
+
+        if shard is None:
+            slices = [(kwargs, 0, None)]
+        else:
+            slices = shard.slices(self, endpoint, kwargs)
+
+        keyset = (pagination or self.pagination_strategy(endpoint)) == 'keyset'
+        for params, start, stop in slices:
+            if not keyset:
+                pages = self._iter_range(endpoint, params, start, stop, lazy,
+                                         include_trashed)
+            elif start == 0 and stop is None:
+                pages = self._iter_keyset(endpoint, params, lazy, include_trashed)
+            else:
+                raise ValueError('keyset pagination does not support offset ranges. '
+                                 'Use a FieldPartition shard spec, or pagination=\'offset\', instead.')
+
+            for page in pages:
+                yield page
+
+    def pagination_strategy(self, endpoint):
+        """
+        Resolves the pagination strategy of `endpoint`, `offset` or `keyset`.
+        The `auto` strategy is resolved once, from the endpoint schema.
+
+        :param endpoint: must be a valid endpoint at http://manager.scielo.org/api/v1/
+        """
+        strategy = self.pagination.get(endpoint, 'offset')
+        if strategy == 'auto':
+            strategy = 'keyset' if supports_keyset(self.get_schema(endpoint)) else 'offset'
+            self.pagination[endpoint] = strategy
+
+        return strategy
+
+    def get_schema(self, endpoint):
+        """
+        Gets the schema of `endpoint`. Schemas are fetched once per
+        instance, and shared by its :class:`Endpoint` instances.
+
+        :param endpoint: must be a valid endpoint at http://manager.scielo.org/api/v1/
+        """
+        if endpoint not in self._schemas:
+            self._schemas[endpoint] = self.fetch_data(endpoint, resource_id='schema')
+
+        return self._schemas[endpoint]
+
+    def trash_params(self, endpoint):
+        """
+        Gets the query string params that filter out trashed documents of
+        `endpoint` server side, if configured to. See the `trash_filtering`
+        param of :class:`Connector`.
+        """
+        filtering = self.trash_filtering
+        if filtering == 'auto':
+            filtering = 'server' if supports_trash_filtering(self.get_schema(endpoint)) else 'client'
+
+        return {'is_trashed': 'false'} if filtering == 'server' else {}
+
+    def _fetch_page(self, endpoint, qry_params, lazy):
+        """
+        Fetches a page, and measures the time spent on it.
+        """
+        started = time.time()
+        if lazy:
+            doc = self._fetch_cached(self._get_lazy_page, endpoint, None,
+                                     dict(qry_params), raw=True)
+        else:
+            doc = self.fetch_data(endpoint, **qry_params)
+
+        return doc, time.time() - started
+
+    def _make_page(self, endpoint, doc, meta, elapsed, include_trashed=False):
+        meta.update(doc['meta'])
+        meta['elapsed'] = elapsed
+        if self.cache is not None:
+            meta['freshness'] = self.last_freshness
+
+        objects = doc['objects']
+        if not include_trashed:
+            # we are interested only in non-trashed items.
+            objects = [obj for obj in objects if not obj.get('is_trashed')]
+
+        meta['dropped'] = len(doc['objects']) - len(objects)
+        if meta['dropped']:
+            self._emit('dropped', {'method': 'GET', 'endpoint': endpoint,
+                                   'dropped': meta['dropped']})
+
+        return Page(objects, meta)
+
+    def _iter_range(self, endpoint, params, start=0, stop=None, lazy=False,
+                    include_trashed=False):
+        """
+        Iterates over the pages from offset `start` to `stop`.
+        When `stop` is `None`, it goes until the last document.
+        """
+        offset = start
         limit = ITEMS_PER_REQUEST
 
         qry_params = {'limit': limit}
-        qry_params.update(kwargs)
+        qry_params.update(params)
 
-        while True:
-            qry_params.update({'offset': offset})
-            doc = self.fetch_data(endpoint, **qry_params)
+        while stop is None or offset < stop:
+            if stop is not None:
+                qry_params.update({'limit': min(limit, stop - offset)})
 
-            for obj in doc['objects']:
-                # we are interested only in non-trashed items.
-                if obj.get('is_trashed'):
-                    continue
+            qry_params.update({'offset': offset})
+            doc, elapsed = self._fetch_page(endpoint, qry_params, lazy)
 
-                yield obj
+            meta = {'offset': offset, 'limit': qry_params['limit'], 'total_count': None}
+            yield self._make_page(endpoint, doc, meta, elapsed, include_trashed)
 
             if not doc['meta']['next']:
-                raise StopIteration()
+                break
             else:
-                offset += ITEMS_PER_REQUEST
+                offset += limit
+
+    def _iter_keyset(self, endpoint, params, lazy=False, include_trashed=False):
+        """
+        Iterates over the pages ordered by `id`, requesting each one with
+        the documents after the last id of the previous one.
+
+        Unlike offsets, the cost of each request does not grow as the
+        harvest goes deep, and documents created or deleted meanwhile
+        do not shift the following pages.
+        """
+        if params.get('order_by', 'id') not in ('id', ['id'], ('id',)):
+            raise ValueError('keyset pagination orders documents by id, not by %s. '
+                             'Use pagination=\'offset\' instead.' % (params['order_by'],))
+
+        qry_params = {'limit': ITEMS_PER_REQUEST}
+        qry_params.update(params)
+        qry_params['order_by'] = 'id'
+
+        offset = 0
+        total_count = None
+        while True:
+            doc, elapsed = self._fetch_page(endpoint, qry_params, lazy)
+            objects = doc['objects']
+
+            # the total count of the first page is kept, as the following
+            # ones count only the remaining documents.
+            if total_count is None:
+                total_count = doc['meta'].get('total_count')
+
+            meta = {'offset': offset, 'limit': qry_params['limit']}
+            page = self._make_page(endpoint, doc, meta, elapsed, include_trashed)
+            page.meta.update(offset=offset, total_count=total_count,
+                             last_id=objects[-1]['id'] if objects else None)
+            yield page
+
+            if not objects or not doc['meta']['next']:
+                break
+
+            offset += len(objects)
+            qry_params['id__gt'] = objects[-1]['id']
 
     def get_endpoints(self):
         """
@@ -146,7 +588,16 @@ class Connector(object):
         cls = self.__class__
 
         if self.version not in cls._cache:
-            cls._cache[self.version] = self._http_get(self.api_uri)
+            if self.cache is not None:
+                # endpoints are cached too, to be available offline.
+                cls._cache[self.version] = self._fetch_cached(self._http_get,
+                                                              None, None, None)
+            else:
+                event = {'method': 'GET', 'endpoint': None, 'attempt': 1}
+                cls._cache[self.version] = self._dispatch(self._http_get, event,
+                                                          self.api_uri)
+        else:
+            self._emit('cache_hit', {'method': 'GET', 'endpoint': None})
 
         return cls._cache[self.version]
 
@@ -158,7 +609,31 @@ class Connector(object):
         :param data: json serializable Python datastructures.
         :returns: created resource url.
         """
-        return self._http_post(self.api_uri, data, endpoint=endpoint)
+        event = {'method': 'POST', 'endpoint': endpoint, 'attempt': 1}
+        return self._dispatch(self._http_post, event,
+                              self.api_uri, data, endpoint=endpoint)
+
+    def patch_data(self, endpoint, data):
+        """
+        Sends a PATCH request to `endpoint` with `data`.
+
+        Tastypie uses PATCH requests on list endpoints to create resources
+        in bulk, and if configured to, returns the created resources.
+
+        :param endpoint: must be a valid endpoint at http://manager.scielo.org/api/v1/
+        :param data: json serializable Python datastructures.
+        :returns: the response body or `None`.
+        """
+        # bulk operations are optional for http brokers
+        http_patch = getattr(self._httpbroker, 'patch', None)
+        if http_patch is None:
+            raise exceptions.MethodNotAllowed('the http broker does not implement patch')
+
+        # same credentials and options bound to the other http methods
+        bound_patch = functools.partial(http_patch, **self._http_get.keywords)
+        event = {'method': 'PATCH', 'endpoint': endpoint, 'attempt': 1}
+        return self._dispatch(bound_patch, event,
+                              self.api_uri, data, endpoint=endpoint)
 
 
 class Endpoint(object):
@@ -167,10 +642,65 @@ class Endpoint(object):
 
     :param name: the endpoint name.
     :param connector: instance of :class:`Connector`.
+    :param client: (optional) the :class:`Client` the endpoint belongs to, that resolves relations.
     """
-    def __init__(self, name, connector):
+    def __init__(self, name, connector, client=None):
         self.name = name
         self.connector = connector
+        self.client = client
+        self._record_type = None
+
+    def schema(self):
+        """
+        Gets the endpoint schema. It is fetched only once, and cached by
+        the connector. See :meth:`Connector.get_schema`.
+        """
+        return self.connector.get_schema(self.name)
+
+    def record_type(self):
+        """
+        Gets the :class:`scieloapi.records.Record` subclass generated from
+        the endpoint schema.
+        """
+        if self._record_type is None:
+            self._record_type = records.record_type_from_schema(self.name, self.schema())
+
+        return self._record_type
+
+    def pages(self, compact=False, lazy=False, **kwargs):
+        """
+        Gets all documents of the endpoint that satisfies some criteria,
+        in pages. See :meth:`Connector.iter_pages`.
+
+        :param compact: (optional) if documents should be produced as compact records instead of dicts. Defaults to `False`.
+        :param lazy: (optional) if documents should keep their raw JSON text and decode fields on access. Defaults to `False`.
+        :param \*\*kwargs: filtering criteria as documented at `docs.scielo.org <http://ref.scielo.org/ph6gvk>`_
+        """
+        if lazy:
+            kwargs = dict(kwargs, lazy=True)
+
+        for page in self.connector.iter_pages(self.name, **kwargs):
+            if compact:
+                page.objects = list(self._compact(page.objects))
+            yield page
+
+    def columns(self, fields=None, **kwargs):
+        """
+        Gets all documents of the endpoint that satisfies some criteria,
+        as column-oriented batches, one per page. Numeric and boolean fields
+        are typed according to the endpoint schema. See :mod:`scieloapi.columnar`.
+
+        :param fields: (optional) the fields to be produced. By default, all fields.
+        :param \*\*kwargs: filtering criteria as documented at `docs.scielo.org <http://ref.scielo.org/ph6gvk>`_
+        """
+        typecodes = columnar.typecodes_from_schema(self.schema())
+        for page in self.connector.iter_pages(self.name, **kwargs):
+            yield columnar.to_columns(page.objects, fields, typecodes)
+
+    def _compact(self, docs):
+        from_dict = self.record_type().from_dict
+        for doc in docs:
+            yield from_dict(doc)
 
     def get(self, resource_id):
         """
@@ -181,19 +711,73 @@ class Endpoint(object):
         res = self.connector.fetch_data(self.name, resource_id=resource_id)
         return res
 
-    def all(self):
+    def all(self, compact=False, lazy=False, include_trashed=False,
+            with_relations=None, dangling='raise'):
         """
-        Gets all documents of the endpoint.
+        Gets all documents of the endpoint, as a lazy :class:`scieloapi.query.QuerySet`.
+
+        :param compact: (optional) if documents should be produced as compact records instead of dicts. See :mod:`scieloapi.records`. Defaults to `False`.
+        :param lazy: (optional) if documents should keep their raw JSON text and decode fields on access. See :class:`scieloapi.records.LazyRecord`. Defaults to `False`.
+        :param include_trashed: (optional) if trashed documents should be produced too. Defaults to `False`.
+        :param with_relations: (optional) a collection of relations to be fetched, as by :meth:`Client.fetch_relations`, for each page while the next one is downloaded.
+        :param dangling: (optional) how relations to resources not found are handled. See :meth:`Client.fetch_relations`. Defaults to `raise`.
         """
-        return self.connector.iter_docs(self.name)
+        return QuerySet(self, compact=compact, lazy=lazy, include_trashed=include_trashed,
+                        with_relations=with_relations, dangling=dangling)
 
-    def filter(self, **kwargs):
+    def filter(self, compact=False, lazy=False, **kwargs):
         """
-        Gets all documents of the endpoint that satisfies some criteria.
+        Gets all documents of the endpoint that satisfies some criteria, as a
+        lazy :class:`scieloapi.query.QuerySet`.
+
+        The special kwarg `shard` takes a shard spec from :mod:`scieloapi.sharding`,
+        to harvest only a slice of the endpoint, e.g.::
 
+            >>> from scieloapi.sharding import Shard
+            >>> cli.query('issues').filter(collection='brasil', shard=Shard(0, 4))
+
+        `include_trashed=True` produces trashed documents too, and `with_relations`
+        takes a collection of relations to be fetched, as by
+        :meth:`Client.fetch_relations`. Relations are fetched for all
+        documents of a page at once, while the next page is downloaded::
+
+            >>> for issue in cli.query('issues').filter(with_relations=['journal']):
+            ...     print issue['journal']['title']
+
+        `dangling` handles relations to resources not found, as by
+        :meth:`Client.fetch_relations`.
+
+        :param compact: (optional) if documents should be produced as compact records instead of dicts. See :mod:`scieloapi.records`. Defaults to `False`.
+        :param lazy: (optional) if documents should keep their raw JSON text and decode fields on access. See :class:`scieloapi.records.LazyRecord`. Defaults to `False`.
         :param \*\*kwargs: filtering criteria as documented at `docs.scielo.org <http://ref.scielo.org/ph6gvk>`_
         """
-        return self.connector.iter_docs(self.name, **kwargs)
+        shard = kwargs.pop('shard', None)
+        include_trashed = kwargs.pop('include_trashed', False)
+        with_relations = kwargs.pop('with_relations', None)
+        dangling = kwargs.pop('dangling', 'raise')
+        return QuerySet(self, kwargs, compact=compact, lazy=lazy,
+                        include_trashed=include_trashed, shard=shard,
+                        with_relations=with_relations, dangling=dangling)
+
+    def map(self, transform, processes=None, ordered=True, **kwargs):
+        """
+        Applies `transform` to all documents of the endpoint that satisfies
+        some criteria, using a pool of processes.
+
+        Pages are downloaded, decoded and transformed by the processes of
+        the pool. See :class:`scieloapi.harvest.ProcessHarvester`.
+
+        :param transform: a picklable callable, i.e. a module-level function.
+        :param processes: (optional) size of the pool. Defaults to the number of cores.
+        :param ordered: (optional) if the results are produced in order. Defaults to `True`.
+        :param \*\*kwargs: filtering criteria as documented at `docs.scielo.org <http://ref.scielo.org/ph6gvk>`_
+        """
+        return harvest.ProcessHarvester(self.connector, self.name,
+                                        params=kwargs,
+                                        transform=transform,
+                                        processes=processes,
+                                        ordered=ordered,
+                                        limit=ITEMS_PER_REQUEST)
 
     def post(self, data):
         """
@@ -203,12 +787,61 @@ class Endpoint(object):
         :returns: id of the new resource.
         """
         resp = self.connector.post_data(self.name, data)
-        match = RESOURCE_PATH_PATTERN.search(resp)
+        return self._resource_id(resp)
+
+    def _resource_id(self, resource_uri):
+        """
+        Extracts the resource id from its uri.
+        """
+        match = RESOURCE_PATH_PATTERN.search(resource_uri)
         if match:
             match_group = match.groups()
             return match_group[2]
         else:
-            raise exceptions.APIError('Unknown url: %s' % resp)
+            raise exceptions.APIError('Unknown url: %s' % resource_uri)
+
+    def post_many(self, records, bulk=False, workers=None):
+        """
+        Creates many new resources.
+
+        If `bulk` is `True`, all resources are sent in a single PATCH request.
+        If the endpoint does not allow it, or if `bulk` is `False`, resources
+        are created by concurrent POST requests. Use a pooled :class:`Connector`
+        to reuse connections among them. Other errors of the PATCH request,
+        e.g. :class:`scieloapi.exceptions.BadRequest`, are raised, as some
+        resources may have been created already.
+
+        :param records: a list of serializable python data structures.
+        :param bulk: (optional) if bulk creation should be tried first. Defaults to `False`.
+        :param workers: (optional) number of concurrent POST requests. Defaults to 4, or to the `maximum` of the concurrency controller of the connector.
+        :returns: a list with the ids of the new resources in the same order of
+          `records`. Items that could not be created are represented by
+          instances of :class:`scieloapi.exceptions.APIError`. When created in
+          bulk by an endpoint that does not return the created data, i.e.
+          Tastypie's `always_return_data` is off, the ids are unknown and
+          all items are `None`.
+        """
+        records = list(records)
+        if not records:
+            return []
+
+        if bulk:
+            try:
+                resp = self.connector.patch_data(self.name, {'objects': records})
+            except exceptions.MethodNotAllowed as e:
+                logger.info('Bulk creation is not supported by %s: %s. '
+                            'Falling back to concurrent requests.' % (self.name, e))
+            else:
+                if resp and len(resp.get('objects', [])) == len(records):
+                    return [self._resource_id(obj['resource_uri'])
+                            for obj in resp['objects']]
+
+                # resources were created, but we are unable to tell their ids.
+                logger.warning('%s did not return the created resources.' % self.name)
+                return [None] * len(records)
+
+        workers = concurrency.pool_size(workers, self.connector.concurrency)
+        return concurrency.map_threaded(self.post, records, workers=workers)
 
 
 class Client(object):
@@ -225,6 +858,13 @@ class Client(object):
     :param api_uri: (optional) if connecting to a non official instance of `SciELO Manager <https://github.com/scieloorg/SciELO-Manager>`_
     :param version: (optional) by default the newest version is used.
     :param check_ca: (optional) if certification authority should be checked during ssl sessions. Defaults to `False`.
+    :param interning: (optional) if strings repeated across decoded documents should be shared as a single object. See :class:`Connector`. Defaults to `False`.
+    :param pagination: (optional) a mapping of endpoint names to pagination strategies. See :class:`Connector`.
+    :param trash_filtering: (optional) where trashed documents are filtered out. See :class:`Connector`. Defaults to `client`.
+    :param identity_map: (optional) if resources got with :meth:`get`, e.g. by :meth:`fetch_relations`, should be fetched only once and shared as a single object. They are kept for the lifetime of the client, and must not be modified. Defaults to `False`.
+    :param not_found_ttl: (optional) seconds during which resources not found by :meth:`get` are not requested again, e.g. dangling relations, and :class:`scieloapi.exceptions.NotFound` is raised right away. `0` disables it. Defaults to 30.
+    :param cache: (optional) a :class:`scieloapi.cache.Cache` that answers GET requests. See :class:`Connector`.
+    :param concurrency: (optional) a :class:`scieloapi.concurrency.AIMDController` that limits the concurrent requests. See :class:`Connector`.
 
     Usage::
 
@@ -232,19 +872,41 @@ class Client(object):
         >>> cli = scieloapi.Client('some.user', 'some.apikey')
         <scieloapi.scieloapi.Client object at 0x10726f9d0>
         >>> cli.query('journals').all()
-        <generator object iter_docs at 0x10fd59730>
+        <QuerySet journals {} [0:None]>
     """
     def __init__(self, username, api_key, api_uri=None,
-                 version=None, connector_dep=Connector, check_ca=False):
+                 version=None, connector_dep=Connector, check_ca=False,
+                 interning=False, identity_map=False, pagination=None,
+                 trash_filtering='client', not_found_ttl=30, cache=None,
+                 concurrency=None):
+        # dependencies
+        self._time = time
+
+        connector_options = {}
+        if interning is not False:
+            connector_options['interning'] = interning
+        if pagination:
+            connector_options['pagination'] = pagination
+        if trash_filtering != 'client':
+            connector_options['trash_filtering'] = trash_filtering
+        if cache is not None:
+            connector_options['cache'] = cache
+        if concurrency is not None:
+            connector_options['concurrency'] = concurrency
 
         self._connector = connector_dep(username,
                                         api_key,
                                         api_uri=api_uri,
                                         version=version,
-                                        check_ca=check_ca)
+                                        check_ca=check_ca,
+                                        **connector_options)
+        self._identity_map = {} if identity_map else None
+        self.not_found_ttl = not_found_ttl
+        self._not_found = {}
+        self._resource_paths = {}
         self._endpoints = {}
         for ep in self._introspect_endpoints():
-            self._endpoints[ep] = Endpoint(ep, self._connector)
+            self._endpoints[ep] = Endpoint(ep, self._connector, client=self)
 
     def _introspect_endpoints(self):
         """
@@ -278,7 +940,7 @@ class Client(object):
         """
         return self._connector.version
 
-    def fetch_relations(self, dataset, only=None):
+    def fetch_relations(self, dataset, only=None, dangling='raise'):
         """
         Fetches all records that relates to `dataset`.
 
@@ -287,6 +949,7 @@ class Client(object):
 
         :param dataset: datastructure representing a record. Tipically a `dict` instance.
         :param only: (optional) a collection of relations to fetch. By default, all relations are retrieved.
+        :param dangling: (optional) how relations to resources not found are handled: `raise` raises :class:`scieloapi.exceptions.NotFound`, `keep` keeps their URIs and `null` replaces them by `None`. They are reported to the `dangling` instrumentation hook. Defaults to `raise`.
 
         Usage::
 
@@ -294,32 +957,164 @@ class Client(object):
             >>> cli = scieloapi.Client('some.user', 'some.apikey')
             >>> cli.fetch_relations(cli.journals.get(70))
         """
-        new_dataset = {}
+        if dangling not in DANGLING_STRATEGIES:
+            raise ValueError('unknown dangling strategy %s. Supported are: %s' % (
+                dangling, ', '.join(DANGLING_STRATEGIES)))
+
+        return self._replace_relations(dataset, only, self.get, dangling)
+
+    def fetch_relations_many(self, datasets, only=None, workers=None,
+                             dangling='raise'):
+        """
+        Fetches all records that relates to each one of `datasets`.
+
+        Unlike calling :meth:`fetch_relations` for each dataset, the relations
+        of all datasets are collected first, and each distinct resource is
+        fetched once, by concurrent requests.
+
+        :param datasets: a list of datastructures representing records.
+        :param only: (optional) a collection of relations to fetch. By default, all relations are retrieved.
+        :param workers: (optional) number of concurrent requests. Defaults to 4, or to the `maximum` of the concurrency controller.
+        :param dangling: (optional) how relations to resources not found are handled. See :meth:`fetch_relations`. Defaults to `raise`.
+        :returns: a list with the new datasets, in the same order of `datasets`.
+        """
+        if dangling not in DANGLING_STRATEGIES:
+            raise ValueError('unknown dangling strategy %s. Supported are: %s' % (
+                dangling, ', '.join(DANGLING_STRATEGIES)))
+
+        datasets = list(datasets)
+        uris = set()
+        for dataset in datasets:
+            for attr_name, attr_value in self._relation_fields(dataset, only):
+                elems = attr_value if isinstance(attr_value, list) else [attr_value]
+                uris.update(elem for elem in elems if self._is_known_resource_uri(elem))
+
+        uris = list(uris)
+        resources = {}
+        workers = concurrency.pool_size(workers, self._connector.concurrency)
+        for uri, resource in zip(uris, concurrency.map_threaded(self.get, uris,
+                                                                 workers=workers)):
+            if (isinstance(resource, exceptions.APIError)
+                    and not isinstance(resource, exceptions.NotFound)):
+                raise resource
+            resources[uri] = resource
+
+        def get(resource_uri):
+            try:
+                resource = resources[resource_uri]
+            except (KeyError, TypeError):
+                return self.get(resource_uri)
 
+            if isinstance(resource, exceptions.NotFound):
+                raise resource
+            return resource
+
+        return [self._replace_relations(dataset, only, get, dangling)
+                for dataset in datasets]
+
+    def _relation_fields(self, dataset, only):
+        """
+        Yields the fields of `dataset` that may hold relations.
+        """
         for attr_name, attr_value in dataset.items():
             # skip fetching itself and undesired fields
             if attr_name == 'resource_uri' or (only and attr_name not in only):
-                new_dataset[attr_name] = attr_value
-            elif isinstance(attr_value, basestring):
+                continue
+            if isinstance(attr_value, (basestring, list)):
+                yield attr_name, attr_value
+
+    def _is_resource_uri(self, value):
+        # most string fields are titles, dates and the like, rejected
+        # without going through the pattern.
+        if not isinstance(value, basestring) or not value.startswith('/api/'):
+            return False
+
+        try:
+            self._parse_resource_uri(value)
+        except ValueError:
+            return False
+        return True
+
+    def _is_known_resource_uri(self, value):
+        """
+        If `value` is the uri of a resource of an endpoint of the client.
+        Relations to other endpoints are kept as they are.
+        """
+        return (self._is_resource_uri(value) and
+                self._parse_resource_uri(value)[0] in self._endpoints)
+
+    def _replace_relations(self, dataset, only, get, dangling='raise'):
+        """
+        Replaces the relations of `dataset` by the resources returned by `get`.
+        """
+        get = functools.partial(self._get_dangling, get, dangling)
+        new_dataset = dict(dataset.items())
+
+        for attr_name, attr_value in self._relation_fields(dataset, only):
+            if isinstance(attr_value, basestring):
                 try:
-                    new_dataset[attr_name] = self.get(attr_value)
+                    new_dataset[attr_name] = get(attr_value)
                 except ValueError as e:
                     new_dataset[attr_name] = attr_value
 
-            elif isinstance(attr_value, list):
+            else:
                 new_elems = []
                 for elem in attr_value:
                     try:
-                        new_elems.append(self.get(elem))
+                        new_elems.append(get(elem))
                     except (TypeError, ValueError) as e:
                         new_elems.append(elem)
 
                 new_dataset[attr_name] = new_elems
-            else:
-                new_dataset[attr_name] = attr_value
 
         return new_dataset
 
+    def _connector_emits(self):
+        return bool(getattr(self._connector, 'instrumentation', None))
+
+    def _get_dangling(self, get, dangling, resource_uri):
+        """
+        Calls `get`, handling resources not found as configured by `dangling`.
+        """
+        try:
+            return get(resource_uri)
+        except exceptions.NotFound:
+            endpoint, resource_id = self._parse_resource_uri(resource_uri)
+            if self._connector_emits():
+                self._connector._emit('dangling', {'method': 'GET', 'endpoint': endpoint,
+                                                   'resource_id': resource_id})
+            if dangling == 'raise':
+                raise
+            return resource_uri if dangling == 'keep' else None
+
+    def _parse_resource_uri(self, resource_uri):
+        """
+        Gets the endpoint and resource id of `resource_uri`, raising
+        ValueError if it is not valid for the client version. URIs are
+        parsed once, as relations repeat the same ones many times. Only
+        resource URIs are kept, so other strings do not fill the cache.
+        """
+        parsed = self._resource_paths.get(resource_uri)
+        if parsed is None:
+            if not isinstance(resource_uri, basestring):
+                raise TypeError('resource_uri must be a string')
+
+            match = (resource_uri.startswith('/api/') and
+                     RESOURCE_PATH_PATTERN.match(resource_uri))
+            if not match:
+                raise ValueError('Invalid resource_uri')
+
+            parsed = match.groups()
+            if len(self._resource_paths) >= CLIENT_CACHE_SIZE:
+                self._resource_paths.clear()
+            self._resource_paths[resource_uri] = parsed
+
+        version, endpoint, resource_id = parsed
+        if version != self.version:
+            raise ValueError('Resource and Client version must match')
+
+        return endpoint, resource_id
+
     def get(self, resource_uri):
         """
         Gets resource_uri.
@@ -328,18 +1123,41 @@ class Client(object):
         `version` passed during client's instantiation. The `endpoint` must also
         be available for the version the client is bound to.
 
+        Resources not found are remembered for `not_found_ttl` seconds.
+
         :param resource_uri: text string in the form `/api/<version>/<endpoint>/<resource_id>/`.
         """
-        match = RESOURCE_PATH_PATTERN.match(resource_uri)
-        if match:
-            version, endpoint, resource_id = match.groups()
+        endpoint, resource_id = self._parse_resource_uri(resource_uri)
+        key = (endpoint, resource_id)
+
+        not_found = self._not_found.get(key)
+        if not_found is not None:
+            expires, args = not_found
+            if self._time.time() < expires:
+                if self._connector_emits():
+                    self._connector._emit('cache_hit', {'method': 'GET', 'endpoint': endpoint,
+                                                        'resource_id': resource_id})
+                # a new exception each time, as raising the same instance
+                # again, maybe from many threads, keeps adding to its traceback.
+                raise exceptions.NotFound(*args)
+            self._not_found.pop(key, None)
+
+        try:
+            if self._identity_map is None:
+                return self.query(endpoint).get(resource_id)
 
-            if version != self.version:
-                raise ValueError('Resource and Client version must match')
-
-            return self.query(endpoint).get(resource_id)
-        else:
-            raise ValueError('Invalid resource_uri')
+            try:
+                return self._identity_map[key]
+            except KeyError:
+                resource = self.query(endpoint).get(resource_id)
+                # a resource got concurrently by another thread wins.
+                return self._identity_map.setdefault(key, resource)
+        except exceptions.NotFound as e:
+            if self.not_found_ttl:
+                if len(self._not_found) >= CLIENT_CACHE_SIZE:
+                    self._not_found.clear()
+                self._not_found[key] = (self._time.time() + self.not_found_ttl, e.args)
+            raise
 
     def query(self, endpoint):
         """
@@ -353,3 +1171,39 @@ class Client(object):
         else:
             raise ValueError('Unknown endpoint %s.' % endpoint)
 
+    def harvest(self, endpoints=None, filters=None, workers=None,
+                max_in_flight=None, progress=None):
+        """
+        Harvests all documents of many endpoints concurrently.
+
+        Pages of all endpoints share the same pool of `workers` threads, and
+        are scheduled in a round-robin fashion. See :class:`scieloapi.harvest.Harvester`.
+
+        :param endpoints: (optional) a list of endpoint names. By default, all endpoints are harvested.
+        :param filters: (optional) a mapping of endpoint names to filtering criteria.
+        :param workers: (optional) number of worker threads. Defaults to 4, or to the `maximum` of the concurrency controller.
+        :param max_in_flight: (optional) max number of pages dispatched and not yet consumed. Defaults to `workers`.
+        :param progress: (optional) callable that receives ``(endpoint, fetched, total)`` each time a page is completed.
+        :returns: an iterable of ``(endpoint, document)`` pairs.
+
+        Usage::
+
+            >>> import scieloapi
+            >>> cli = scieloapi.Client('some.user', 'some.apikey')
+            >>> for endpoint, doc in cli.harvest(['journals', 'issues'], workers=8):
+            ...     print endpoint, doc['resource_uri']
+        """
+        if endpoints is None:
+            endpoints = self.endpoints
+
+        # unknown endpoints raise ValueError
+        names = [self.query(ep).name for ep in endpoints]
+
+        return harvest.Harvester(self._connector, names,
+                                 filters=filters,
+                                 workers=concurrency.pool_size(
+                                     workers, self._connector.concurrency),
+                                 max_in_flight=max_in_flight,
+                                 progress=progress,
+                                 limit=ITEMS_PER_REQUEST)
+
@@ -2,6 +2,10 @@ class APIError(Exception):
     """
     Base class for all API exceptions
     """
+    # HTTP status code that caused the exception, when applicable.
+    status_code = None
+    # details about the failed request, when traced by the Connector.
+    trace = None
 
 
 class ConnectionError(APIError):
@@ -26,52 +30,74 @@ class BadRequest(APIError):
     """
     Raised on 400 HTTP status code
     """
+    status_code = 400
 
 
 class Unauthorized(APIError):
     """
     Raised on 401 HTTP status code
     """
+    status_code = 401
 
 
 class Forbidden(APIError):
     """
     Raised on 403 HTTP status code
     """
+    status_code = 403
 
 
 class NotFound(APIError):
     """
     Raised on 404 HTTP status code
     """
+    status_code = 404
 
 
 class MethodNotAllowed(APIError):
     """
     Raised on 405 HTTP status code
     """
+    status_code = 405
 
 
 class NotAcceptable(APIError):
     """
     Raised on 406 HTTP status code
     """
+    status_code = 406
 
 
 class InternalServerError(APIError):
     """
     Raised on 500 HTTP status code
     """
+    status_code = 500
 
 
 class BadGateway(APIError):
     """
     Raised on 502 HTTP status code
     """
+    status_code = 502
 
 
 class ServiceUnavailable(APIError):
     """
     Raised on 503 HTTP status code
     """
+    status_code = 503
 
+
+class UnrecordedRequest(APIError):
+    """
+    Raised by :class:`scieloapi.cassette.Cassette` on replaying a request
+    that was not recorded.
+    """
+
+
+class NotCached(APIError):
+    """
+    Raised by :class:`scieloapi.cache.Cache` on serving offline a request
+    that was not cached.
+    """
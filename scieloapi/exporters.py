@@ -0,0 +1,420 @@
+# coding: utf-8
+"""
+Streaming exporters of documents to JSON lines and CSV files.
+
+Exporters consume iterables of documents or pages, e.g. from
+:meth:`scieloapi.Connector.iter_docs` or :meth:`scieloapi.Endpoint.pages`,
+as dicts, compact or lazy records, and write them in buffered batches, so exports of any size run in
+constant memory::
+
+    >>> from scieloapi.exporters import JSONLinesExporter
+    >>> with JSONLinesExporter('issues.jsonl.gz', compression='gzip',
+    ...                        max_records=100000) as exporter:
+    ...     exporter.export(cli.query('issues').pages())
+    >>> exporter.stats['records_per_second']
+
+Files can be compressed with `gzip` or `xz`, and rotated when they reach
+`max_records` documents or `max_bytes` bytes. Rotated files are numbered,
+e.g. `issues-00000.jsonl.gz`, `issues-00001.jsonl.gz` and so on.
+"""
+import io
+import os
+import re
+import sys
+import csv
+import json
+import gzip
+import time
+import logging
+
+from .core import Page
+from .records import as_dict
+
+
+__all__ = ['JSONLinesExporter', 'CSVExporter', 'flatten']
+
+logger = logging.getLogger(__name__)
+
+PY2 = sys.version_info[0] == 2
+COMPRESSIONS = (None, 'gzip', 'xz')
+
+# splits a path into its base and its extensions, e.g. `.jsonl.gz`.
+EXTENSIONS_PATTERN = re.compile(r'^(.*?)((?:\.[A-Za-z0-9]+)*)$')
+
+
+def _lzma():
+    """
+    Imports the `lzma` module on demand. It is available since Python 3.3,
+    and as `backports.lzma` for older versions.
+    """
+    try:
+        import lzma
+    except ImportError:
+        try:
+            from backports import lzma
+        except ImportError:
+            raise ValueError('xz compression requires the lzma module, '
+                             'available as backports.lzma for Python 2')
+    return lzma
+
+
+def flatten(doc, separator='.'):
+    """
+    Flattens the nested objects of `doc`, joining their keys with
+    `separator`, e.g. ``{'a': {'b': 1}}`` becomes ``{'a.b': 1}``.
+    Lists are kept as they are.
+
+    :param doc: a dict.
+    :param separator: (optional) Defaults to `.`.
+    """
+    flat = {}
+    for key, value in doc.items():
+        if isinstance(value, dict) and value:
+            for sub_key, sub_value in flatten(value, separator).items():
+                flat[u'%s%s%s' % (key, separator, sub_key)] = sub_value
+        else:
+            flat[key] = value
+
+    return flat
+
+
+class Exporter(object):
+    """
+    Base class of the exporters. Subclasses implement :meth:`_encode`.
+
+    :param path: the output file.
+    :param compression: (optional) `gzip`, `xz` or `None`. Defaults to `None`.
+    :param max_records: (optional) number of documents after which the file is rotated.
+    :param max_bytes: (optional) size, before compression, after which the file is rotated. It is checked after each batch, so files may be a batch larger.
+    :param batch_size: (optional) number of documents buffered before being written. Defaults to 500.
+    :param append: (optional) if an existing file should be appended to, instead of replaced. Rotated files are appended to the last one, and its documents are not counted for rotation. Defaults to `False`.
+    """
+    def __init__(self, path, compression=None, max_records=None, max_bytes=None,
+                 batch_size=500, append=False):
+        if compression not in COMPRESSIONS:
+            raise ValueError('unknown compression %s. Supported are: gzip, xz' % compression)
+        if compression == 'xz':
+            _lzma()
+        if batch_size < 1:
+            raise ValueError('batch_size must be a positive integer')
+
+        # dependencies
+        self._time = time
+
+        self.path = path
+        self.compression = compression
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.append = append
+        self.files = []
+
+        self.records = 0
+        self.bytes = 0
+        self._buffer = []
+        self._file = None
+        self._part = 0
+        self._part_records = 0
+        self._part_bytes = 0
+        self._started = None
+        self._finished = None
+
+        if self._rotates and append:
+            # continues at the last part already written.
+            while os.path.exists(self._part_path(self._part + 1)):
+                self._part += 1
+
+    @property
+    def _rotates(self):
+        return bool(self.max_records or self.max_bytes)
+
+    def _part_path(self, part):
+        if not self._rotates:
+            return self.path
+
+        base, extensions = EXTENSIONS_PATTERN.match(self.path).groups()
+        return '%s-%05d%s' % (base, part, extensions)
+
+    def _open(self, path, mode):
+        if self.compression == 'gzip':
+            return gzip.open(path, mode)
+        elif self.compression == 'xz':
+            return _lzma().open(path, mode)
+        return open(path, mode)
+
+    def _open_part(self, docs):
+        path = self._part_path(self._part)
+        existing = (self.append and os.path.exists(path) and os.path.getsize(path) > 0
+                    and path not in self.files)
+        if existing:
+            self._resume(path)
+
+        self._file = self._open(path, 'ab' if existing else 'wb')
+        self.files.append(path)
+        self._part_records = 0
+        self._part_bytes = 0
+
+        if not existing:
+            self._write(self._header(docs))
+
+    def _resume(self, path):
+        """
+        Called before appending to the existing file `path`.
+        """
+
+    def _header(self, docs):
+        """
+        Encodes the header of a new file, where `docs` are the first
+        documents to be written.
+        """
+        return b''
+
+    def _encode(self, docs):
+        raise NotImplementedError()
+
+    def _write(self, data):
+        self._file.write(data)
+        self.bytes += len(data)
+        self._part_bytes += len(data)
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        self._part += 1
+
+    def write(self, doc):
+        """
+        Buffers `doc`, writing the buffer when it is full.
+        """
+        if self._started is None:
+            self._started = self._time.time()
+
+        self._buffer.append(doc)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, docs):
+        """
+        Buffers all `docs`.
+
+        :param docs: an iterable of documents.
+        """
+        for doc in docs:
+            self.write(doc)
+
+    def export(self, items):
+        """
+        Writes all documents of `items`, and flushes them.
+
+        :param items: an iterable of documents or of :class:`scieloapi.core.Page`.
+        """
+        for item in items:
+            if isinstance(item, Page):
+                self.write_many(item.objects)
+            else:
+                self.write(item)
+
+        self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered documents to the file, and flushes it.
+        """
+        if self._started is None:
+            self._started = self._time.time()
+
+        docs, self._buffer = self._buffer, []
+        while docs:
+            if self._file is None:
+                self._open_part(docs)
+
+            batch = docs
+            if self.max_records:
+                batch = docs[:self.max_records - self._part_records]
+            docs = docs[len(batch):]
+
+            self._write(self._encode(batch))
+            self.records += len(batch)
+            self._part_records += len(batch)
+
+            if ((self.max_records and self._part_records >= self.max_records) or
+                    (self.max_bytes and self._part_bytes >= self.max_bytes)):
+                self._rotate()
+
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        """
+        Writes the buffered documents and closes the file.
+        """
+        self.flush()
+        if self._file is None and not self.files:
+            # an empty export still produces a file.
+            self._open_part([])
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        self._finished = self._time.time()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def stats(self):
+        """
+        A dict with the number of `records` and `bytes` written, before
+        compression, the `files` written, the `elapsed` seconds, and the
+        throughput in `records_per_second` and `bytes_per_second`.
+        """
+        elapsed = 0.0
+        if self._started is not None:
+            elapsed = (self._finished or self._time.time()) - self._started
+
+        return {
+            'records': self.records,
+            'bytes': self.bytes,
+            'files': list(self.files),
+            'elapsed': elapsed,
+            'records_per_second': self.records / elapsed if elapsed > 0 else 0.0,
+            'bytes_per_second': self.bytes / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+class JSONLinesExporter(Exporter):
+    """
+    Writes documents as JSON lines. See :class:`Exporter` for the params.
+    """
+    extension = 'jsonl'
+
+    def _encode(self, docs):
+        lines = [json.dumps(as_dict(doc), sort_keys=True, separators=(',', ':'))
+                 for doc in docs]
+        return ''.join(line + '\n' for line in lines).encode('utf-8')
+
+
+class CSVExporter(Exporter):
+    """
+    Writes documents as CSV rows, with their nested objects flattened, e.g.
+    the `title` of the object at `journal` is the column `journal.title`.
+    Lists are encoded as JSON.
+
+    Unless `fields` are given, the columns are the fields of the documents
+    of the first batch. When appending to an existing file, its columns are
+    kept. Nested objects at a column are written as JSON. Other fields, e.g.
+    the ones that first show up after the first batch, are written as a JSON
+    object at the last column, `extra_field`, and each one is logged once
+    and kept at `unknown_fields`. Pass the fields of the endpoint schema,
+    see :meth:`scieloapi.Endpoint.schema`, to have them all as columns.
+
+    :param fields: (optional) the column names.
+    :param separator: (optional) joins the keys of nested objects. Defaults to `.`.
+    :param extra_field: (optional) the name of the column of the fields that are not columns. `None` drops them instead. Defaults to `_extra`.
+
+    See :class:`Exporter` for the other params.
+    """
+    extension = 'csv'
+
+    def __init__(self, path, fields=None, separator='.', extra_field='_extra', **kwargs):
+        self.fields = list(fields) if fields is not None else None
+        self.separator = separator
+        self.extra_field = extra_field
+        self.unknown_fields = set()
+        self._field_set = None
+        super(CSVExporter, self).__init__(path, **kwargs)
+
+    def _resume(self, path):
+        if self.fields is not None:
+            return
+
+        with self._open(path, 'rb') as existing:
+            header = existing.readline()
+        if PY2:
+            fields = [field.decode('utf-8') for field in next(csv.reader([header]))]
+        else:
+            fields = next(csv.reader([header.decode('utf-8')]))
+
+        if self.extra_field is not None and fields and fields[-1] == self.extra_field:
+            fields.pop()
+        else:
+            # the file has no column for them.
+            self.extra_field = None
+        self.fields = fields
+
+    def _header(self, docs):
+        if self.fields is None:
+            fields = set()
+            for doc in docs:
+                fields.update(flatten(doc, self.separator).keys())
+            self.fields = sorted(fields)
+
+        header = list(self.fields)
+        if self.extra_field is not None:
+            header.append(self.extra_field)
+
+        return self._encode_rows([[u'%s' % field for field in header]])
+
+    def _cell(self, value):
+        if value is None:
+            return u''
+        elif isinstance(value, (list, dict)):
+            return json.dumps(value, sort_keys=True)
+        elif isinstance(value, bool):
+            return u'true' if value else u'false'
+        else:
+            return value if isinstance(value, type(u'')) else str(value)
+
+    def _encode_rows(self, rows):
+        if PY2:
+            buf = io.BytesIO()
+            writer = csv.writer(buf)
+            for row in rows:
+                writer.writerow([cell.encode('utf-8') for cell in row])
+            return buf.getvalue()
+
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerows(rows)
+        return buf.getvalue().encode('utf-8')
+
+    def _extra(self, flat):
+        """
+        Gets the fields of a flattened document that are not columns, neither
+        in the nested object of a column. Each one is logged once.
+        """
+        if self._field_set is None:
+            self._field_set = frozenset(self.fields)
+
+        extra = {}
+        for key, value in flat.items():
+            if key in self._field_set or key.split(self.separator, 1)[0] in self._field_set:
+                continue
+
+            extra[key] = value
+            if key not in self.unknown_fields:
+                self.unknown_fields.add(key)
+                if self.extra_field is None:
+                    logger.warning('%s: the field %s is not a column, and is not written.' % (
+                        self.path, key))
+                else:
+                    logger.warning('%s: the field %s is not a column, and is written at %s.' % (
+                        self.path, key, self.extra_field))
+
+        return extra
+
+    def _encode(self, docs):
+        rows = []
+        for doc in docs:
+            flat = flatten(doc, self.separator)
+            row = [self._cell(flat[field] if field in flat else doc.get(field))
+                   for field in self.fields]
+            extra = self._extra(flat)
+            if self.extra_field is not None:
+                row.append(self._cell(extra or None))
+            rows.append(row)
+
+        return self._encode_rows(rows)
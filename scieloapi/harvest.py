@@ -0,0 +1,347 @@
+# coding: utf-8
+"""
+Concurrent harvesting of several endpoints at once.
+"""
+import logging
+import threading
+from collections import deque
+
+try:
+    import queue
+except ImportError:  # python 2
+    import Queue as queue
+
+
+__all__ = ['Harvester', 'ProcessHarvester']
+
+logger = logging.getLogger(__name__)
+
+# marks the end of the work for a worker thread.
+_STOP = object()
+
+
+class Harvester(object):
+    """
+    Harvests all documents of a set of endpoints using a shared pool of
+    worker threads.
+
+    Pages of all endpoints are scheduled in a round-robin fashion, so no
+    endpoint starves while others are being harvested. The number of pages
+    dispatched but not yet consumed is capped by `max_in_flight`, that
+    works as a global limit for concurrent requests as well as for the
+    memory used to buffer pages that were downloaded in advance.
+
+    Iterating over a Harvester produces ``(endpoint, document)`` pairs, as
+    pages are completed. :meth:`pages` produces whole pages instead, with
+    their offsets, e.g. to checkpoint a harvest and resume it later with
+    `skip`.
+
+    Endpoints that use keyset pagination, as configured by the `pagination`
+    param of :class:`scieloapi.Connector`, are paged ordered by `id`, one
+    page at a time, as each page is requested after the last id of the
+    previous one. Their offsets count the documents of the previous pages.
+
+    :param connector: instance of :class:`scieloapi.Connector`.
+    :param endpoints: a list of endpoint names.
+    :param filters: (optional) a mapping of endpoint names to query string params.
+    :param workers: (optional) number of worker threads. Defaults to 4.
+    :param max_in_flight: (optional) max number of pages dispatched and not yet consumed. Defaults to `workers`.
+    :param progress: (optional) callable that receives ``(endpoint, fetched, total)`` each time a page is completed. `total` is `None` when unknown.
+    :param limit: (optional) number of items per page.
+    :param skip: (optional) a mapping of endpoint names to the offsets of pages already harvested, that are not produced again.
+    """
+    def __init__(self, connector, endpoints, filters=None, workers=4,
+                 max_in_flight=None, progress=None, limit=50, skip=None):
+        if workers < 1:
+            raise ValueError('workers must be a positive integer')
+
+        self.connector = connector
+        self.endpoints = list(endpoints)
+        self.filters = filters or {}
+        self.workers = workers
+        self.max_in_flight = max_in_flight or workers
+        self.progress = progress
+        self.limit = limit
+        self.skip = dict((endpoint, set(offsets))
+                         for endpoint, offsets in (skip or {}).items())
+        self._keyset = set()
+
+        unknown = set(self.filters) - set(self.endpoints)
+        if unknown:
+            raise ValueError('filters for unknown endpoints: %s' % ', '.join(sorted(unknown)))
+
+    def _fetch_page(self, endpoint, offset, after_id=None):
+        params = dict(self.filters.get(endpoint, {}))
+        params.update(self.connector.trash_params(endpoint))
+        params['limit'] = self.limit
+        if endpoint in self._keyset:
+            params['order_by'] = 'id'
+            if after_id is not None:
+                params['id__gt'] = after_id
+        else:
+            params['offset'] = offset
+        return self.connector.fetch_data(endpoint, **params)
+
+    def _work(self, tasks, results):
+        """
+        Worker threads loop. Tasks are ``(endpoint, offset, after_id)``
+        triples, where `after_id` is the last id of the previous page of
+        keyset paginated endpoints.
+        """
+        while True:
+            task = tasks.get()
+            if task is _STOP:
+                return
+
+            endpoint, offset, after_id = task
+            try:
+                page = self._fetch_page(endpoint, offset, after_id)
+            except Exception as e:
+                results.put((task, None, e))
+            else:
+                results.put((task, page, None))
+
+    def _schedule(self, pending, rotation):
+        """
+        Picks the next task in a round-robin fashion among the endpoints
+        with pending pages.
+        """
+        for _ in range(len(rotation)):
+            endpoint = rotation[0]
+            rotation.rotate(-1)
+            if pending[endpoint]:
+                return (endpoint,) + pending[endpoint].popleft()
+
+        return None
+
+    def _enqueue_next_pages(self, pending, endpoint, offset, page):
+        """
+        Enqueues the pages that follow the page at `offset`, as
+        ``(offset, after_id)`` pairs.
+
+        When `meta.total_count` is available all pages are enqueued at once,
+        after the first one is fetched. Otherwise, or if the endpoint uses
+        keyset pagination, the pages are discovered one at a time following
+        `meta.next`.
+        """
+        meta = page['meta']
+        if endpoint in self._keyset:
+            objects = page['objects']
+            if objects and meta.get('next'):
+                pending[endpoint].append((offset + len(objects), objects[-1]['id']))
+            return
+
+        total_count = meta.get('total_count')
+        if total_count is not None:
+            if offset == 0:
+                skip = self.skip.get(endpoint, ())
+                pending[endpoint].extend(
+                    (next_offset, None)
+                    for next_offset in range(self.limit, total_count, self.limit)
+                    if next_offset not in skip)
+        elif meta.get('next'):
+            # pages already harvested are fetched anyway, to discover the next ones.
+            pending[endpoint].append((offset + self.limit, None))
+
+    def _resolve_pagination(self):
+        """
+        Finds the endpoints that use keyset pagination.
+        """
+        self._keyset = set()
+        for endpoint in self.endpoints:
+            if self.connector.pagination_strategy(endpoint) != 'keyset':
+                continue
+
+            order_by = self.filters.get(endpoint, {}).get('order_by', 'id')
+            if order_by not in ('id', ['id'], ('id',)):
+                raise ValueError('keyset pagination orders %s by id, not by %s' % (
+                    endpoint, order_by))
+            self._keyset.add(endpoint)
+
+    def __iter__(self):
+        for endpoint, offset, objects in self.pages():
+            for obj in objects:
+                yield endpoint, obj
+
+    def pages(self):
+        """
+        Produces ``(endpoint, offset, documents)`` triples, as pages are
+        completed. Pages at offsets in `skip` are not produced.
+        """
+        self._resolve_pagination()
+
+        tasks = queue.Queue()
+        results = queue.Queue()
+        pending = dict((ep, deque([(0, None)])) for ep in self.endpoints)
+        rotation = deque(self.endpoints)
+        fetched = dict((ep, 0) for ep in self.endpoints)
+        in_flight = 0
+
+        threads = []
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._work, args=(tasks, results))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        try:
+            while True:
+                while in_flight < self.max_in_flight:
+                    task = self._schedule(pending, rotation)
+                    if task is None:
+                        break
+                    tasks.put(task)
+                    in_flight += 1
+
+                if in_flight == 0:
+                    break
+
+                (endpoint, offset, after_id), page, error = results.get()
+                in_flight -= 1
+
+                if error is not None:
+                    logger.error('Unable to harvest %s at offset %s: %s' % (endpoint, offset, error))
+                    raise error
+
+                self._enqueue_next_pages(pending, endpoint, offset, page)
+
+                fetched[endpoint] += len(page['objects'])
+                if self.progress:
+                    total_count = page['meta'].get('total_count')
+                    if total_count is not None and endpoint in self._keyset:
+                        # keyset pages count only the remaining documents.
+                        total_count += offset
+                    self.progress(endpoint, fetched[endpoint], total_count)
+
+                if offset in self.skip.get(endpoint, ()):
+                    continue
+
+                # we are interested only in non-trashed items.
+                yield endpoint, offset, [obj for obj in page['objects']
+                                         if not obj.get('is_trashed')]
+        finally:
+            # discard tasks not yet picked by workers before stopping them.
+            while True:
+                try:
+                    tasks.get_nowait()
+                except queue.Empty:
+                    break
+
+            for _ in threads:
+                tasks.put(_STOP)
+
+
+# state of each process of a ProcessHarvester pool, set by `_init_process`.
+_process_state = {}
+
+
+def _init_process(connector, endpoint, params, transform, limit):
+    """
+    Initializes a process of the pool. The connector is unpickled once per
+    process, and if it is pooled, with its own session.
+    """
+    _process_state.update(connector=connector, endpoint=endpoint,
+                          params=params, transform=transform, limit=limit)
+
+
+def _process_page(offset):
+    """
+    Downloads, decodes and transforms the page at `offset`, in a process
+    of the pool.
+
+    :returns: a pair ``(meta, transformed_documents)``.
+    """
+    state = _process_state
+    params = dict(state['params'])
+    params.update({'limit': state['limit'], 'offset': offset})
+    page = state['connector'].fetch_data(state['endpoint'], **params)
+
+    transform = state['transform']
+    docs = []
+    for obj in page['objects']:
+        # we are interested only in non-trashed items.
+        if obj.get('is_trashed'):
+            continue
+
+        docs.append(transform(obj) if transform else obj)
+
+    return page['meta'], docs
+
+
+class ProcessHarvester(object):
+    """
+    Harvests all documents of an endpoint using a pool of processes, that
+    download, decode and transform the pages.
+
+    This is useful when the work done on each document is CPU bound, so
+    it scales with the number of cores instead of being restricted to one.
+    The connector is pickled and sent to each process, that creates its own
+    session if the connector is pooled. `transform` must be picklable too, i.e. a module-level
+    function.
+
+    Pages are requested by offset, so they can be dispatched concurrently,
+    even for endpoints that use keyset pagination.
+
+    Iterating over a ProcessHarvester produces the transformed documents,
+    in the same order of :meth:`scieloapi.Connector.iter_docs` or, if `ordered`
+    is `False`, as soon as their pages are completed.
+
+    :param connector: instance of :class:`scieloapi.Connector`.
+    :param endpoint: the endpoint name.
+    :param params: (optional) query string params.
+    :param transform: (optional) callable applied to each document.
+    :param processes: (optional) size of the pool. Defaults to the number of cores.
+    :param ordered: (optional) if the documents are produced in order. Defaults to `True`.
+    :param limit: (optional) number of items per page.
+    """
+    def __init__(self, connector, endpoint, params=None, transform=None,
+                 processes=None, ordered=True, limit=50):
+        self.connector = connector
+        self.endpoint = endpoint
+        self.params = params or {}
+        self.transform = transform
+        self.processes = processes
+        self.ordered = ordered
+        self.limit = limit
+
+    def _make_pool(self):
+        import multiprocessing
+        params = dict(self.params, **self.connector.trash_params(self.endpoint))
+        return multiprocessing.Pool(self.processes,
+                                    initializer=_init_process,
+                                    initargs=(self.connector, self.endpoint,
+                                              params, self.transform,
+                                              self.limit))
+
+    def __iter__(self):
+        pool = self._make_pool()
+        try:
+            # the first page tells how many pages there are.
+            meta, docs = pool.apply(_process_page, (0,))
+            for doc in docs:
+                yield doc
+
+            total_count = meta.get('total_count')
+            if total_count is None:
+                # pages must be discovered one at a time.
+                offset = 0
+                while meta.get('next'):
+                    offset += self.limit
+                    meta, docs = pool.apply(_process_page, (offset,))
+                    for doc in docs:
+                        yield doc
+            else:
+                offsets = range(self.limit, total_count, self.limit)
+                if self.ordered:
+                    pages = pool.imap(_process_page, offsets)
+                else:
+                    pages = pool.imap_unordered(_process_page, offsets)
+
+                for meta, docs in pages:
+                    for doc in docs:
+                        yield doc
+
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
@@ -1,19 +1,31 @@
 import json
+import time
+import threading
 from functools import wraps
 import logging
 
-import requests
-
 from . import exceptions
 from . import __user_agent__
 
 
-__all__ = ['get', 'post']
+__all__ = ['get', 'post', 'patch', 'new_session', 'ThreadLocalSession']
 
 DEFAULT_SCHEME = 'http'
 logger = logging.getLogger(__name__)
 
 
+def _requests():
+    """
+    Imports `requests` on demand.
+
+    `requests` is by far the heaviest dependency of the package, and
+    loading it is deferred until the first request is dispatched, so
+    short-lived processes that only import `scieloapi` start fast.
+    """
+    import requests
+    return requests
+
+
 def check_http_status(response):
     """
     Raises one of `scieloapi.exceptions` depending on response status-code.
@@ -56,6 +68,7 @@ def translate_exceptions(func):
     """
     @wraps(func)
     def f_wrap(*args, **kwargs):
+        requests = _requests()
         try:
             resp = func(*args, **kwargs)
         except requests.exceptions.ConnectionError as e:
@@ -109,6 +122,89 @@ def prepare_data(data):
 
 
 
+def _transferred_bytes(response):
+    """
+    The size of the body of `response` as transferred, i.e. before being
+    decompressed. It is taken from the `Content-Length` header, or from the
+    count of bytes read from the raw stream, when the header is missing
+    (chunked responses) and the stream counts them. Otherwise, the size of
+    the decoded body is returned.
+
+    :param response: is a requests.Response instance, with its body already read.
+    """
+    length = (response.headers or {}).get('content-length')
+    if length is not None:
+        try:
+            return int(length)
+        except ValueError:
+            pass
+
+    # urllib3 counts the bytes read from the socket since 1.9.
+    tell = getattr(response.raw, 'tell', None)
+    if tell is not None:
+        return tell()
+
+    return len(response.content or '')
+
+
+def _trace_response(response, trace, started):
+    """
+    Fills `trace` with details about `response`, if `trace` is a dict.
+
+    The time spent on each phase of the request is set at `trace['timings']`,
+    in seconds:
+
+    * `ttfb`: from dispatching the request to receiving the response headers.
+      It includes acquiring a connection, connecting and the TLS handshake,
+      that are not exposed separately by `requests`.
+    * `download`: reading the response body.
+    * `decode`: decoding the JSON body. Set by :func:`_decode_json`.
+
+    `trace['bytes']` is the size of the body as transferred. See
+    :func:`_transferred_bytes`.
+
+    The response must have been requested with ``stream=True``, so its body is
+    read here.
+
+    :param response: is a requests.Response instance.
+    :param trace: a dict or `None`.
+    :param started: the time the request was dispatched.
+    """
+    if trace is None:
+        return
+
+    headers_received = time.time()
+    trace['status'] = response.status_code
+    response.content
+    downloaded = time.time()
+    trace['bytes'] = _transferred_bytes(response)
+    trace['timings'] = {
+        'ttfb': headers_received - started,
+        'download': downloaded - headers_received,
+    }
+
+
+def _decode_json(response, trace, object_pairs_hook=None):
+    """
+    Decodes the JSON body of `response`, timing it if `trace` is a dict.
+
+    :param response: is a requests.Response instance.
+    :param trace: a dict or `None`.
+    :param object_pairs_hook: (optional) passed to the JSON decoder.
+    """
+    options = {}
+    if object_pairs_hook is not None:
+        options['object_pairs_hook'] = object_pairs_hook
+
+    if trace is None:
+        return response.json(**options)
+
+    started = time.time()
+    data = response.json(**options)
+    trace['timings']['decode'] = time.time() - started
+    return data
+
+
 def _make_full_url(*uri_segs):
     """
     Joins URI segments to produce an URL.
@@ -127,9 +223,12 @@ def _make_full_url(*uri_segs):
     return full_uri
 
 
-class ApiKeyAuth(requests.auth.AuthBase):
+class ApiKeyAuth(object):
     """
     ApiKey based authentication for `requests`.
+
+    It implements the same interface of `requests.auth.AuthBase`,
+    without subclassing it to keep `requests` out of import time.
     """
     def __init__(self, username, api_key):
         self.username = username
@@ -145,8 +244,44 @@ class ApiKeyAuth(requests.auth.AuthBase):
         return r
 
 
+class ThreadLocalSession(object):
+    """
+    Keeps connections alive between requests, with a `requests.Session`
+    per thread, created on its first request.
+
+    Sessions of `requests` are not safe to be shared among threads, as
+    their cookies and connection pools are changed by each request.
+    Attributes are looked up on the session of the current thread.
+    """
+    def __init__(self):
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = _requests().Session()
+        return session
+
+    def __getattr__(self, name):
+        return getattr(self._session(), name)
+
+
+def new_session():
+    """
+    Creates a session that keeps connections alive between requests,
+    that can be shared among the threads of a process. See
+    :class:`ThreadLocalSession`.
+
+    Sessions are not shared among processes, so each process must
+    create its own.
+    """
+    return ThreadLocalSession()
+
+
 @translate_exceptions
-def get(api_uri, endpoint=None, resource_id=None, params=None, auth=None, check_ca=False):
+def get(api_uri, endpoint=None, resource_id=None, params=None, auth=None,
+        check_ca=False, session=None, trace=None, raw=False,
+        object_pairs_hook=None):
     """
     Dispatches an HTTP GET request to `api_uri`.
 
@@ -160,6 +295,10 @@ def get(api_uri, endpoint=None, resource_id=None, params=None, auth=None, check_
     :param params: (optional) params to be passed as query string.
     :param auth: (optional) a pair of `username` and `api_key`.
     :param check_ca: (optional) if certification authority should be checked during ssl sessions. Defaults to `False`.
+    :param session: (optional) a session created by :func:`new_session`, to reuse connections.
+    :param trace: (optional) a dict to be filled with details about the response, i.e. `status`, `bytes` and `timings`.
+    :param raw: (optional) if the response body should be returned as text, without being decoded. Defaults to `False`.
+    :param object_pairs_hook: (optional) passed to the JSON decoder, e.g. an :class:`scieloapi.interning.InternTable`.
     """
     if not endpoint and resource_id:
         raise ValueError('resource_id depends on an endpoint definition')
@@ -184,18 +323,29 @@ def get(api_uri, endpoint=None, resource_id=None, params=None, auth=None, check_
     logger.debug('Sending a GET request to %s with headers %s and params %s %s' %
         (full_uri, headers, params, optionals))
 
-    resp = requests.get(full_uri,
-                        headers=headers,
-                        params=prepare_params(params),
-                        **optionals)
+    if trace is not None:
+        # the body is read apart from the headers, to time each phase.
+        optionals['stream'] = True
+
+    http = session if session is not None else _requests()
+    started = time.time()
+    resp = http.get(full_uri,
+                    headers=headers,
+                    params=prepare_params(params),
+                    **optionals)
+    _trace_response(resp, trace, started)
 
     # check if an exception should be raised based on http status code
     check_http_status(resp)
 
-    return resp.json()
+    if raw:
+        return resp.content.decode('utf-8')
+
+    return _decode_json(resp, trace, object_pairs_hook)
 
 
-def post(api_uri, data, endpoint=None, auth=None, check_ca=False):
+def post(api_uri, data, endpoint=None, auth=None, check_ca=False, session=None,
+         trace=None):
     """
     Dispatches an HTTP POST request to `api_uri`, with `data`.
 
@@ -208,6 +358,8 @@ def post(api_uri, data, endpoint=None, auth=None, check_ca=False):
     :param endpoint: (optional) a valid endpoint at http://manager.scielo.org/api/v1/
     :param auth: (optional) a pair of `username` and `api_key`.
     :param check_ca: (optional) if certification authority should be checked during ssl sessions. Defaults to `False`.
+    :param session: (optional) a session created by :func:`new_session`, to reuse connections.
+    :param trace: (optional) a dict to be filled with details about the response, i.e. `status`, `bytes` and `timings`.
     :returns: newly created resource url
     """
     if auth:
@@ -232,10 +384,17 @@ def post(api_uri, data, endpoint=None, auth=None, check_ca=False):
     logger.debug('Sending a POST request to %s with headers %s, data %s and params %s' %
         (full_url, headers, prepared_data, optionals))
 
-    resp = requests.post(url=full_url,
-                         data=prepared_data,
-                         headers=headers,
-                         **optionals)
+    if trace is not None:
+        # the body is read apart from the headers, to time each phase.
+        optionals['stream'] = True
+
+    http = session if session is not None else _requests()
+    started = time.time()
+    resp = http.post(url=full_url,
+                     data=prepared_data,
+                     headers=headers,
+                     **optionals)
+    _trace_response(resp, trace, started)
 
     # check if an exception should be raised based on http status code
     check_http_status(resp)
@@ -247,3 +406,68 @@ def post(api_uri, data, endpoint=None, auth=None, check_ca=False):
 
     return resp.headers['location']
 
+
+
+@translate_exceptions
+def patch(api_uri, data, endpoint=None, auth=None, check_ca=False, session=None,
+          trace=None, object_pairs_hook=None):
+    """
+    Dispatches an HTTP PATCH request to `api_uri`, with `data`.
+
+    Used to create resources in bulk, in a single request, following the
+    Tastypie's conventions, i.e. `data` is in the form ``{"objects": [...]}``.
+
+    :param api_uri: e.g. http://manager.scielo.org/api/v1/
+    :param data: json serializable Python datastructures.
+    :param endpoint: (optional) a valid endpoint at http://manager.scielo.org/api/v1/
+    :param auth: (optional) a pair of `username` and `api_key`.
+    :param check_ca: (optional) if certification authority should be checked during ssl sessions. Defaults to `False`.
+    :param session: (optional) a session created by :func:`new_session`, to reuse connections.
+    :param trace: (optional) a dict to be filled with details about the response, i.e. `status`, `bytes` and `timings`.
+    :param object_pairs_hook: (optional) passed to the JSON decoder, e.g. an :class:`scieloapi.interning.InternTable`.
+    :returns: the response body, or `None` if the server returns no content.
+    """
+    if auth:
+        username, api_key = auth
+    else:
+        username = api_key = None
+
+    full_url = _make_full_url(api_uri, endpoint)
+
+    # custom headers
+    headers = {'User-Agent': __user_agent__,
+               'Content-Type': 'application/json'}
+
+    optionals = {}
+    if username and api_key:
+        optionals['auth'] = ApiKeyAuth(username, api_key)
+
+    if full_url.startswith('https'):
+        optionals['verify'] = check_ca
+
+    prepared_data = prepare_data(data)
+    logger.debug('Sending a PATCH request to %s with headers %s and params %s' %
+        (full_url, headers, optionals))
+
+    if trace is not None:
+        # the body is read apart from the headers, to time each phase.
+        optionals['stream'] = True
+
+    http = session if session is not None else _requests()
+    started = time.time()
+    resp = http.patch(url=full_url,
+                      data=prepared_data,
+                      headers=headers,
+                      **optionals)
+    _trace_response(resp, trace, started)
+
+    # check if an exception should be raised based on http status code
+    check_http_status(resp)
+
+    if resp.status_code not in (200, 202, 204):
+        raise exceptions.APIError('The server gone nuts: %s' % resp.status_code)
+
+    if resp.status_code == 204 or not resp.content:
+        return None
+
+    return _decode_json(resp, trace, object_pairs_hook)
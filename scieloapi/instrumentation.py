@@ -0,0 +1,350 @@
+# coding: utf-8
+"""
+Request lifecycle hooks and an in-process metrics collector.
+
+Instances of :class:`Instrumentation` subclasses are passed to
+:class:`scieloapi.Connector` via the `instrumentation` kwarg, and are
+notified about the lifecycle of each request through events. Events are
+dicts with the following keys, when applicable:
+
+* `method`: the HTTP method, e.g. `GET`.
+* `endpoint`: the endpoint name.
+* `resource_id`: the resource id.
+* `params`: the query string params.
+* `attempt`: the attempt number, starting at 1.
+* `status`: the HTTP status code.
+* `bytes`: the size of the response body, as transferred, i.e. before being
+  decompressed. It is the decoded size if neither `Content-Length` nor the
+  raw stream give it.
+* `objects`: the number of decoded objects.
+* `elapsed`: seconds since the request was dispatched.
+* `timings`: seconds spent on each phase of the request, i.e. `ttfb`,
+  `download`, `decode` and `total`, as reported by the http broker.
+* `error`: the exception raised, at `error` and `retry` events.
+* `wait`: seconds to wait before retrying, at `retry` events.
+* `dropped`: the number of trashed documents filtered out of a page after
+  being downloaded, at `dropped` events.
+
+`dangling` events are emitted by :class:`scieloapi.Client` for relations to
+resources not found, with the `endpoint` and `resource_id` of the relation.
+
+`concurrency_limit` events are emitted by
+:class:`scieloapi.concurrency.AIMDController` when its limit changes.
+"""
+import json
+import os
+import threading
+import tempfile
+from collections import defaultdict
+
+
+__all__ = ['Instrumentation', 'MetricsCollector']
+
+# histogram buckets for request durations, in seconds.
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Instrumentation(object):
+    """
+    Base class for instrumentation hooks. All hooks do nothing by default,
+    and subclasses override the ones they are interested in.
+
+    Hooks are called from the threads dispatching the requests, so they
+    must be thread-safe.
+    """
+    def before_request(self, event):
+        """
+        Called before each attempt to dispatch a request.
+        """
+
+    def after_response(self, event):
+        """
+        Called after a successful response is received and decoded.
+        """
+
+    def retry(self, event):
+        """
+        Called when a failed request is going to be retried.
+        """
+
+    def cache_hit(self, event):
+        """
+        Called when a request is answered by a cache, without touching the network.
+        """
+
+    def error(self, event):
+        """
+        Called when a request fails, even if it is going to be retried.
+        """
+
+    def dropped(self, event):
+        """
+        Called when trashed documents are filtered out of a page after
+        being downloaded.
+        """
+
+    def dangling(self, event):
+        """
+        Called when a relation refers to a resource not found.
+        """
+
+    def concurrency_limit(self, event):
+        """
+        Called when the limit of concurrent requests is set or changed.
+        """
+
+
+class _Histogram(object):
+    """
+    Cumulative histogram, as defined by Prometheus.
+    """
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        return {
+            'buckets': [[bound, count] for bound, count in zip(self.buckets, self.counts)],
+            'sum': self.sum,
+            'count': self.count,
+        }
+
+
+def _format_labels(labels):
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+        pairs.append('%s="%s"' % (name, value))
+    return '{%s}' % ','.join(pairs)
+
+
+class MetricsCollector(Instrumentation):
+    """
+    Collects per-endpoint counters and latency histograms, and the limits
+    of the concurrency controllers.
+
+    The metrics can be exported as Prometheus text format, with
+    :meth:`to_prometheus`, or as JSON, with :meth:`to_json`, and dumped
+    to a local file with :meth:`dump`, e.g. to be read by the node exporter's
+    textfile collector.
+
+    Usage::
+
+        >>> metrics = MetricsCollector()
+        >>> conn = Connector('some.user', 'some.apikey', instrumentation=[metrics])
+        >>> ...
+        >>> metrics.dump('/var/lib/node_exporter/scieloapi.prom')
+
+    :param prefix: (optional) prefix of the metrics names. Defaults to `scieloapi`.
+    :param buckets: (optional) upper bounds of the latency histogram buckets, in seconds.
+    """
+    COUNTERS = (
+        ('requests_total', 'Responses received, by status code.'),
+        ('errors_total', 'Failed requests, by error.'),
+        ('retries_total', 'Retried requests.'),
+        ('cache_hits_total', 'Requests answered by a cache.'),
+        ('response_bytes_total', 'Bytes received in response bodies.'),
+        ('objects_total', 'Decoded objects.'),
+        ('dropped_objects_total', 'Trashed objects downloaded and filtered out.'),
+        ('dangling_relations_total', 'Relations to resources not found.'),
+    )
+    GAUGES = (
+        ('concurrency_limit', 'Current limit of concurrent requests, by controller.'),
+    )
+    HISTOGRAMS = (
+        ('request_duration_seconds', 'Time spent on each request.'),
+        ('request_phase_seconds', 'Time spent on each phase of the requests.'),
+    )
+    PHASES = ('ttfb', 'download', 'decode')
+
+    def __init__(self, prefix='scieloapi', buckets=DURATION_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: defaultdict(int))
+        self._gauges = defaultdict(dict)
+        self._histograms = defaultdict(dict)
+
+    def _inc(self, name, labels, value=1):
+        with self._lock:
+            self._counters[name][tuple(sorted(labels.items()))] += value
+
+    def _set(self, name, labels, value):
+        with self._lock:
+            self._gauges[name][tuple(sorted(labels.items()))] = value
+
+    def _observe(self, name, labels, value):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = self._histograms[name].get(key)
+            if histogram is None:
+                histogram = self._histograms[name][key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    def after_response(self, event):
+        labels = {'endpoint': event.get('endpoint') or '', 'method': event['method']}
+        # brokers may not trace the status, and it is left out if unknown,
+        # as labels of mixed types cannot be sorted.
+        if event.get('status') is not None:
+            self._inc('requests_total', dict(labels, status=event['status']))
+        else:
+            self._inc('requests_total', labels)
+        self._observe('request_duration_seconds', labels, event['elapsed'])
+
+        timings = event.get('timings') or {}
+        for phase in self.PHASES:
+            if phase in timings:
+                self._observe('request_phase_seconds', dict(labels, phase=phase),
+                              timings[phase])
+
+        if event.get('bytes') is not None:
+            self._inc('response_bytes_total', labels, event['bytes'])
+        if event.get('objects') is not None:
+            self._inc('objects_total', labels, event['objects'])
+
+    def error(self, event):
+        labels = {'endpoint': event.get('endpoint') or '', 'method': event['method']}
+        self._inc('errors_total', dict(labels, error=type(event['error']).__name__))
+        if event.get('status'):
+            self._inc('requests_total', dict(labels, status=event['status']))
+        self._observe('request_duration_seconds', labels, event['elapsed'])
+
+    def retry(self, event):
+        self._inc('retries_total', {'endpoint': event.get('endpoint') or '',
+                                    'method': event['method']})
+
+    def cache_hit(self, event):
+        self._inc('cache_hits_total', {'endpoint': event.get('endpoint') or '',
+                                       'method': event['method']})
+
+    def dropped(self, event):
+        self._inc('dropped_objects_total', {'endpoint': event.get('endpoint') or '',
+                                            'method': event['method']},
+                  event['dropped'])
+
+    def dangling(self, event):
+        self._inc('dangling_relations_total', {'endpoint': event.get('endpoint') or '',
+                                               'method': event['method']})
+
+    def concurrency_limit(self, event):
+        self._set('concurrency_limit', {'controller': event['controller']}, event['limit'])
+
+    def counter(self, name, **labels):
+        """
+        Gets the current value of a counter.
+
+        :param name: the counter name, without prefix, e.g. `requests_total`.
+        :param \*\*labels: all labels of the counter.
+        """
+        with self._lock:
+            return self._counters[name].get(tuple(sorted(labels.items())), 0)
+
+    def gauge(self, name, **labels):
+        """
+        Gets the current value of a gauge, or `None` if never set.
+
+        :param name: the gauge name, without prefix, e.g. `concurrency_limit`.
+        :param \*\*labels: all labels of the gauge.
+        """
+        with self._lock:
+            return self._gauges[name].get(tuple(sorted(labels.items())))
+
+    def to_dict(self):
+        """
+        Returns all metrics as Python datastructures.
+        """
+        with self._lock:
+            counters = dict(
+                (name, [{'labels': dict(key), 'value': value}
+                        for key, value in sorted(series.items())])
+                for name, series in self._counters.items())
+            gauges = dict(
+                (name, [{'labels': dict(key), 'value': value}
+                        for key, value in sorted(series.items())])
+                for name, series in self._gauges.items())
+            histograms = dict(
+                (name, [dict(labels=dict(key), **histogram.to_dict())
+                        for key, histogram in sorted(series.items())])
+                for name, series in self._histograms.items())
+
+        return {'counters': counters, 'gauges': gauges, 'histograms': histograms}
+
+    def to_json(self):
+        """
+        Returns all metrics as a JSON document.
+        """
+        return json.dumps(self.to_dict(), sort_keys=True)
+
+    def to_prometheus(self):
+        """
+        Returns all metrics in Prometheus text exposition format.
+        """
+        metrics = self.to_dict()
+        lines = []
+
+        for name, help_text in self.COUNTERS:
+            full_name = '%s_%s' % (self.prefix, name)
+            lines.append('# HELP %s %s' % (full_name, help_text))
+            lines.append('# TYPE %s counter' % full_name)
+            for series in metrics['counters'].get(name, []):
+                lines.append('%s%s %s' % (full_name,
+                    _format_labels(sorted(series['labels'].items())), series['value']))
+
+        for name, help_text in self.GAUGES:
+            full_name = '%s_%s' % (self.prefix, name)
+            lines.append('# HELP %s %s' % (full_name, help_text))
+            lines.append('# TYPE %s gauge' % full_name)
+            for series in metrics['gauges'].get(name, []):
+                lines.append('%s%s %s' % (full_name,
+                    _format_labels(sorted(series['labels'].items())), series['value']))
+
+        for name, help_text in self.HISTOGRAMS:
+            full_name = '%s_%s' % (self.prefix, name)
+            lines.append('# HELP %s %s' % (full_name, help_text))
+            lines.append('# TYPE %s histogram' % full_name)
+            for series in metrics['histograms'].get(name, []):
+                labels = sorted(series['labels'].items())
+                for bound, count in series['buckets']:
+                    lines.append('%s_bucket%s %s' % (full_name,
+                        _format_labels(labels + [('le', repr(float(bound)))]), count))
+                lines.append('%s_bucket%s %s' % (full_name,
+                    _format_labels(labels + [('le', '+Inf')]), series['count']))
+                lines.append('%s_sum%s %r' % (full_name, _format_labels(labels), series['sum']))
+                lines.append('%s_count%s %s' % (full_name, _format_labels(labels), series['count']))
+
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path, format='prometheus'):
+        """
+        Writes all metrics to `path`.
+
+        The file is replaced atomically, so readers never see it half written.
+
+        :param path: the file path.
+        :param format: (optional) `prometheus` or `json`. Defaults to `prometheus`.
+        """
+        if format == 'prometheus':
+            content = self.to_prometheus()
+        elif format == 'json':
+            content = self.to_json()
+        else:
+            raise ValueError('unknown format %s' % format)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.scieloapi-metrics')
+        try:
+            with os.fdopen(fd, 'w') as tmp_file:
+                tmp_file.write(content)
+            os.rename(tmp_path, path)
+        except:
+            os.remove(tmp_path)
+            raise
@@ -0,0 +1,78 @@
+# coding: utf-8
+"""
+Interning of strings repeated across decoded documents.
+
+Harvested documents repeat the same resource URIs, collection names,
+language codes and so on many times, each one as a distinct string object.
+An :class:`InternTable` is used as the `object_pairs_hook` of the JSON
+decoder, so equal strings are shared as a single object::
+
+    >>> conn = Connector('some.user', 'some.apikey', interning=True)
+
+The table is bounded: when it is full, new strings are no longer interned,
+but the ones already in the table keep being shared.
+"""
+
+
+__all__ = ['InternTable']
+
+
+class InternTable(object):
+    """
+    Bounded table of interned strings.
+
+    Instances are callables to be passed as `object_pairs_hook` to
+    :func:`json.loads`. Keys and string values of objects are interned,
+    as well as strings in lists, e.g. lists of resource URIs.
+
+    :param maxsize: (optional) max number of strings in the table. Defaults to 100000.
+    :param max_length: (optional) longer strings are not interned. Defaults to 200.
+    """
+    def __init__(self, maxsize=100000, max_length=200):
+        self.maxsize = maxsize
+        self.max_length = max_length
+        self._table = {}
+
+    def intern(self, value):
+        """
+        Returns the interned version of `value`, if it is a string.
+        """
+        if not isinstance(value, basestring) or len(value) > self.max_length:
+            return value
+
+        try:
+            return self._table[value]
+        except KeyError:
+            if len(self._table) >= self.maxsize:
+                return value
+            # setdefault keeps a single instance when threads race.
+            return self._table.setdefault(value, value)
+
+    def __call__(self, pairs):
+        intern = self.intern
+        obj = {}
+        for key, value in pairs:
+            if isinstance(value, list):
+                value = [intern(elem) for elem in value]
+            else:
+                value = intern(value)
+            obj[intern(key)] = value
+
+        return obj
+
+    @property
+    def size(self):
+        """
+        Number of strings in the table.
+        """
+        return len(self._table)
+
+    def clear(self):
+        """
+        Removes all strings from the table.
+        """
+        self._table.clear()
+
+    def __reduce__(self):
+        # only the configuration is pickled.
+        return (InternTable, (self.maxsize, self.max_length))
@@ -0,0 +1,253 @@
+# coding: utf-8
+"""
+Lazy queries over the documents of an endpoint.
+
+A :class:`QuerySet` is returned by :meth:`scieloapi.Endpoint.all` and
+:meth:`scieloapi.Endpoint.filter`. No request is dispatched until it is
+iterated, or one of :meth:`QuerySet.count`, :meth:`QuerySet.exists` or
+:meth:`QuerySet.first` is called, and each one dispatches as few requests
+as possible::
+
+    >>> issues = cli.query('issues').filter(collection='brasil')
+    >>> issues.count()
+    12345
+    >>> for issue in issues.order_by('id')[1000:1100]:
+    ...     print issue['resource_uri']
+
+Relations of the documents are fetched with `with_relations`, for all
+documents of a page at once, while the next page is downloaded, so the
+documents are produced already enriched::
+
+    >>> for issue in issues.filter(with_relations=['journal'])[:100]:
+    ...     print issue['journal']['title']
+
+Slices are harvested by offsets, so they count trashed documents that are
+filtered out after download, unless trashed documents are filtered by the
+server. See the `trash_filtering` param of :class:`scieloapi.Connector`.
+Slices of endpoints that use keyset pagination are harvested by offsets
+too, ordered by `id` unless ordered otherwise.
+"""
+import numbers
+
+from . import sharding
+from . import concurrency
+
+
+__all__ = ['QuerySet']
+
+
+class QuerySet(object):
+    """
+    A lazy, chainable and sliceable query over the documents of an endpoint.
+
+    :param endpoint: instance of :class:`scieloapi.Endpoint`.
+    :param params: (optional) filtering criteria, passed as query string params.
+    :param compact: (optional) if documents should be produced as compact records. Defaults to `False`.
+    :param lazy: (optional) if documents should be produced as lazy records. Defaults to `False`.
+    :param include_trashed: (optional) if trashed documents should be produced too. Defaults to `False`.
+    :param shard: (optional) a shard spec from :mod:`scieloapi.sharding`.
+    :param with_relations: (optional) a collection of relations to be fetched for each document. See :meth:`scieloapi.Client.fetch_relations_many`.
+    :param dangling: (optional) how relations to resources not found are handled. See :meth:`scieloapi.Client.fetch_relations`. Defaults to `raise`.
+    """
+    def __init__(self, endpoint, params=None, compact=False, lazy=False,
+                 include_trashed=False, shard=None, start=0, stop=None,
+                 with_relations=None, dangling='raise'):
+        self.endpoint = endpoint
+        self.params = dict(params or {})
+        self.compact = compact
+        self.lazy = lazy
+        self.include_trashed = include_trashed
+        self.shard = shard
+        self.start = start
+        self.stop = stop
+        self.with_relations = with_relations
+        self.dangling = dangling
+
+    def _clone(self, **changes):
+        state = dict(params=self.params, compact=self.compact, lazy=self.lazy,
+                     include_trashed=self.include_trashed, shard=self.shard,
+                     start=self.start, stop=self.stop,
+                     with_relations=self.with_relations, dangling=self.dangling)
+        state.update(changes)
+        return QuerySet(self.endpoint, **state)
+
+    @property
+    def _sliced(self):
+        return self.start != 0 or self.stop is not None
+
+    def filter(self, **kwargs):
+        """
+        Returns a new query narrowed by `kwargs`.
+
+        The special kwargs `compact`, `lazy`, `include_trashed`, `shard`,
+        `with_relations` and `dangling` are handled as by :meth:`scieloapi.Endpoint.filter`,
+        and are not sent as query string params.
+
+        :param \*\*kwargs: filtering criteria as documented at `docs.scielo.org <http://ref.scielo.org/ph6gvk>`_
+        """
+        if self._sliced:
+            raise TypeError('cannot filter a query once a slice has been taken')
+
+        options = {}
+        for option in ('compact', 'lazy', 'include_trashed', 'shard', 'with_relations',
+                       'dangling'):
+            if option in kwargs:
+                options[option] = kwargs.pop(option)
+
+        return self._clone(params=dict(self.params, **kwargs), **options)
+
+    def order_by(self, *fields):
+        """
+        Returns a new query ordered by `fields`. Prefix a field with `-`
+        to sort it in descending order.
+
+        :param \*fields: field names supported for ordering by the endpoint.
+        """
+        if self._sliced:
+            raise TypeError('cannot reorder a query once a slice has been taken')
+
+        params = dict(self.params)
+        params.pop('order_by', None)
+        if fields:
+            params['order_by'] = fields[0] if len(fields) == 1 else list(fields)
+
+        return self._clone(params=params)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            if key.step not in (None, 1):
+                raise ValueError('slices with step are not supported')
+            start, stop = key.start or 0, key.stop
+        elif isinstance(key, numbers.Integral):
+            start, stop = key, key + 1
+        else:
+            raise TypeError('query indices must be integers or slices')
+
+        if start < 0 or (stop is not None and stop < 0):
+            raise ValueError('negative indices are not supported')
+        if self.shard is not None:
+            raise TypeError('cannot slice a sharded query')
+
+        # slices are relative to the current one.
+        new_start = self.start + start
+        new_stop = self.start + stop if stop is not None else None
+        if self.stop is not None:
+            new_stop = self.stop if new_stop is None else min(new_stop, self.stop)
+        new_start = min(new_start, new_stop) if new_stop is not None else new_start
+
+        query = self._clone(start=new_start, stop=new_stop)
+        if isinstance(key, slice):
+            return query
+
+        for doc in query:
+            return doc
+        raise IndexError('query index out of range')
+
+    def __iter__(self):
+        if self.stop is not None and self.stop <= self.start:
+            return iter([])
+
+        params = dict(self.params)
+        if self.lazy:
+            params['lazy'] = True
+        if self.include_trashed:
+            params['include_trashed'] = True
+        if self.shard is not None:
+            params['shard'] = self.shard
+        elif self._sliced:
+            params['shard'] = sharding.OffsetRange(self.start, self.stop)
+            connector = self.endpoint.connector
+            if connector.pagination_strategy(self.endpoint.name) == 'keyset':
+                # keyset pages cannot start at an offset, so the slice is
+                # paged by offsets, in the same order.
+                params['pagination'] = 'offset'
+                params.setdefault('order_by', 'id')
+
+        if self.with_relations:
+            docs = self._iter_with_relations(params)
+        else:
+            docs = self.endpoint.connector.iter_docs(self.endpoint.name, **params)
+        return self.endpoint._compact(docs) if self.compact else docs
+
+    def _iter_with_relations(self, params):
+        """
+        Fetches the relations of each page in a background thread, while
+        another one downloads the next page.
+        """
+        client = self.endpoint.client
+        if client is None:
+            raise ValueError('relations are fetched only by endpoints of a Client')
+
+        pages = self.endpoint.connector.iter_pages(self.endpoint.name, **params)
+        batches = concurrency.prefetch(
+            client.fetch_relations_many(page.objects, only=self.with_relations,
+                                        dangling=self.dangling)
+            for page in concurrency.prefetch(pages))
+
+        for batch in batches:
+            for doc in batch:
+                yield doc
+
+    def count(self):
+        """
+        Counts the documents matching the query, with a single request for
+        one document. Trashed documents are counted too unless they are
+        filtered by the server.
+        """
+        if self.shard is not None:
+            raise TypeError('cannot count a sharded query')
+
+        connector = self.endpoint.connector
+        params = dict(self.params, limit=1, offset=0)
+        if not self.include_trashed:
+            params.update(connector.trash_params(self.endpoint.name))
+
+        total_count = connector.fetch_data(self.endpoint.name, **params)['meta']['total_count']
+        total_count = max(total_count - self.start, 0)
+        if self.stop is not None:
+            total_count = min(total_count, self.stop - self.start)
+
+        return total_count
+
+    def _requested_are_produced(self):
+        """
+        If the documents requested are the ones produced, i.e. no trashed
+        document is dropped after being downloaded, so that a single
+        document can be requested.
+        """
+        if self.shard is not None:
+            return False
+        if self.include_trashed:
+            return True
+
+        return bool(self.endpoint.connector.trash_params(self.endpoint.name))
+
+    def first(self):
+        """
+        Gets the first document matching the query, or `None`. A single
+        document is requested unless trashed documents are dropped after
+        being downloaded.
+        """
+        if self._requested_are_produced():
+            docs = self[0:1]
+        else:
+            docs = self
+
+        for doc in docs:
+            return doc
+
+        return None
+
+    def exists(self):
+        """
+        Checks if any document matches the query, by counting them unless
+        trashed documents are dropped after being downloaded.
+        """
+        if self._requested_are_produced():
+            return self.count() > 0
+
+        return self.first() is not None
+
+    def __repr__(self):
+        return '<QuerySet %s %r [%s:%s]>' % (self.endpoint.name, self.params,
+                                              self.start, self.stop)
@@ -0,0 +1,585 @@
+# coding: utf-8
+"""
+Compact record types, an alternative to plain dicts for harvested documents.
+
+A record type is generated for each endpoint from its schema, and its
+instances store the fields in `__slots__`, so records do not carry a
+per-instance `dict` with its own copy of the keys. Records support both
+attribute and mapping access, and are converted back to dicts with
+:meth:`Record.to_dict`::
+
+    >>> issues = cli.query('issues')
+    >>> for issue in issues.all(compact=True):
+    ...     print issue.publication_year, issue['volume']
+
+Fields missing from the schema are kept in a regular dict, as are fields
+that are not valid identifiers or that shadow the record methods.
+
+Lazy records, produced with `lazy=True`, keep the raw JSON text of each
+document, and decode its fields only when accessed::
+
+    >>> for issue in issues.filter(collection='brasil', lazy=True):
+    ...     print issue['publication_year']
+"""
+import re
+import json
+import bisect
+import threading
+
+
+__all__ = ['Record', 'make_record_type', 'record_type_from_schema',
+           'LazyRecord', 'parse_page', 'as_dict']
+
+IDENTIFIER_PATTERN = re.compile(r'^[A-Za-z]\w*$')
+
+# tokens of the JSON scanner.
+STRING = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+# anything but strings and brackets.
+PLAIN = r'[^"{}\[\]]*'
+STRING_PATTERN = re.compile(STRING)
+SCALAR_PATTERN = re.compile(r'[^,:\]}\s]+')
+WHITESPACE_PATTERN = re.compile(r'\s*')
+# the text up to the next bracket that is not in a string.
+BRACKET_PATTERN = re.compile(r'%s(?:%s%s)*([{}\[\]])' % (PLAIN, STRING, PLAIN))
+
+CLOSING = {'{': '}', '[': ']'}
+
+_decoder = json.JSONDecoder()
+_MISSING = object()
+
+# the JSON text of the keys searched for in lazy records. Keys are field
+# names, but the cache is bounded in case of arbitrary ones.
+_needles = {}
+MAX_NEEDLES = 1024
+
+# record types are shared by name and fields, so records can be unpickled
+# in other processes.
+_types = {}
+_types_lock = threading.Lock()
+
+
+class Record(object):
+    """
+    Base class of the generated record types.
+    """
+    __slots__ = ('_extra',)
+    _fields = ()
+    _field_set = frozenset()
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Creates a record from a decoded document.
+
+        :param data: a dict.
+        """
+        record = cls.__new__(cls)
+        extra = None
+        for key, value in data.items():
+            if key in cls._field_set:
+                object.__setattr__(record, str(key), value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+
+        record._extra = extra
+        return record
+
+    def to_dict(self):
+        """
+        Returns the record as a plain dict.
+        """
+        return dict(self.items())
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [value for key, value in self.items()]
+
+    def items(self):
+        items = []
+        for field in self._fields:
+            try:
+                items.append((field, getattr(self, field)))
+            except AttributeError:
+                continue
+
+        if self._extra:
+            items.extend(self._extra.items())
+        return items
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __getitem__(self, key):
+        if key in self._field_set:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def __iter__(self):
+        for key, value in self.items():
+            yield key
+
+    def __len__(self):
+        return len(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, (Record, dict)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '<%s %r>' % (type(self).__name__, self.to_dict())
+
+    def __reduce__(self):
+        return (_restore, (type(self).__name__, self._fields, self.to_dict()))
+
+
+def _restore(name, fields, data):
+    return make_record_type(name, fields).from_dict(data)
+
+
+def make_record_type(name, fields):
+    """
+    Creates a :class:`Record` subclass to store `fields` compactly.
+
+    Types are cached, so calling it again with the same arguments
+    returns the same type.
+
+    :param name: the type name.
+    :param fields: a list of field names.
+    """
+    reserved = set(dir(Record))
+    slots = tuple(sorted(str(field) for field in fields
+                         if IDENTIFIER_PATTERN.match(field) and field not in reserved))
+    key = (str(name), slots)
+
+    with _types_lock:
+        if key not in _types:
+            _types[key] = type(key[0], (Record,), {
+                '__slots__': slots,
+                '_fields': slots,
+                '_field_set': frozenset(slots),
+            })
+        return _types[key]
+
+
+def record_type_from_schema(name, schema):
+    """
+    Creates the record type of an endpoint from its schema.
+
+    :param name: the endpoint name.
+    :param schema: the endpoint schema, as returned by the API at `<endpoint>/schema/`.
+    """
+    type_name = ''.join(part.capitalize() for part in re.split(r'\W+|_', name)) + 'Record'
+    return make_record_type(type_name, schema.get('fields', {}).keys())
+
+
+def _skip_whitespace(text, pos):
+    return WHITESPACE_PATTERN.match(text, pos).end()
+
+
+def _expect(text, pos, char):
+    pos = _skip_whitespace(text, pos)
+    if text[pos:pos+1] != char:
+        raise ValueError('Expecting %r at char %s' % (char, pos))
+    return pos + 1
+
+
+def _quotes(text, start, end):
+    """
+    Counts the quotes between `start` and `end` that delimit strings, or
+    returns `None` if it cannot be told, as with escaped backslashes.
+    """
+    quotes = text.count('"', start, end)
+    if text.find('\\', start, end) != -1:
+        if text.find('\\\\', start, end) != -1:
+            return None
+        quotes -= text.count('\\"', start, end)
+    return quotes
+
+
+def _skip_nested(text, pos, nested=None):
+    """
+    Finds where the array or object starting at `pos` ends, without
+    decoding it. Only its brackets are visited, and they are told apart
+    from the ones in strings by the parity of the quotes before them,
+    counted by the C string methods. Brackets of other types are not
+    matched, and values are validated when decoded.
+
+    :param nested: (optional) a list, to which the starts and ends of the objects nested in the object at `pos`, but not in others, are appended as offsets from `pos`.
+    """
+    find, count = text.find, text.count
+    opening = text[pos]
+    closing = CLOSING[opening]
+    # openings are only searched up to the next closing, so the text is
+    # searched once.
+    next_closing = find(closing, pos + 1)
+    next_opening = find(opening, pos + 1, next_closing)
+    depth, quotes, last = 1, 0, pos
+    while next_closing != -1:
+        if next_opening != -1:
+            bracket, delta = next_opening, 1
+            next_opening = find(opening, bracket + 1, next_closing)
+        else:
+            bracket, delta = next_closing, -1
+            next_closing = find(closing, bracket + 1)
+            if next_closing != -1:
+                next_opening = find(opening, bracket + 1, next_closing)
+
+        # inlined `_quotes`, as this is the hot loop of lazy records.
+        quotes += count('"', last, bracket)
+        if find('\\', last, bracket) != -1:
+            if find('\\\\', last, bracket) != -1:
+                break
+            quotes -= count('\\"', last, bracket)
+
+        last = bracket
+        if quotes % 2 == 0:
+            depth += delta
+            if depth == 0:
+                return bracket + 1
+            elif nested is not None and depth - (delta > 0) == 1:
+                nested.append(bracket - pos if delta > 0 else bracket + 1 - pos)
+
+    # escaped backslashes, or unterminated: strings and brackets are
+    # scanned one by one.
+    if nested is not None:
+        del nested[:]
+    depth = braces = 0
+    end = pos
+    while True:
+        match = BRACKET_PATTERN.match(text, end)
+        if not match:
+            raise ValueError('Unterminated value at char %s' % end)
+        end = match.end()
+        delta = 1 if match.group(1) in '{[' else -1
+        depth += delta
+        if depth == 0:
+            return end
+        elif nested is not None and match.group(1) in '{}':
+            braces += delta
+            if braces - (delta > 0) == 1:
+                nested.append(end - 1 - pos if delta > 0 else end - pos)
+
+
+def _skip_value(text, pos):
+    """
+    Finds where the JSON value starting at `pos` ends.
+    """
+    char = text[pos:pos+1]
+    if char in ('{', '['):
+        return _skip_nested(text, pos)
+    elif char == '"':
+        match = STRING_PATTERN.match(text, pos)
+    else:
+        match = SCALAR_PATTERN.match(text, pos)
+
+    if not match:
+        raise ValueError('Invalid JSON value at char %s' % pos)
+    return match.end()
+
+
+def _scan_members(text, pos, closing, keyed, skip=_skip_value):
+    """
+    Yields the spans of the members of the object or array opened right
+    before `pos`, as ``(key, start, end)``. Keys are `None` for arrays.
+    Values are skipped by `skip`, that returns where they end.
+    """
+    pos = _skip_whitespace(text, pos)
+    if text[pos:pos+1] == closing:
+        return
+
+    while True:
+        key = None
+        if keyed:
+            pos = _skip_whitespace(text, pos)
+            key_end = _skip_value(text, pos)
+            key = text[pos+1:key_end-1]
+            if '\\' in key or not isinstance(key, type(u'')):
+                key = json.loads(text[pos:key_end])
+            pos = _expect(text, key_end, ':')
+
+        start = _skip_whitespace(text, pos)
+        end = skip(text, start)
+        yield key, start, end
+
+        pos = _skip_whitespace(text, end)
+        char = text[pos:pos+1]
+        if char == closing:
+            return
+        elif char != ',':
+            raise ValueError('Expecting , or %s at char %s' % (closing, pos))
+        pos += 1
+
+
+def _scan_object(text, pos=0, skip=_skip_value):
+    pos = _expect(text, pos, '{')
+    return _scan_members(text, pos, '}', keyed=True, skip=skip)
+
+
+def _scan_array(text, pos=0, skip=_skip_value):
+    pos = _expect(text, pos, '[')
+    return _scan_members(text, pos, ']', keyed=False, skip=skip)
+
+
+def _decode(text, pos):
+    try:
+        return _decoder.scan_once(text, pos)[0]
+    except StopIteration:
+        raise ValueError('Invalid JSON value at char %s' % pos)
+
+
+def _preceding_char(text, pos):
+    """
+    Gets the last non-whitespace char before `pos`.
+    """
+    pos -= 1
+    while pos >= 0 and text[pos] in ' \t\n\r':
+        pos -= 1
+    return text[pos:pos+1] if pos >= 0 else ''
+
+
+def _find_value(text, key, nested):
+    """
+    Finds where the value of `key` starts in the JSON object `text` by
+    searching for the key, and skipping the objects nested before it,
+    instead of scanning all members before it.
+
+    Returns `None` if the key is not found this way, e.g. when it has escaped
+    characters or is missing, and the members must be scanned.
+
+    :param nested: the starts and ends of the objects nested in `text` found by previous calls, followed by where the search stopped, that is out of strings. It is updated in place only if the key is found.
+    """
+    try:
+        needle = _needles[key]
+    except KeyError:
+        needle = json.dumps(key)
+        if not needle.startswith('"'):
+            return None
+
+    # the spans are copied before being extended, so `nested` is left as
+    # it is if the key is not found.
+    spans, checked = nested, nested[-1]
+    pos = text.find(needle)
+    while pos != -1:
+        colon = _skip_whitespace(text, pos + len(needle))
+        # an unescaped quote is always a delimiter, that opens or closes
+        # a string.
+        if text[pos-1:pos] != '\\' and text[colon:colon+1] == ':':
+            start = text.find('{', checked, pos)
+            while start != -1:
+                quotes = _quotes(text, checked, start)
+                if quotes is None:
+                    return None
+                elif quotes % 2:
+                    start = text.find('{', start + 1, pos)
+                else:
+                    if spans is nested:
+                        spans = nested[:-1]
+                    checked = _skip_nested(text, start)
+                    spans.extend((start, checked))
+                    start = text.find('{', checked, pos)
+
+            count = len(spans) - 1 if spans is nested else len(spans)
+            index = bisect.bisect(spans, pos, 0, count)
+            if index % 2 == 0:
+                # out of the nested objects, the match is a key of the
+                # object if it opens a string that follows { or ,.
+                if index == count and checked <= pos:
+                    outside = checked
+                else:
+                    outside = spans[index-1] if index else 0
+                quotes = _quotes(text, outside, pos)
+                if quotes is None:
+                    return None
+                elif quotes % 2 == 0 and _preceding_char(text, pos) in ('{', ','):
+                    if spans is nested:
+                        nested[-1] = max(checked, pos)
+                    else:
+                        nested[:] = spans + [max(checked, pos)]
+                    if len(_needles) < MAX_NEEDLES:
+                        _needles[key] = needle
+                    return _skip_whitespace(text, colon + 1)
+
+        pos = text.find(needle, pos + 1)
+
+    return None
+
+
+class LazyRecord(object):
+    """
+    A document that keeps its raw JSON text, and decodes each field on
+    its first access.
+
+    It supports the read-only mapping interface of dicts.
+
+    :param raw: the JSON text of the document, an object.
+    """
+    __slots__ = ('_raw', '_starts', '_nested', '_values')
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._starts = None
+        self._nested = None
+        self._values = {}
+
+    @classmethod
+    def _from_text(cls, text, start, end, nested):
+        # records split from a page know where their nested objects are.
+        record = cls(text[start:end])
+        nested.append(end - start)
+        record._nested = nested
+        return record
+
+    def _field_starts(self):
+        if self._starts is None:
+            self._starts = dict((key, start)
+                                for key, start, end in _scan_object(self._raw))
+        return self._starts
+
+    def _field_start(self, key):
+        if self._starts is None:
+            if self._nested is None:
+                self._nested = [_expect(self._raw, 0, '{')]
+            start = _find_value(self._raw, key, self._nested)
+            if start is not None:
+                return start
+        return self._field_starts()[key]
+
+    def __getitem__(self, key):
+        value = self._values.get(key, _MISSING)
+        if value is _MISSING:
+            value = self._values[key] = _decode(self._raw, self._field_start(key))
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self._field_starts())
+
+    def values(self):
+        return [self[key] for key in self._field_starts()]
+
+    def items(self):
+        return [(key, self[key]) for key in self._field_starts()]
+
+    def to_dict(self):
+        """
+        Returns the document as a plain dict, decoding all fields.
+        """
+        return json.loads(self._raw)
+
+    def __contains__(self, key):
+        return key in self._field_starts()
+
+    def __iter__(self):
+        return iter(self._field_starts())
+
+    def __len__(self):
+        return len(self._field_starts())
+
+    def __eq__(self, other):
+        if isinstance(other, (LazyRecord, Record, dict)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '<LazyRecord %s>' % self._raw[:60]
+
+    def __reduce__(self):
+        return (LazyRecord, (self._raw,))
+
+
+def as_dict(doc):
+    """
+    Returns `doc` as a plain dict if it is a :class:`Record` or a
+    :class:`LazyRecord`, e.g. to be serialized. Other documents are
+    returned as they are.
+    """
+    if isinstance(doc, (Record, LazyRecord)):
+        return doc.to_dict()
+    return doc
+
+
+def _split_objects(text, pos):
+    """
+    Splits the array of objects starting at `pos` into lazy records, that
+    know where their nested objects are, and finds where it ends.
+    """
+    records = []
+
+    def skip(text, start):
+        if text[start:start+1] != '{':
+            raise ValueError('Expecting object at char %s' % start)
+        nested = []
+        end = _skip_nested(text, start, nested)
+        records.append(LazyRecord._from_text(text, start, end, nested))
+        return end
+
+    end = pos + 1
+    for _, start, end in _scan_array(text, pos, skip=skip):
+        pass
+    return records, _expect(text, end, ']')
+
+
+def parse_page(text):
+    """
+    Parses a page of a list endpoint from its JSON text, producing its
+    `objects` as :class:`LazyRecord` instances. Other members, e.g. `meta`,
+    are decoded.
+
+    :param text: the response body, as text.
+    """
+    # arrays of objects are split into records while skipping them, by
+    # their start, so `objects` is scanned once.
+    items = {}
+
+    def split(text, pos):
+        if text[pos:pos+1] == '[':
+            first = _skip_whitespace(text, pos + 1)
+            if text[first:first+1] in ('{', ']'):
+                items[pos], end = _split_objects(text, pos)
+                return end
+        return _skip_value(text, pos)
+
+    page = {}
+    for key, start, end in _scan_object(text, skip=split):
+        if key == 'objects':
+            if start not in items:
+                raise ValueError('Expecting objects array at char %s' % start)
+            page[key] = items[start]
+        else:
+            page[key] = json.loads(text[start:end])
+
+    return page
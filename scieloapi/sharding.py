@@ -0,0 +1,115 @@
+# coding: utf-8
+"""
+Shard specs to split the harvest of an endpoint among independent nodes.
+
+Each node passes its own spec to :meth:`scieloapi.Connector.iter_docs`
+(or :meth:`scieloapi.Endpoint.filter`) as the `shard` kwarg, and harvests
+a disjoint slice of the endpoint. The union of the slices of all shards
+equals a full harvest.
+
+Specs based on offsets rely on the ordering of the items being stable
+among the nodes, so it is a good idea to pass an explicit ordering param,
+e.g. ``order_by='id'``, where the endpoint supports it.
+"""
+
+__all__ = ['Shard', 'OffsetRange', 'FieldPartition']
+
+
+class OffsetRange(object):
+    """
+    Explicit range of offsets, from `start` (inclusive) to `stop` (exclusive).
+
+    :param start: the first offset.
+    :param stop: (optional) the offset where the harvest stops. By default, goes until the last item.
+    """
+    def __init__(self, start, stop=None):
+        if start < 0 or (stop is not None and stop < start):
+            raise ValueError('invalid offset range: %s-%s' % (start, stop))
+
+        self.start = start
+        self.stop = stop
+
+    def slices(self, connector, endpoint, params):
+        """
+        Returns a list of ``(params, start, stop)`` slices to be harvested.
+        """
+        return [(params, self.start, self.stop)]
+
+
+class Shard(object):
+    """
+    The `index`-th of `count` contiguous ranges of offsets of similar sizes.
+
+    The ranges are computed from `meta.total_count`, so an extra request
+    is dispatched to get it.
+
+    :param index: zero based index of the shard.
+    :param count: total number of shards.
+    """
+    def __init__(self, index, count):
+        if count < 1 or not 0 <= index < count:
+            raise ValueError('invalid shard: %s of %s' % (index, count))
+
+        self.index = index
+        self.count = count
+
+    @classmethod
+    def from_string(cls, spec):
+        """
+        Creates an instance from a string in the form `index/count`, e.g. `0/4`.
+        """
+        try:
+            index, count = [int(part) for part in spec.split('/')]
+        except ValueError:
+            raise ValueError('invalid shard spec: %s' % spec)
+
+        return cls(index, count)
+
+    def offset_range(self, total_count):
+        """
+        Returns the :class:`OffsetRange` of this shard.
+        """
+        start = self.index * total_count // self.count
+        stop = (self.index + 1) * total_count // self.count
+        return OffsetRange(start, stop)
+
+    def slices(self, connector, endpoint, params):
+        """
+        Returns a list of ``(params, start, stop)`` slices to be harvested.
+        """
+        qry_params = dict(params, limit=1, offset=0)
+        total_count = connector.fetch_data(endpoint, **qry_params)['meta']['total_count']
+
+        return self.offset_range(total_count).slices(connector, endpoint, params)
+
+
+class FieldPartition(object):
+    """
+    Partitions the harvest by the values of a filtering field, e.g. `collection`.
+
+    The values are distributed among `count` shards in a round-robin fashion,
+    after being sorted, and each value is harvested as a filter.
+
+    :param field: the name of the filtering field.
+    :param values: all values of the field.
+    :param index: zero based index of the shard.
+    :param count: total number of shards.
+    """
+    def __init__(self, field, values, index, count):
+        if count < 1 or not 0 <= index < count:
+            raise ValueError('invalid shard: %s of %s' % (index, count))
+
+        self.field = field
+        self.values = sorted(set(values))
+        self.index = index
+        self.count = count
+
+    def slices(self, connector, endpoint, params):
+        """
+        Returns a list of ``(params, start, stop)`` slices to be harvested.
+        """
+        if self.field in params:
+            raise ValueError('%s is already used as filter' % self.field)
+
+        return [(dict(params, **{self.field: value}), 0, None)
+                for value in self.values[self.index::self.count]]
@@ -0,0 +1,245 @@
+# coding: utf-8
+"""
+Read-only snapshots of harvested documents, with random access by id.
+
+A snapshot is a single file with the documents serialized as JSON, followed
+by an index of their ids sorted, with the position of each document. It is
+created from a harvest::
+
+    >>> from scieloapi import snapshot
+    >>> snapshot.create('issues.snapshot', conn.iter_docs('issues'))
+
+and read through a memory map, so documents are got by id with a binary
+search over the index, without loading the file into memory::
+
+    >>> issues = snapshot.Snapshot('issues.snapshot')
+    >>> issues.get(70)['volume']
+
+The pages of the file are shared by all processes of a host that open the
+same snapshot, through the page cache of the operating system. Instances
+can be pickled, e.g. to be sent to the processes of a pool: only the path
+is pickled, and the file is mapped again.
+"""
+import os
+import json
+import mmap
+import struct
+from array import array
+
+from .records import LazyRecord, as_dict
+
+
+__all__ = ['Snapshot', 'SnapshotWriter', 'create']
+
+MAGIC = b'SCLSNAP1'
+# magic, number of documents and position of the index.
+HEADER = struct.Struct('<8sQQ')
+# id, position and length of a document.
+INDEX_ENTRY = struct.Struct('<qQI')
+
+
+class SnapshotWriter(object):
+    """
+    Writes documents to a new snapshot file.
+
+    Documents are written as they come, and only their ids and positions
+    are kept in memory to build the index on :meth:`close`. The file is
+    written under a temporary name, and renamed when it is complete.
+    When an id is written more than once, the last document wins.
+
+    :param path: the snapshot file.
+    :param id_field: (optional) the field with the integer id of the documents. Defaults to `id`.
+    """
+    def __init__(self, path, id_field='id'):
+        self.path = path
+        self.id_field = id_field
+        self._tmp_path = path + '.tmp'
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, 0, 0))
+        self._position = HEADER.size
+
+        self.count = 0
+        self._ids = array('l')
+        self._positions = array('L')
+        self._lengths = array('L')
+
+    def write(self, doc):
+        """
+        Appends `doc` to the snapshot.
+        """
+        doc_id = doc[self.id_field]
+        try:
+            if isinstance(doc_id, bool):
+                raise TypeError()
+            doc_id = int(doc_id)
+        except (TypeError, ValueError):
+            raise ValueError('ids must be integers, got %r' % (doc_id,))
+
+        data = json.dumps(as_dict(doc), sort_keys=True, separators=(',', ':')).encode('utf-8') + b'\n'
+        self._file.write(data)
+
+        self._ids.append(doc_id)
+        self._positions.append(self._position)
+        self._lengths.append(len(data) - 1)
+        self._position += len(data)
+
+    def write_many(self, docs):
+        """
+        Appends all `docs` to the snapshot.
+
+        :param docs: an iterable of documents.
+        """
+        for doc in docs:
+            self.write(doc)
+
+    def close(self):
+        """
+        Writes the index and moves the file to `path`.
+        """
+        ids = self._ids
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+
+        count = 0
+        for i, entry in enumerate(order):
+            # the last document written wins, as the sort is stable.
+            if i + 1 < len(order) and ids[order[i + 1]] == ids[entry]:
+                continue
+            self._file.write(INDEX_ENTRY.pack(ids[entry], self._positions[entry],
+                                              self._lengths[entry]))
+            count += 1
+
+        self.count = count
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, count, self._position))
+        self._file.close()
+        os.rename(self._tmp_path, self.path)
+
+    def abort(self):
+        """
+        Discards the snapshot being written.
+        """
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def create(path, docs, id_field='id'):
+    """
+    Creates a snapshot with `docs`.
+
+    :param path: the snapshot file.
+    :param docs: an iterable of documents, e.g. from :meth:`scieloapi.Connector.iter_docs`.
+    :param id_field: (optional) the field with the integer id of the documents. Defaults to `id`.
+    :returns: the number of documents in the snapshot.
+    """
+    with SnapshotWriter(path, id_field=id_field) as writer:
+        writer.write_many(docs)
+
+    return writer.count
+
+
+class Snapshot(object):
+    """
+    Reads a snapshot through a memory map.
+
+    :param path: the snapshot file.
+    :param lazy: (optional) if documents should be produced as :class:`scieloapi.records.LazyRecord`, that decode their fields on access. Defaults to `False`.
+    """
+    def __init__(self, path, lazy=False):
+        self.path = path
+        self.lazy = lazy
+
+        with open(path, 'rb') as snapshot_file:
+            self._map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self._count, self._index = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError('%s is not a snapshot file' % path)
+
+    def __reduce__(self):
+        return (Snapshot, (self.path, self.lazy))
+
+    def _entry(self, i):
+        return INDEX_ENTRY.unpack_from(self._map, self._index + i * INDEX_ENTRY.size)
+
+    def _find(self, doc_id):
+        """
+        Binary search of `doc_id` in the index.
+        """
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry_id, position, length = self._entry(mid)
+            if entry_id < doc_id:
+                lo = mid + 1
+            elif entry_id > doc_id:
+                hi = mid
+            else:
+                return position, length
+
+        return None
+
+    def _load(self, position, length):
+        data = self._map[position:position + length].decode('utf-8')
+        return LazyRecord(data) if self.lazy else json.loads(data)
+
+    def __getitem__(self, doc_id):
+        try:
+            found = self._find(int(doc_id))
+        except (TypeError, ValueError):
+            found = None
+
+        if found is None:
+            raise KeyError(doc_id)
+        return self._load(*found)
+
+    def get(self, doc_id, default=None):
+        """
+        Gets the document identified by `doc_id`, or `default`.
+        """
+        try:
+            return self[doc_id]
+        except KeyError:
+            return default
+
+    def __contains__(self, doc_id):
+        try:
+            return self._find(int(doc_id)) is not None
+        except (TypeError, ValueError):
+            return False
+
+    def __len__(self):
+        return self._count
+
+    def ids(self):
+        """
+        Iterates over the ids of the documents, in order.
+        """
+        for i in range(self._count):
+            yield self._entry(i)[0]
+
+    def __iter__(self):
+        """
+        Iterates over the documents, ordered by id.
+        """
+        for i in range(self._count):
+            entry_id, position, length = self._entry(i)
+            yield self._load(position, length)
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,17 +1,29 @@
 #!/usr/bin/env python
+import re
+
 try:
     from setuptools import setup
 except ImportError:
     from distutils.core import setup
 
 
+def read_version():
+    """
+    Reads `__version__` without importing the package, so its
+    dependencies are not needed at setup time.
+    """
+    with open('scieloapi/__init__.py') as init_file:
+        match = re.search(r"^__version__ = '([^']+)'", init_file.read(), re.M)
+    return match.group(1)
+
+
 install_requires = [
     'requests==1.2.3',
 ]
 
 setup(
     name="scieloapi",
-    version='0.6',
+    version=read_version(),
     description="Thin wrapper around the SciELO Manager RESTful API.",
     long_description=open('README.md').read() + '\n\n' +
                      open('HISTORY.md').read(),
@@ -35,5 +47,8 @@ setup(
     tests_require=["mocker"],
     test_suite='tests',
     install_requires=install_requires,
+    entry_points={
+        'console_scripts': ['scieloapi = scieloapi.cli:main'],
+    },
 )
 
@@ -1,4 +1,5 @@
 # coding: utf-8
+import json
 import types
 
 
@@ -29,6 +30,8 @@ class Patch(object):
 
 
 class ConnectorStub(object):
+    concurrency = None
+
     def __init__(self, *args, **kwargs):
         pass
 
@@ -46,6 +49,17 @@ class TimeStub(object):
         pass
 
 
+class ClockStub(object):
+    """
+    Pretend to be the time module, at `now` until it is changed.
+    """
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
 class RequestsResponseStub(object):
     """
     Pretend to be a requests.Response object.
@@ -58,3 +72,33 @@ httpbroker_stub = types.ModuleType('httpbroker')
 httpbroker_stub.get = lambda *args, **kwargs: {}
 httpbroker_stub.post = lambda *args, **kwargs: 'http://manager.scielo.org/api/v1/journals/32/'
 
+
+
+class PagedBrokerStub(object):
+    """
+    Pretend to be an http broker serving `count` documents for any endpoint,
+    in pages. Instances are picklable, so they can be sent to other processes.
+    """
+    def __init__(self, count, trashed=()):
+        self.count = count
+        self.trashed = trashed
+        self.sessions = 0
+
+    def new_session(self):
+        self.sessions += 1
+        return object()
+
+    def get(self, api_uri, endpoint=None, resource_id=None, params=None, **kwargs):
+        params = params or {}
+        offset, limit = params.get('offset', 0), params.get('limit', 20)
+        stop = min(offset + limit, self.count)
+        page = {
+            'objects': [{'id': i, 'is_trashed': i in self.trashed}
+                        for i in range(offset, stop)],
+            'meta': {'next': 'more' if stop < self.count else None,
+                     'total_count': self.count},
+        }
+        return json.dumps(page) if kwargs.get('raw') else page
+
+    def post(self, api_uri, data, endpoint=None, **kwargs):
+        return 'http://manager.scielo.org/api/v1/%s/1/' % endpoint
@@ -0,0 +1,223 @@
+# coding: utf-8
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from scieloapi import cache, core, exceptions
+from . import doubles
+
+
+class CountingBrokerStub(doubles.PagedBrokerStub):
+    """
+    Counts the GET requests, and fails them while `down`.
+    """
+    def __init__(self, *args, **kwargs):
+        super(CountingBrokerStub, self).__init__(*args, **kwargs)
+        self.requests = 0
+        self.down = False
+
+    def get(self, api_uri, endpoint=None, resource_id=None, params=None, **kwargs):
+        if self.down:
+            raise exceptions.ConnectionError('down')
+
+        self.requests += 1
+        if resource_id is not None:
+            return {'id': resource_id, 'version': self.requests}
+        return super(CountingBrokerStub, self).get(api_uri, endpoint, resource_id,
+                                                   params, **kwargs)
+
+
+class CacheTests(unittest.TestCase):
+
+    def _makeOne(self, *args, **kwargs):
+        cached = cache.Cache(*args, **kwargs)
+        cached._time = self.clock = doubles.ClockStub()
+        return cached
+
+    def _fetch(self, value):
+        calls = []
+
+        def fetch():
+            calls.append(value)
+            return value
+
+        return fetch, calls
+
+    def test_unknown_policy(self):
+        self.assertRaises(ValueError, lambda: cache.Cache(policy='eventually'))
+
+    def test_fresh_entries_are_served(self):
+        cached = self._makeOne(ttl=10)
+        fetch, calls = self._fetch('foo')
+        cached.fetch('key', fetch)
+        self.clock.now += 5
+        value, freshness = cached.fetch('key', fetch)
+
+        self.assertEqual(value, 'foo')
+        self.assertEqual(calls, ['foo'])
+        self.assertEqual(freshness, {'status': 'hit', 'age': 5.0, 'stored_at': 1000.0})
+
+    def test_expired_entries_are_fetched_again(self):
+        cached = self._makeOne(ttl=10)
+        fetch, calls = self._fetch('foo')
+        cached.fetch('key', fetch)
+        self.clock.now += 10
+        value, freshness = cached.fetch('key', fetch)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(freshness['status'], 'miss')
+
+    def test_stale_entries_are_served_while_revalidated(self):
+        cached = self._makeOne(ttl=10, policy='stale-while-revalidate')
+        cached.fetch('key', lambda: 'old')
+        self.clock.now += 60
+
+        refreshing = threading.Event()
+        proceed = threading.Event()
+
+        def fetch():
+            refreshing.set()
+            proceed.wait(5)
+            return 'new'
+
+        value, freshness = cached.fetch('key', fetch)
+        self.assertEqual((value, freshness['status'], freshness['age']), ('old', 'stale', 60.0))
+        self.assertTrue(refreshing.wait(5))
+
+        # a refresh in progress is not dispatched again.
+        self.assertEqual(cached.fetch('key', lambda: 'other')[0], 'old')
+
+        proceed.set()
+        cached.join()
+        self.assertEqual(cached.fetch('key', fetch), ('new', {'status': 'hit', 'age': 0.0,
+                                                              'stored_at': self.clock.now}))
+
+    def test_failed_refreshes_keep_the_stale_entry(self):
+        cached = self._makeOne(ttl=10, policy='stale-while-revalidate')
+        cached.fetch('key', lambda: 'old')
+        self.clock.now += 60
+
+        def fetch():
+            raise exceptions.ConnectionError()
+
+        cached.fetch('key', fetch)
+        cached.join()
+        self.assertEqual(cached.fetch('key', fetch)[0], 'old')
+
+    def test_entries_older_than_max_stale_are_fetched_before_served(self):
+        cached = self._makeOne(ttl=10, policy='stale-while-revalidate', max_stale=20)
+        cached.fetch('key', lambda: 'old')
+        self.clock.now += 30
+
+        self.assertEqual(cached.fetch('key', lambda: 'new')[0], 'new')
+
+    def test_offline_serves_all_entries(self):
+        store = cache.MemoryStore()
+        self._makeOne(store=store).fetch('key', lambda: 'foo')
+        offline = self._makeOne(store=store, ttl=10, policy='offline')
+        self.clock.now += 3600
+
+        value, freshness = offline.fetch('key', lambda: self.fail('fetched'))
+        self.assertEqual((value, freshness['status'], freshness['age']),
+                         ('foo', 'offline', 3600.0))
+
+    def test_offline_raises_NotCached(self):
+        offline = self._makeOne(policy='offline')
+        self.assertRaises(exceptions.NotCached,
+            lambda: offline.fetch('key', lambda: self.fail('fetched')))
+
+    def test_request_keys(self):
+        self.assertEqual(cache.request_key('http://x/api/v1/', 'journals', 70),
+                         cache.request_key('http://x/api/v1/', 'journals', '70'))
+        self.assertEqual(cache.request_key('http://x/', 'journals', params={'a': 1, 'b': 2}),
+                         cache.request_key('http://x/', 'journals', params=[('b', 2), ('a', 1)]))
+        self.assertNotEqual(cache.request_key('http://x/', 'journals'),
+                            cache.request_key('http://x/', 'journals', raw=True))
+        self.assertNotEqual(cache.request_key('http://x/', 'journals'),
+                            cache.request_key('http://y/', 'journals'))
+
+
+class ShelveStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'test.cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_entries_are_kept_across_instances(self):
+        store = cache.ShelveStore(self.path)
+        store.set('key', {'value': [1, 2], 'stored_at': 1.0})
+        store.close()
+
+        store = cache.ShelveStore(self.path)
+        self.assertEqual(store.get('key'), {'value': [1, 2], 'stored_at': 1.0})
+        self.assertEqual(store.get('missing'), None)
+        store.close()
+
+
+class ConnectorCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.broker = CountingBrokerStub(60)
+        self.cache = cache.Cache(ttl=300)
+
+    def _makeOne(self, **kwargs):
+        return core.Connector('any.user', 'any.apikey', http_broker=self.broker, **kwargs)
+
+    def test_fetch_data_is_cached(self):
+        conn = self._makeOne(cache=self.cache)
+        first = conn.fetch_data('journals', resource_id=70)
+        self.assertEqual(conn.last_freshness['status'], 'miss')
+        second = conn.fetch_data('journals', resource_id=70)
+
+        self.assertTrue(first is second)
+        self.assertEqual(self.broker.requests, 1)
+        self.assertEqual(conn.last_freshness['status'], 'hit')
+
+    def test_last_freshness_without_cache(self):
+        conn = self._makeOne()
+        conn.fetch_data('journals', resource_id=70)
+        self.assertEqual(conn.last_freshness, None)
+
+    def test_pages_carry_freshness(self):
+        conn = self._makeOne(cache=self.cache)
+        list(conn.iter_pages('journals'))
+        pages = list(conn.iter_pages('journals'))
+
+        self.assertEqual([page.meta['freshness']['status'] for page in pages], ['hit', 'hit'])
+        self.assertEqual(self.broker.requests, 2)
+
+    def test_lazy_pages_are_cached_apart(self):
+        conn = self._makeOne(cache=self.cache)
+        list(conn.iter_docs('journals'))
+        docs = list(conn.iter_docs('journals', lazy=True))
+
+        self.assertEqual(len(docs), 60)
+        self.assertEqual(self.broker.requests, 4)
+
+    def test_endpoints_are_answered_offline(self):
+        conn = self._makeOne(cache=self.cache)
+        journal = core.Endpoint('journals', conn).get(70)
+        docs = list(core.Endpoint('journals', conn).filter())
+
+        self.broker.down = True
+        offline = self._makeOne(cache=cache.Cache(self.cache.store, policy='offline'))
+        self.assertEqual(core.Endpoint('journals', offline).get(70), journal)
+        self.assertEqual(list(core.Endpoint('journals', offline).filter()), docs)
+        self.assertEqual(offline.last_freshness['status'], 'offline')
+        self.assertRaises(exceptions.NotCached,
+            lambda: core.Endpoint('journals', offline).get(71))
+
+    def test_cache_hits_are_reported_to_instrumentation(self):
+        from scieloapi.instrumentation import MetricsCollector
+        metrics = MetricsCollector()
+        conn = self._makeOne(cache=self.cache, instrumentation=[metrics])
+        conn.fetch_data('journals', resource_id=70)
+        conn.fetch_data('journals', resource_id=70)
+
+        self.assertEqual(metrics.counter('cache_hits_total',
+                                         endpoint='journals', method='GET'), 1)
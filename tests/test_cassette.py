@@ -0,0 +1,187 @@
+# coding: utf-8
+import os
+import gzip
+import time
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from scieloapi import cassette, core, exceptions
+from . import doubles
+
+
+class FailingBrokerStub(doubles.PagedBrokerStub):
+    """
+    Answers every GET with 404.
+    """
+    def get(self, *args, **kwargs):
+        raise exceptions.NotFound('no such thing')
+
+
+class TracingBrokerStub(doubles.PagedBrokerStub):
+    """
+    Fills the trace as the http broker does, with compressed bodies.
+    """
+    def get(self, *args, **kwargs):
+        trace = kwargs.pop('trace', None)
+        if trace is not None:
+            trace.update(status=200, bytes=7)
+        return super(TracingBrokerStub, self).get(*args, **kwargs)
+
+
+class CassetteTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'test.cassette')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _record(self, broker=None):
+        broker = broker or doubles.PagedBrokerStub(120, trashed=(3,))
+        with cassette.Cassette(self.path, mode='record', broker=broker) as recorder:
+            conn = core.Connector('any.username', 'any.apikey', http_broker=recorder)
+            docs = list(conn.iter_docs('journals'))
+        return recorder, docs
+
+    def test_unknown_mode(self):
+        self.assertRaises(ValueError,
+            lambda: cassette.Cassette(self.path, mode='rewind'))
+
+    def test_replayed_docs_are_the_recorded_ones(self):
+        recorder, docs = self._record()
+        replayer = cassette.Cassette(self.path)
+        conn = core.Connector('other.username', 'other.apikey',
+                              api_uri='http://localhost:8000/api/', http_broker=replayer)
+
+        self.assertEqual(list(conn.iter_docs('journals')), docs)
+        self.assertEqual(len(replayer), len(recorder))
+
+    def test_changes_by_consumers_are_not_recorded(self):
+        broker = doubles.PagedBrokerStub(10)
+        with cassette.Cassette(self.path, mode='record', broker=broker) as recorder:
+            conn = core.Connector('any.username', 'any.apikey', http_broker=recorder)
+            for doc in conn.iter_docs('journals'):
+                doc['mutated'] = True
+
+        conn = core.Connector('any.username', 'any.apikey',
+                              http_broker=cassette.Cassette(self.path))
+        self.assertTrue(all('mutated' not in doc for doc in conn.iter_docs('journals')))
+
+    def test_each_replay_produces_new_objects(self):
+        self._record()
+        conn = core.Connector('any.username', 'any.apikey',
+                              http_broker=cassette.Cassette(self.path))
+        first = list(conn.iter_docs('journals'))
+        first[0]['mutated'] = True
+        second = list(conn.iter_docs('journals'))
+
+        self.assertFalse(first[0] is second[0])
+        self.assertTrue('mutated' not in second[0])
+
+    def test_unrecorded_requests_are_not_replayed(self):
+        self._record()
+        conn = core.Connector('any.username', 'any.apikey',
+                              http_broker=cassette.Cassette(self.path))
+
+        self.assertRaises(exceptions.UnrecordedRequest,
+            lambda: conn.fetch_data('issues', resource_id=1))
+
+    def test_errors_are_replayed(self):
+        with cassette.Cassette(self.path, mode='record', broker=FailingBrokerStub(0)) as recorder:
+            self.assertRaises(exceptions.NotFound,
+                lambda: recorder.get('http://manager.scielo.org/api/v1/', 'journals', 1))
+
+        replayer = cassette.Cassette(self.path)
+        self.assertRaises(exceptions.NotFound,
+            lambda: replayer.get('http://manager.scielo.org/api/v1/', 'journals', 1))
+
+    def test_posts_are_matched_by_data(self):
+        with cassette.Cassette(self.path, mode='record',
+                               broker=doubles.PagedBrokerStub(0)) as recorder:
+            url = recorder.post('http://manager.scielo.org/api/v1/', {'title': 'foo'}, 'journals')
+
+        replayer = cassette.Cassette(self.path)
+        self.assertEqual(replayer.post('http://manager.scielo.org/api/v1/',
+                                       {'title': 'foo'}, 'journals'), url)
+        self.assertRaises(exceptions.UnrecordedRequest,
+            lambda: replayer.post('http://manager.scielo.org/api/v1/', {'title': 'bar'}, 'journals'))
+
+    def test_once_mode_records_unrecorded_requests_only(self):
+        self._record()
+        broker = doubles.PagedBrokerStub(5)
+        with cassette.Cassette(self.path, mode='once', broker=broker) as recorder:
+            recorded = len(recorder)
+            recorder.get('http://manager.scielo.org/api/v1/', 'journals',
+                         params={'limit': 50, 'offset': 0})
+            recorder.get('http://manager.scielo.org/api/v1/', 'issues',
+                         params={'limit': 50, 'offset': 0})
+
+        self.assertEqual(len(cassette.Cassette(self.path)), recorded + 1)
+
+    def test_credentials_are_not_recorded(self):
+        self._record()
+        with gzip.open(self.path, 'rb') as f:
+            content = f.read().decode('utf-8')
+
+        self.assertNotIn('any.username', content)
+        self.assertNotIn('any.apikey', content)
+
+    def test_replay_fills_trace(self):
+        self._record()
+        replayer = cassette.Cassette(self.path)
+        trace = {}
+        replayer.get('http://manager.scielo.org/api/v1/', 'journals',
+                     params={'limit': 50, 'offset': 0}, trace=trace)
+
+        self.assertEqual(trace['status'], 200)
+        self.assertTrue(trace['bytes'] > 0)
+        self.assertEqual(sorted(trace['timings']), ['decode', 'download', 'ttfb'])
+
+    def test_replay_fills_trace_with_the_recorded_bytes(self):
+        params = {'limit': 50, 'offset': 0}
+        with cassette.Cassette(self.path, mode='record',
+                               broker=TracingBrokerStub(10)) as recorder:
+            recorder.get('http://manager.scielo.org/api/v1/', 'journals',
+                         params=params, trace={})
+
+        trace = {}
+        cassette.Cassette(self.path).get('http://manager.scielo.org/api/v1/',
+            'journals', params=params, trace=trace)
+        self.assertEqual(trace['bytes'], 7)
+
+    def test_replayed_docs_are_interned(self):
+        from scieloapi.interning import InternTable
+        self._record()
+        table = InternTable()
+        conn = core.Connector('any.username', 'any.apikey', interning=table,
+                              http_broker=cassette.Cassette(self.path))
+        docs = list(conn.iter_docs('journals'))
+
+        # documents of different pages share their keys.
+        first_key = [key for key in docs[0] if key == 'is_trashed'][0]
+        last_key = [key for key in docs[-1] if key == 'is_trashed'][0]
+        self.assertTrue(first_key is last_key)
+        self.assertTrue(table.size > 0)
+
+    def test_replay_latency(self):
+        self._record()
+        replayer = cassette.Cassette(self.path, latency=0.05)
+        started = time.time()
+        replayer.get('http://manager.scielo.org/api/v1/', 'journals',
+                     params={'limit': 50, 'offset': 0})
+
+        self.assertTrue(time.time() - started >= 0.05)
+
+    def test_replaying_sessions_are_not_created(self):
+        self.assertEqual(cassette.Cassette(self.path).new_session(), None)
+
+    def test_pickling(self):
+        self._record()
+        replayer = pickle.loads(pickle.dumps(cassette.Cassette(self.path, latency=0.1)))
+
+        self.assertEqual(replayer.latency, 0.1)
+        self.assertEqual(replayer.broker.__name__, 'scieloapi.httpbroker')
+        self.assertTrue(len(replayer) > 0)
@@ -0,0 +1,107 @@
+# coding: utf-8
+import os
+import shutil
+import tempfile
+import unittest
+
+from scieloapi import changes, records, core
+from . import doubles
+
+
+class FingerprintTests(unittest.TestCase):
+
+    def test_does_not_depend_on_key_order(self):
+        self.assertEqual(changes.fingerprint({'id': 1, 'title': u'Revista', 'issns': ['0001']}),
+                         changes.fingerprint({'issns': ['0001'], 'title': u'Revista', 'id': 1}))
+
+    def test_changes_with_the_content(self):
+        self.assertNotEqual(changes.fingerprint({'id': 1, 'title': u'Revista'}),
+                            changes.fingerprint({'id': 1, 'title': u'Revista Nova'}))
+
+    def test_ignored_fields(self):
+        self.assertEqual(changes.fingerprint({'id': 1, 'updated': '2014-01-01'}, ignore=['updated']),
+                         changes.fingerprint({'id': 1, 'updated': '2014-02-01'}, ignore=['updated']))
+
+    def test_records_are_fingerprinted_as_dicts(self):
+        doc = {'id': 1, 'title': u'São Paulo', 'extra': [1, 2]}
+        record = records.make_record_type('journals', ['id', 'title']).from_dict(doc)
+        lazy = records.LazyRecord(u'{"title": "S\\u00e3o Paulo", "id": 1, "extra": [1, 2]}')
+
+        self.assertEqual(changes.fingerprint(record), changes.fingerprint(doc))
+        self.assertEqual(changes.fingerprint(lazy), changes.fingerprint(doc))
+
+
+class ChangeDetectorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'journals.fingerprints')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _harvest(self, docs, **kwargs):
+        detector = changes.ChangeDetector(self.path, ignore=['updated'])
+        found = [(change.kind, change.id) for change in detector.changes(docs, **kwargs)]
+        detector.save()
+        return found
+
+    def test_first_harvest_is_all_new(self):
+        self.assertEqual(self._harvest([{'id': 1}, {'id': 2}]), [('new', 1), ('new', 2)])
+
+    def test_changes_between_harvests(self):
+        self._harvest([{'id': 1, 'v': 1}, {'id': 2, 'v': 1}, {'id': 3, 'v': 1}])
+        found = self._harvest([{'id': 1, 'v': 1, 'updated': 'now'},
+                               {'id': 3, 'v': 2},
+                               {'id': 4, 'v': 1}])
+
+        self.assertEqual(found, [('changed', 3), ('new', 4), ('deleted', 2)])
+        self.assertEqual(self._harvest([{'id': 1, 'v': 1}, {'id': 3, 'v': 2}, {'id': 4, 'v': 1}]), [])
+
+    def test_partial_harvests_keep_the_other_fingerprints(self):
+        self._harvest([{'id': 1}, {'id': 2}])
+        self.assertEqual(self._harvest([{'id': 2, 'v': 2}], deletions=False), [('changed', 2)])
+        self.assertEqual(self._harvest([{'id': 1}, {'id': 2, 'v': 2}]), [])
+
+    def test_deleted_changes_carry_no_doc(self):
+        self._harvest([{'id': 1}])
+        detector = changes.ChangeDetector(self.path)
+        self.assertEqual(list(detector.changes([])), [changes.Change('deleted', 1, None)])
+
+    def test_harvest_from_connector(self):
+        conn = core.Connector('any.user', 'any.apikey', http_broker=doubles.PagedBrokerStub(60))
+        self.assertEqual(len(self._harvest(conn.iter_docs('journals'))), 60)
+        self.assertEqual(self._harvest(conn.iter_docs('journals', lazy=True)), [])
+
+
+class FingerprintStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'test.fingerprints')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_save_and_load(self):
+        store = changes.FingerprintStore()
+        store[2] = b'\x01' * 20
+        store[-1] = b'\x02' * 20
+        store.save(self.path)
+
+        loaded = changes.FingerprintStore.load(self.path)
+        self.assertEqual(loaded.ids(), [-1, 2])
+        self.assertEqual(loaded[2], b'\x01' * 20)
+        self.assertEqual(os.path.getsize(self.path), 16 + 2 * 28)
+
+    def test_not_a_fingerprints_file(self):
+        with open(self.path, 'wb') as other:
+            other.write(b'x' * 100)
+        self.assertRaises(ValueError, lambda: changes.FingerprintStore.load(self.path))
+
+    def test_truncated_file(self):
+        store = changes.FingerprintStore({1: b'\x01' * 20})
+        store.save(self.path)
+        with open(self.path, 'rb+') as saved:
+            saved.truncate(30)
+        self.assertRaises(ValueError, lambda: changes.FingerprintStore.load(self.path))
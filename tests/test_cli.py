@@ -0,0 +1,210 @@
+# coding: utf-8
+import io
+import os
+import sys
+import csv
+import json
+import gzip
+import shutil
+import tempfile
+import unittest
+
+from scieloapi import cli, core, exceptions
+from . import doubles
+
+
+class TitledBrokerStub(doubles.PagedBrokerStub):
+    """
+    Serves documents with a title and a list of issns, and `schema`
+    if it is set.
+    """
+    schema = None
+
+    def get(self, api_uri, endpoint=None, resource_id=None, params=None, **kwargs):
+        if resource_id == 'schema' and self.schema is not None:
+            return self.schema
+
+        page = super(TitledBrokerStub, self).get(api_uri, endpoint, resource_id,
+                                                 params, **kwargs)
+        for obj in page['objects']:
+            obj.update(title=u'Revista %s' % obj['id'], issns=[u'1234-%04d' % obj['id']])
+        return page
+
+
+class StderrStub(object):
+    def __init__(self):
+        self.lines = []
+
+    def write(self, text):
+        self.lines.append(text)
+
+
+class MainTests(unittest.TestCase):
+
+    def setUp(self):
+        self.out = tempfile.mkdtemp()
+        self.broker = TitledBrokerStub(120, trashed=(7,))
+        self.stderr, sys.stderr = sys.stderr, StderrStub()
+
+    def tearDown(self):
+        sys.stderr = self.stderr
+        shutil.rmtree(self.out)
+
+    def _main(self, *args):
+        broker = self.broker
+        test = self
+
+        class ConnectorStub(core.Connector):
+            def __init__(self, *args, **kwargs):
+                super(ConnectorStub, self).__init__(*args, http_broker=broker, **kwargs)
+                test.connector = self
+
+            def get_endpoints(self):
+                return {'journals': None, 'issues': None}
+
+        return cli.main(['--username', 'any.user', '--api-key', 'any.apikey'] + list(args),
+                        connector_dep=ConnectorStub)
+
+    def _read_jsonl(self, filename, opener=open):
+        with opener(os.path.join(self.out, filename), 'rb') as output:
+            return [json.loads(line.decode('utf-8')) for line in output]
+
+    def test_jsonl(self):
+        self.assertEqual(self._main('harvest', 'journals', '--out', self.out), 0)
+
+        docs = self._read_jsonl('journals.jsonl')
+        self.assertEqual(sorted(doc['id'] for doc in docs), [i for i in range(120) if i != 7])
+        self.assertFalse(os.path.exists(os.path.join(self.out, 'issues.jsonl')))
+
+    def test_all_endpoints_by_default(self):
+        self._main('harvest', '--out', self.out, '--quiet')
+
+        self.assertEqual(sorted(name for name in os.listdir(self.out) if name.endswith('.jsonl')),
+                         ['issues.jsonl', 'journals.jsonl'])
+
+    def test_gzip_csv(self):
+        self._main('harvest', 'journals', '--format', 'csv', '--gzip', '--out', self.out)
+
+        with gzip.open(os.path.join(self.out, 'journals.csv.gz'), 'rb') as output:
+            rows = list(csv.reader(io.StringIO(output.read().decode('utf-8'))
+                                   if sys.version_info[0] > 2 else output))
+
+        self.assertEqual(rows[0], ['id', 'is_trashed', 'issns', 'title', '_extra'])
+        self.assertEqual(len(rows), 120)
+        self.assertTrue(['0', 'false', '["1234-0000"]', 'Revista 0', ''] in rows)
+
+    def test_csv_columns_are_the_schema_fields(self):
+        self.broker.schema = {'fields': dict((name, {'type': 'string'}) for name in
+                                             ['id', 'title', 'issns', 'is_trashed', 'created'])}
+        self._main('harvest', 'journals', '--format', 'csv', '--out', self.out, '--quiet')
+
+        with open(os.path.join(self.out, 'journals.csv')) as output:
+            rows = list(csv.reader(output))
+
+        self.assertEqual(rows[0], ['created', 'id', 'is_trashed', 'issns', 'title', '_extra'])
+        self.assertTrue(['', '0', 'false', '["1234-0000"]', 'Revista 0', ''] in rows)
+
+    def test_rotation(self):
+        self._main('harvest', 'journals', '--max-records', '50', '--out', self.out, '--quiet')
+
+        self.assertEqual([len(self._read_jsonl('journals-%05d.jsonl' % part)) for part in range(3)],
+                         [50, 50, 19])
+
+    def test_filters(self):
+        requests = []
+        get = self.broker.get
+
+        def recording_get(*args, **kwargs):
+            requests.append(kwargs.get('params'))
+            return get(*args, **kwargs)
+        self.broker.get = recording_get
+
+        self._main('harvest', 'journals', 'issues', '--filter', 'collection=brasil',
+                   '--filter', 'issues:year=2013', '--out', self.out, '--quiet')
+
+        self.assertTrue(all(params['collection'] == 'brasil' for params in requests if params))
+        self.assertEqual(set(params.get('year') for params in requests if params),
+                         set([None, '2013']))
+
+    def test_keyset_pagination(self):
+        requests = []
+        get = self.broker.get
+
+        def keyset_get(api_uri, endpoint=None, resource_id=None, params=None, **kwargs):
+            requests.append(params)
+            params = dict(params, offset=params.get('id__gt', -1) + 1)
+            return get(api_uri, endpoint, resource_id, params, **kwargs)
+        self.broker.get = keyset_get
+
+        self._main('harvest', 'journals', '--pagination', 'keyset', '--out', self.out, '--quiet')
+
+        self.assertEqual([params.get('id__gt') for params in requests], [None, 49, 99])
+        self.assertEqual(sorted(doc['id'] for doc in self._read_jsonl('journals.jsonl')),
+                         [i for i in range(120) if i != 7])
+
+    def test_resume(self):
+        path = os.path.join(self.out, 'journals.jsonl')
+        self._main('harvest', 'journals', '--out', self.out, '--quiet')
+        with open(path + '.progress') as progress:
+            offsets = progress.read().split()
+        self.assertEqual(sorted(map(int, offsets)), [0, 50, 100])
+
+        # simulates an interruption after the first page.
+        first_page = [doc for doc in self._read_jsonl('journals.jsonl') if doc['id'] < 50]
+        with open(path, 'w') as output:
+            output.writelines(json.dumps(doc) + '\n' for doc in first_page)
+        with open(path + '.progress', 'w') as progress:
+            progress.write('0\n')
+
+        self._main('harvest', 'journals', '--out', self.out, '--resume', '--quiet')
+
+        docs = self._read_jsonl('journals.jsonl')
+        self.assertEqual(sorted(doc['id'] for doc in docs), [i for i in range(120) if i != 7])
+
+    def test_throughput_stats(self):
+        self._main('harvest', 'journals', '--out', self.out)
+
+        stats = ''.join(sys.stderr.lines)
+        self.assertTrue('journals: 119 records' in stats)
+        self.assertTrue('total: 119 records' in stats)
+        self.assertTrue('records/s' in stats)
+
+    def test_adaptive_concurrency(self):
+        self._main('harvest', 'journals', '--out', self.out, '--workers', '8', '--adaptive')
+
+        self.assertEqual(len(self._read_jsonl('journals.jsonl')), 119)
+        self.assertEqual(self.connector.concurrency.maximum, 8)
+        self.assertEqual(self._main('harvest', 'journals', '--out', self.out), 0)
+        self.assertEqual(self.connector.concurrency, None)
+
+    def test_api_errors_exit_with_1(self):
+        def get(*args, **kwargs):
+            raise exceptions.Unauthorized('bad credentials')
+        self.broker.get = get
+
+        self.assertEqual(self._main('harvest', 'journals', '--out', self.out), 1)
+        self.assertTrue('bad credentials' in ''.join(sys.stderr.lines))
+
+    def test_unknown_endpoints(self):
+        self.assertRaises(SystemExit, lambda: self._main('harvest', 'foo', '--out', self.out))
+
+    def test_credentials_are_required(self):
+        self.assertRaises(SystemExit, lambda: cli.main(['harvest']))
+
+    def test_workers_must_be_positive(self):
+        for workers in ('0', '-2', 'many'):
+            self.assertRaises(SystemExit,
+                lambda: self._main('harvest', 'journals', '--workers', workers,
+                                   '--adaptive', '--out', self.out))
+        self.assertTrue('must be a positive integer' in ''.join(sys.stderr.lines))
+
+
+class ParseFiltersTests(unittest.TestCase):
+
+    def test_filters_for_all_and_one_endpoint(self):
+        self.assertEqual(cli.parse_filters(['a=1', 'issues:b=2'], ['journals', 'issues']),
+                         {'journals': {'a': '1'}, 'issues': {'a': '1', 'b': '2'}})
+
+    def test_invalid_filters(self):
+        self.assertRaises(cli.UsageError, lambda: cli.parse_filters(['a'], ['journals']))
+        self.assertRaises(cli.UsageError, lambda: cli.parse_filters(['issues:a=1'], ['journals']))
@@ -0,0 +1,87 @@
+# coding: utf-8
+import array
+import unittest
+
+from scieloapi import columnar
+
+
+SCHEMA = {
+    'fields': {
+        'id': {'type': 'integer', 'nullable': False},
+        'publication_year': {'type': 'integer', 'nullable': True},
+        'is_trashed': {'type': 'boolean', 'nullable': False},
+        'title': {'type': 'string', 'nullable': False},
+    }
+}
+
+
+class TypecodesFromSchemaTests(unittest.TestCase):
+
+    def test_nullable_and_non_numeric_fields_are_not_typed(self):
+        self.assertEqual(columnar.typecodes_from_schema(SCHEMA),
+                         {'id': 'l', 'is_trashed': 'b'})
+
+
+class ToColumnsTests(unittest.TestCase):
+    docs = [
+        {'id': 1, 'publication_year': 2013, 'title': u'foo', 'price': 1.5},
+        {'id': 2, 'publication_year': 2014, 'title': u'bar', 'price': 2.0},
+    ]
+
+    def test_numeric_columns_are_typed_arrays(self):
+        columns = columnar.to_columns(self.docs)
+
+        self.assertEqual(columns['id'], array.array('l', [1, 2]))
+        self.assertEqual(columns['price'], array.array('d', [1.5, 2.0]))
+        self.assertEqual(columns['title'], [u'foo', u'bar'])
+
+    def test_selected_fields(self):
+        columns = columnar.to_columns(self.docs, fields=['id', 'missing'])
+
+        self.assertEqual(sorted(columns), ['id', 'missing'])
+        self.assertEqual(columns['missing'], [None, None])
+
+    def test_columns_with_missing_values_are_lists(self):
+        columns = columnar.to_columns(self.docs + [{'id': 3}])
+        self.assertEqual(columns['publication_year'], [2013, 2014, None])
+
+    def test_booleans_are_not_taken_as_integers(self):
+        columns = columnar.to_columns([{'flag': True}, {'flag': False}])
+        self.assertEqual(columns['flag'].typecode, 'b')
+
+    def test_typecodes_override_inference(self):
+        columns = columnar.to_columns(self.docs, typecodes={'publication_year': 'd'})
+        self.assertEqual(columns['publication_year'], array.array('d', [2013.0, 2014.0]))
+
+
+class AccumulateTests(unittest.TestCase):
+
+    def test_batches_are_concatenated(self):
+        columns = columnar.accumulate([
+            {'id': array.array('l', [1, 2]), 'title': [u'a', u'b']},
+            {'id': array.array('l', [3]), 'title': [u'c']},
+        ])
+
+        self.assertEqual(columns['id'], array.array('l', [1, 2, 3]))
+        self.assertEqual(columns['title'], [u'a', u'b', u'c'])
+
+    def test_batches_are_not_modified(self):
+        first = {'id': array.array('l', [1, 2])}
+        columnar.accumulate([first, {'id': array.array('l', [3])}])
+        self.assertEqual(first['id'], array.array('l', [1, 2]))
+
+    def test_missing_fields_are_filled_with_None(self):
+        columns = columnar.accumulate([
+            {'id': array.array('l', [1, 2])},
+            {'id': array.array('l', [3]), 'year': array.array('l', [2014])},
+        ])
+
+        self.assertEqual(columns['year'], [None, None, 2014])
+
+    def test_mismatching_columns_become_lists(self):
+        columns = columnar.accumulate([
+            {'year': array.array('l', [2013])},
+            {'year': [None]},
+        ])
+
+        self.assertEqual(columns['year'], [2013, None])
@@ -0,0 +1,248 @@
+# coding: utf-8
+import threading
+import unittest
+
+from scieloapi import concurrency, exceptions
+from . import doubles
+
+
+class MapThreadedTests(unittest.TestCase):
+
+    def test_results_are_in_order(self):
+        self.assertEqual(concurrency.map_threaded(lambda x: x * 2, range(20), workers=5),
+                         [x * 2 for x in range(20)])
+
+    def test_empty_items(self):
+        self.assertEqual(concurrency.map_threaded(lambda x: x, []), [])
+
+    def test_api_errors_are_returned_as_results(self):
+        def func(x):
+            if x == 1:
+                raise exceptions.BadRequest()
+            return x
+
+        res = concurrency.map_threaded(func, range(3))
+        self.assertEqual(res[0], 0)
+        self.assertTrue(isinstance(res[1], exceptions.BadRequest))
+        self.assertEqual(res[2], 2)
+
+    def test_other_errors_are_raised(self):
+        def func(x):
+            raise KeyError(x)
+
+        self.assertRaises(KeyError, lambda: concurrency.map_threaded(func, range(3)))
+
+    def test_workers_run_concurrently(self):
+        barrier = threading.Semaphore(0)
+
+        def func(x):
+            # deadlocks unless both items are processed at the same time.
+            barrier.release()
+            barrier.acquire()
+            return x
+
+        self.assertEqual(concurrency.map_threaded(func, range(2), workers=2), [0, 1])
+
+    def test_workers_must_be_positive(self):
+        self.assertRaises(ValueError,
+            lambda: concurrency.map_threaded(lambda x: x, range(3), workers=0))
+
+
+class PrefetchTests(unittest.TestCase):
+
+    def tearDown(self):
+        # background threads must not outlive the tests.
+        for thread in threading.enumerate():
+            if thread.name == concurrency.PREFETCH_THREAD_NAME:
+                thread.join(5)
+                self.assertFalse(thread.is_alive())
+
+    def test_items_are_produced_in_order(self):
+        self.assertEqual(list(concurrency.prefetch(iter(range(20)), buffer=3)),
+                         list(range(20)))
+
+    def test_empty_iterable(self):
+        self.assertEqual(list(concurrency.prefetch([])), [])
+
+    def test_errors_are_reraised(self):
+        def items():
+            yield 1
+            raise KeyError('boom')
+
+        prefetched = concurrency.prefetch(items())
+        self.assertEqual(next(prefetched), 1)
+        self.assertRaises(KeyError, lambda: next(prefetched))
+
+    def test_next_item_is_produced_while_the_current_is_consumed(self):
+        produced = threading.Event()
+
+        def items():
+            yield 1
+            produced.set()
+            yield 2
+
+        prefetched = concurrency.prefetch(items())
+        self.assertEqual(next(prefetched), 1)
+        self.assertTrue(produced.wait(5))
+        prefetched.close()
+
+    def test_production_stops_with_the_consumer(self):
+        produced = []
+
+        def items():
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        prefetched = concurrency.prefetch(items(), buffer=1)
+        next(prefetched)
+        prefetched.close()
+
+        self.assertTrue(len(produced) < 100)
+
+    def test_abandoned_iterables_are_closed(self):
+        closed = threading.Event()
+
+        def items():
+            try:
+                for i in range(100):
+                    yield i
+            finally:
+                closed.set()
+
+        prefetched = concurrency.prefetch(items(), buffer=1)
+        next(prefetched)
+        prefetched.close()
+
+        self.assertTrue(closed.wait(5))
+
+    def test_no_item_is_pulled_after_the_consumer_stops(self):
+        produced = []
+        pulled = threading.Event()
+
+        def items():
+            for i in range(100):
+                produced.append(i)
+                pulled.set()
+                yield i
+
+        prefetched = concurrency.prefetch(items(), buffer=1)
+        next(prefetched)
+        # the producer is blocked putting the item after the buffered one.
+        self.assertTrue(pulled.wait(5))
+        prefetched.close()
+        for thread in threading.enumerate():
+            if thread.name == concurrency.PREFETCH_THREAD_NAME:
+                thread.join(5)
+
+        self.assertTrue(len(produced) <= 3)
+
+    def test_buffer_must_be_positive(self):
+        self.assertRaises(ValueError, lambda: next(concurrency.prefetch([1], buffer=0)))
+
+
+class LimitRecorder(object):
+    def __init__(self):
+        self.events = []
+
+    def concurrency_limit(self, event):
+        self.events.append(event)
+
+
+class AIMDControllerTests(unittest.TestCase):
+
+    def _makeOne(self, **kwargs):
+        self.recorder = LimitRecorder()
+        controller = concurrency.AIMDController(instrumentation=[self.recorder], **kwargs)
+        controller._time = self.clock = doubles.ClockStub()
+        return controller
+
+    def _complete(self, controller, latency=0.1):
+        controller.release(controller.acquire(), latency=latency)
+
+    def test_invalid_limits(self):
+        self.assertRaises(ValueError, lambda: concurrency.AIMDController(initial=0))
+        self.assertRaises(ValueError, lambda: concurrency.AIMDController(initial=8, maximum=4))
+        self.assertRaises(ValueError, lambda: concurrency.AIMDController(decrease=1))
+
+    def test_initial_limit_is_notified(self):
+        controller = self._makeOne(initial=2)
+        self.assertEqual(controller.limit, 2)
+        self.assertEqual(self.recorder.events, [{'controller': 'default', 'limit': 2,
+                                                 'previous': 2, 'in_flight': 0,
+                                                 'reason': 'initial'}])
+
+    def test_additive_increase_per_round(self):
+        controller = self._makeOne(initial=2, maximum=3)
+        # a round of 2 requests raises the limit by 1, less the rounding.
+        self._complete(controller)
+        self._complete(controller)
+        self.assertEqual(controller.limit, 2)
+        self._complete(controller)
+        self.assertEqual(controller.limit, 3)
+
+        for _ in range(10):
+            self._complete(controller)
+        self.assertEqual(controller.limit, 3)
+        self.assertEqual([e['limit'] for e in self.recorder.events], [2, 3])
+
+    def test_slow_requests_hold_the_limit(self):
+        controller = self._makeOne(initial=2, latency_target=0.5)
+        for _ in range(10):
+            self._complete(controller, latency=2.0)
+        self.assertEqual(controller.limit, 2)
+
+    def test_multiplicative_decrease_once_per_round(self):
+        controller = self._makeOne(initial=8)
+        tokens = [controller.acquire() for _ in range(4)]
+        for token in tokens:
+            controller.release(token, overloaded=True)
+
+        self.assertEqual(controller.limit, 4)
+        self.assertEqual(self.recorder.events[-1]['reason'], 'decrease')
+
+        controller.release(controller.acquire(), overloaded=True)
+        self.assertEqual(controller.limit, 2)
+        controller.release(controller.acquire(), overloaded=True)
+        controller.release(controller.acquire(), overloaded=True)
+        self.assertEqual(controller.limit, 1)
+
+    def test_call_adapts_to_the_outcome(self):
+        controller = self._makeOne(initial=4)
+
+        def overloaded():
+            raise exceptions.ServiceUnavailable()
+
+        def timeout():
+            raise exceptions.Timeout()
+
+        self.assertRaises(exceptions.ServiceUnavailable, lambda: controller.call(overloaded))
+        self.assertEqual(controller.limit, 2)
+        self.assertRaises(exceptions.Timeout, lambda: controller.call(timeout))
+        self.assertEqual(controller.limit, 1)
+        self.assertRaises(exceptions.NotFound,
+            lambda: controller.call(lambda: (_ for _ in ()).throw(exceptions.NotFound())))
+        self.assertEqual((controller.limit, controller.in_flight), (1, 0))
+        self.assertEqual(controller.call(lambda x: x * 2, 21), 42)
+
+    def test_requests_above_the_limit_wait(self):
+        controller = self._makeOne(initial=1)
+        token = controller.acquire()
+        acquired = threading.Event()
+
+        def acquire():
+            controller.release(controller.acquire())
+            acquired.set()
+
+        thread = threading.Thread(target=acquire)
+        thread.daemon = True
+        thread.start()
+        self.assertFalse(acquired.wait(0.1))
+
+        controller.release(token)
+        self.assertTrue(acquired.wait(5))
+
+    def test_pool_size(self):
+        self.assertEqual(concurrency.pool_size(), 4)
+        self.assertEqual(concurrency.pool_size(2, concurrency.AIMDController(maximum=16)), 2)
+        self.assertEqual(concurrency.pool_size(None, concurrency.AIMDController(maximum=16)), 16)
@@ -269,6 +269,32 @@ class ConnectorHttpBrokerCollaborationTests(mocker.MockerTestCase):
         with doubles.Patch(conn, 'fetch_data', mock_fetch_data, instance_method=True):
             self.assertEqual(len(list(conn.iter_docs('journals'))), 1)
 
+    def test_patch_data_with_valid_data(self):
+        mock_httpbroker = self.mocker.mock()
+        mock_httpbroker_patch = self.mocker.mock()
+
+        mock_httpbroker_patch('http://manager.scielo.org/api/v1/',
+                              {'objects': [{'title': 'Foo'}]},
+                              endpoint='journals',
+                              check_ca=mocker.ANY,
+                              auth=('any.username', 'any.apikey'))
+        self.mocker.result(None)
+
+        mocker.expect(mock_httpbroker.get).result(lambda *args, **kwargs: None)
+        mocker.expect(mock_httpbroker.post).result(lambda *args, **kwargs: None)
+        mocker.expect(mock_httpbroker.patch).result(mock_httpbroker_patch)
+
+        self.mocker.replay()
+
+        conn = self._makeOne('any.username', 'any.apikey', http_broker=mock_httpbroker)
+        self.assertIsNone(conn.patch_data('journals', {'objects': [{'title': 'Foo'}]}))
+
+    def test_patch_data_unsupported_by_http_broker_raises_MethodNotAllowed(self):
+        conn = self._makeOne('any.username', 'any.apikey',
+                             http_broker=doubles.httpbroker_stub)
+        self.assertRaises(exceptions.MethodNotAllowed,
+                          lambda: conn.patch_data('journals', {'objects': []}))
+
     def test_check_ca_disabled_by_default(self):
         conn = self._makeOne('any.username', 'any.apikey')
         self.assertFalse(conn.check_ca)
@@ -326,6 +352,44 @@ class EndpointTests(mocker.MockerTestCase):
         journal_ep = self._makeOne('journals', mock_connector)
         self.assertEqual(list(journal_ep.filter(collection='saude-publica')), [0, 1])
 
+    def test_pages_uses_iter_pages_method(self):
+        from scieloapi.core import Page
+        mock_connector = self.mocker.mock()
+        mock_connector.iter_pages('journals', collection='saude-publica')
+        self.mocker.result(iter([Page([0, 1], {'offset': 0})]))
+        self.mocker.replay()
+
+        journal_ep = self._makeOne('journals', mock_connector)
+        pages = list(journal_ep.pages(collection='saude-publica'))
+        self.assertEqual([list(page) for page in pages], [[0, 1]])
+
+    def test_columns_are_typed_by_the_endpoint_schema(self):
+        from scieloapi.core import Page
+        mock_connector = self.mocker.mock()
+        mock_connector.get_schema('journals')
+        self.mocker.result({'fields': {'id': {'type': 'integer'}}})
+        mock_connector.iter_pages('journals')
+        self.mocker.result(iter([Page([{'id': 1}, {'id': 2}], {'offset': 0})]))
+        self.mocker.replay()
+
+        journal_ep = self._makeOne('journals', mock_connector)
+        batches = list(journal_ep.columns(fields=['id']))
+        self.assertEqual([batch['id'].tolist() for batch in batches], [[1, 2]])
+
+    def test_compact_documents_are_records_of_the_endpoint_schema(self):
+        mock_connector = self.mocker.mock()
+        mock_connector.get_schema('journals')
+        self.mocker.result({'fields': {'id': {}, 'title': {}}})
+        mock_connector.iter_docs('journals', collection='saude-publica')
+        self.mocker.result(iter([{'id': 1, 'title': 'Foo'}, {'id': 2, 'title': 'Bar'}]))
+        self.mocker.replay()
+
+        journal_ep = self._makeOne('journals', mock_connector)
+        docs = list(journal_ep.filter(collection='saude-publica', compact=True))
+
+        self.assertEqual([doc.title for doc in docs], ['Foo', 'Bar'])
+        self.assertTrue(isinstance(docs[0], journal_ep.record_type()))
+
     def test_post_uses_post_data_method(self):
         mock_connector = self.mocker.mock()
         mock_connector.post_data('journals', {'title': 'Foo'})
@@ -344,6 +408,95 @@ class EndpointTests(mocker.MockerTestCase):
             lambda: journal_ep.post({'title': 'Foo'}))
 
 
+class EndpointPostManyTests(mocker.MockerTestCase):
+
+    def _makeOne(self, *args, **kwargs):
+        from scieloapi.core import Endpoint
+        return Endpoint(*args, **kwargs)
+
+    def test_concurrent_posts_return_ids_in_order(self):
+        stub_connector = doubles.ConnectorStub()
+        stub_connector.post_data = lambda endpoint, data: (
+            'http://manager.scielo.org/api/v1/journals/%s/' % data['id'])
+
+        journal_ep = self._makeOne('journals', stub_connector)
+        self.assertEqual(journal_ep.post_many([{'id': i} for i in range(10)]),
+                         [str(i) for i in range(10)])
+
+    def test_errors_are_returned_per_item(self):
+        def post_data(endpoint, data):
+            if data['id'] == 1:
+                raise exceptions.BadRequest()
+            return 'http://manager.scielo.org/api/v1/journals/%s/' % data['id']
+
+        stub_connector = doubles.ConnectorStub()
+        stub_connector.post_data = post_data
+
+        journal_ep = self._makeOne('journals', stub_connector)
+        res = journal_ep.post_many([{'id': 0}, {'id': 1}])
+        self.assertEqual(res[0], '0')
+        self.assertTrue(isinstance(res[1], exceptions.BadRequest))
+
+    def test_empty_records(self):
+        journal_ep = self._makeOne('journals', doubles.ConnectorStub())
+        self.assertEqual(journal_ep.post_many([]), [])
+
+    def test_bulk_creation_uses_patch_data_method(self):
+        mock_connector = self.mocker.mock()
+        mock_connector.patch_data('journals', {'objects': [{'title': 'Foo'}, {'title': 'Bar'}]})
+        self.mocker.result({'objects': [
+            {'resource_uri': '/api/v1/journals/4/'},
+            {'resource_uri': '/api/v1/journals/5/'}]})
+        self.mocker.replay()
+
+        journal_ep = self._makeOne('journals', mock_connector)
+        self.assertEqual(
+            journal_ep.post_many([{'title': 'Foo'}, {'title': 'Bar'}], bulk=True),
+            ['4', '5'])
+
+    def test_bulk_creation_falls_back_to_post(self):
+        mock_connector = self.mocker.mock()
+        mock_connector.patch_data('journals', mocker.ANY)
+        self.mocker.throw(exceptions.MethodNotAllowed())
+        mock_connector.concurrency
+        self.mocker.result(None)
+        mock_connector.post_data('journals', {'title': 'Foo'})
+        self.mocker.result('http://manager.scielo.org/api/v1/journals/4/')
+        self.mocker.replay()
+
+        journal_ep = self._makeOne('journals', mock_connector)
+        self.assertEqual(journal_ep.post_many([{'title': 'Foo'}], bulk=True), ['4'])
+
+    def test_bulk_creation_without_returned_data(self):
+        mock_connector = self.mocker.mock()
+        mock_connector.patch_data('journals', mocker.ANY)
+        self.mocker.result(None)
+        self.mocker.replay()
+
+        journal_ep = self._makeOne('journals', mock_connector)
+        self.assertEqual(journal_ep.post_many([{'title': 'Foo'}], bulk=True), [None])
+
+    def test_bulk_creation_with_data_but_without_objects(self):
+        mock_connector = self.mocker.mock()
+        mock_connector.patch_data('journals', mocker.ANY)
+        self.mocker.result({})
+        self.mocker.replay()
+
+        journal_ep = self._makeOne('journals', mock_connector)
+        self.assertEqual(journal_ep.post_many([{'title': 'Foo'}, {'title': 'Bar'}], bulk=True),
+                         [None, None])
+
+    def test_bulk_creation_does_not_fall_back_on_bad_requests(self):
+        mock_connector = self.mocker.mock()
+        mock_connector.patch_data('journals', mocker.ANY)
+        self.mocker.throw(exceptions.BadRequest())
+        self.mocker.replay()
+
+        journal_ep = self._makeOne('journals', mock_connector)
+        self.assertRaises(exceptions.BadRequest,
+            lambda: journal_ep.post_many([{'title': 'Foo'}], bulk=True))
+
+
 class ClientTests(mocker.MockerTestCase):
 
     def _makeOne(self, *args, **kwargs):
@@ -624,3 +777,631 @@ class ClientTests(mocker.MockerTestCase):
         with doubles.Patch(client, '_endpoints', mock_endpoints):
             self.assertRaises(ValueError, lambda: client.query('journals'))
 
+
+
+class ConnectorPicklingTests(unittest.TestCase):
+
+    def _makeOne(self, *args, **kwargs):
+        from scieloapi.core import Connector
+        return Connector(*args, **kwargs)
+
+    def _roundtrip(self, conn):
+        import pickle
+        return pickle.loads(pickle.dumps(conn))
+
+    def test_configuration_is_kept(self):
+        conn = self._roundtrip(self._makeOne('any.user', 'any.apikey',
+                                             api_uri='http://foo.org/api/',
+                                             check_ca=True))
+
+        self.assertEqual(conn.api_uri, 'http://foo.org/api/v1/')
+        self.assertEqual(conn.version, 'v1')
+        self.assertEqual(conn.username, 'any.user')
+        self.assertTrue(conn.check_ca)
+        self.assertEqual(conn._http_get.keywords['auth'], ('any.user', 'any.apikey'))
+
+    def test_modules_used_as_http_broker_are_pickled_by_name(self):
+        conn = self._roundtrip(self._makeOne('any.user', 'any.apikey'))
+        self.assertTrue(conn._httpbroker is httpbroker)
+
+    def test_pooled_sessions_are_created_again(self):
+        broker = doubles.PagedBrokerStub(1)
+        conn = self._makeOne('any.user', 'any.apikey', http_broker=broker, pooled=True)
+        self.assertEqual(broker.sessions, 1)
+
+        new_conn = self._roundtrip(conn)
+        self.assertEqual(new_conn._httpbroker.sessions, 2)
+        self.assertFalse(new_conn._http_get.keywords['session'] is
+                         conn._http_get.keywords['session'])
+
+    def test_sessions_are_not_used_by_default(self):
+        conn = self._makeOne('any.user', 'any.apikey')
+        self.assertFalse('session' in conn._http_get.keywords)
+
+
+class ConnectorLazyIterDocsTests(unittest.TestCase):
+
+    def _makeOne(self, *args, **kwargs):
+        from scieloapi.core import Connector
+        return Connector(*args, **kwargs)
+
+    def test_lazy_docs_are_the_same_as_eager_ones(self):
+        from scieloapi.records import LazyRecord
+        conn = self._makeOne('any.user', 'any.apikey',
+                             http_broker=doubles.PagedBrokerStub(120, trashed=(3, 77)))
+        docs = list(conn.iter_docs('journals', lazy=True))
+
+        self.assertTrue(all(isinstance(doc, LazyRecord) for doc in docs))
+        self.assertEqual(docs, list(conn.iter_docs('journals')))
+        self.assertEqual(len(docs), 118)
+
+
+class ConnectorInterningTests(unittest.TestCase):
+
+    def _makeOne(self, *args, **kwargs):
+        from scieloapi.core import Connector
+        return Connector(*args, **kwargs)
+
+    def test_intern_table_is_passed_to_the_broker(self):
+        from scieloapi.interning import InternTable
+        calls = []
+        broker = doubles.PagedBrokerStub(1)
+        broker.get = lambda *args, **kwargs: calls.append(kwargs) or {}
+
+        conn = self._makeOne('any.user', 'any.apikey', http_broker=broker, interning=True)
+        conn.fetch_data('journals')
+
+        self.assertTrue(isinstance(calls[0]['object_pairs_hook'], InternTable))
+
+    def test_intern_table_is_not_passed_by_default(self):
+        calls = []
+        broker = doubles.PagedBrokerStub(1)
+        broker.get = lambda *args, **kwargs: calls.append(kwargs) or {}
+
+        conn = self._makeOne('any.user', 'any.apikey', http_broker=broker)
+        conn.fetch_data('journals')
+
+        self.assertFalse('object_pairs_hook' in calls[0])
+
+    def test_interning_survives_pickling(self):
+        import pickle
+        from scieloapi.interning import InternTable
+        conn = self._makeOne('any.user', 'any.apikey', interning=InternTable(maxsize=10))
+        new_conn = pickle.loads(pickle.dumps(conn))
+
+        self.assertEqual(new_conn.intern_table.maxsize, 10)
+
+
+class ClientIdentityMapTests(unittest.TestCase):
+
+    def _makeOne(self, *args, **kwargs):
+        from scieloapi.core import Client
+        return Client(*args, **kwargs)
+
+    def _stub_connector(self, calls):
+        class CountingConnectorStub(doubles.ConnectorStub):
+            version = 'v1'
+
+            def fetch_data(self, endpoint, resource_id=None, **kwargs):
+                calls.append((endpoint, resource_id))
+                return {'resource_uri': '/api/v1/%s/%s/' % (endpoint, resource_id)}
+
+        return CountingConnectorStub
+
+    def test_resources_are_shared(self):
+        calls = []
+        client = self._makeOne('any.user', 'any.apikey', identity_map=True,
+                               connector_dep=self._stub_connector(calls))
+        first = client.get('/api/v1/journals/70/')
+        second = client.get('/api/v1/journals/70/')
+
+        self.assertTrue(first is second)
+        self.assertEqual(calls, [('journals', '70')])
+
+    def test_resources_are_fetched_every_time_by_default(self):
+        calls = []
+        client = self._makeOne('any.user', 'any.apikey',
+                               connector_dep=self._stub_connector(calls))
+        client.get('/api/v1/journals/70/')
+        client.get('/api/v1/journals/70/')
+
+        self.assertEqual(len(calls), 2)
+
+
+class ClientFetchRelationsManyTests(unittest.TestCase):
+
+    def _makeOne(self, calls, fail=()):
+        from scieloapi.core import Client
+
+        class CountingConnectorStub(doubles.ConnectorStub):
+            version = 'v1'
+
+            def fetch_data(self, endpoint, resource_id=None, **kwargs):
+                calls.append((endpoint, resource_id))
+                if resource_id in fail:
+                    raise exceptions.NotFound()
+                return {'title': '%s %s' % (endpoint, resource_id)}
+
+        return Client('any.user', 'any.apikey', connector_dep=CountingConnectorStub)
+
+    def test_distinct_relations_are_fetched_once(self):
+        calls = []
+        client = self._makeOne(calls)
+        datasets = [{'journal': '/api/v1/journals/70/', 'resource_uri': '/api/v1/issues/1/'},
+                    {'journal': '/api/v1/journals/70/', 'resource_uri': '/api/v1/issues/2/'}]
+
+        self.assertEqual(client.fetch_relations_many(datasets), [
+            {'journal': {'title': 'journals 70'}, 'resource_uri': '/api/v1/issues/1/'},
+            {'journal': {'title': 'journals 70'}, 'resource_uri': '/api/v1/issues/2/'},
+        ])
+        self.assertEqual(calls, [('journals', '70')])
+
+    def test_results_match_fetch_relations(self):
+        client = self._makeOne([])
+        dataset = {'journals': ['/api/v1/journals/70/', 'foo', 5],
+                   'other': '/api/v2/journals/71/', 'journal': '/api/v1/journals/71/',
+                   'title': 'bar', 'year': 2014}
+
+        self.assertEqual(client.fetch_relations_many([dataset], only=('journals', 'other')),
+                         [client.fetch_relations(dataset, only=('journals', 'other'))])
+
+    def test_relations_to_unknown_endpoints_are_kept(self):
+        calls = []
+        client = self._makeOne(calls)
+        dataset = {'creator': '/api/v1/users/3/', 'journal': '/api/v1/journals/70/',
+                   'members': ['/api/v1/users/4/', '/api/v1/journals/71/']}
+
+        self.assertEqual(client.fetch_relations_many([dataset]), [{
+            'creator': '/api/v1/users/3/', 'journal': {'title': 'journals 70'},
+            'members': ['/api/v1/users/4/', {'title': 'journals 71'}]}])
+        self.assertEqual(client.fetch_relations_many([dataset]),
+                         [client.fetch_relations(dataset)])
+        self.assertTrue(('users', '3') not in calls)
+
+    def test_errors_are_raised(self):
+        client = self._makeOne([], fail=('70',))
+        self.assertRaises(exceptions.NotFound,
+            lambda: client.fetch_relations_many([{'journal': '/api/v1/journals/70/'}]))
+
+
+class ClientDanglingRelationsTests(unittest.TestCase):
+
+    def _makeOne(self, calls, missing=('404',), **kwargs):
+        from scieloapi.core import Client, Connector
+        from scieloapi.instrumentation import MetricsCollector
+        self.metrics = MetricsCollector()
+        metrics = self.metrics
+
+        class BrokerStub(doubles.PagedBrokerStub):
+            def get(self, api_uri, endpoint=None, resource_id=None, params=None, **kwargs):
+                calls.append((endpoint, resource_id))
+                if resource_id in missing:
+                    raise exceptions.NotFound('%s %s' % (endpoint, resource_id))
+                return {'title': '%s %s' % (endpoint, resource_id)}
+
+        class ConnectorStub(Connector):
+            def __init__(self, *args, **kwargs):
+                super(ConnectorStub, self).__init__(*args, http_broker=BrokerStub(0),
+                                                    instrumentation=[metrics], **kwargs)
+
+            def get_endpoints(self):
+                return {'journals': None}
+
+        client = Client('any.user', 'any.apikey', connector_dep=ConnectorStub, **kwargs)
+        client._time = self.clock = doubles.ClockStub()
+        return client
+
+    def test_resources_not_found_are_not_requested_again(self):
+        calls = []
+        client = self._makeOne(calls)
+        for _ in range(3):
+            self.assertRaises(exceptions.NotFound, lambda: client.get('/api/v1/journals/404/'))
+
+        self.assertEqual(calls, [('journals', '404')])
+        self.assertEqual(self.metrics.counter('cache_hits_total',
+                                              endpoint='journals', method='GET'), 2)
+
+    def test_each_resource_not_found_raises_a_new_exception(self):
+        client = self._makeOne([])
+        errors = []
+        for _ in range(3):
+            try:
+                client.get('/api/v1/journals/404/')
+            except exceptions.NotFound as e:
+                errors.append(e)
+
+        self.assertEqual(len(set(id(e) for e in errors)), 3)
+        self.assertEqual([str(e) for e in errors], ['journals 404'] * 3)
+
+    def test_resources_not_found_are_requested_again_after_the_ttl(self):
+        calls = []
+        client = self._makeOne(calls, not_found_ttl=10)
+        self.assertRaises(exceptions.NotFound, lambda: client.get('/api/v1/journals/404/'))
+        self.clock.now += 10
+        self.assertRaises(exceptions.NotFound, lambda: client.get('/api/v1/journals/404/'))
+
+        self.assertEqual(len(calls), 2)
+
+    def test_negative_caching_can_be_disabled(self):
+        calls = []
+        client = self._makeOne(calls, not_found_ttl=0)
+        self.assertRaises(exceptions.NotFound, lambda: client.get('/api/v1/journals/404/'))
+        self.assertRaises(exceptions.NotFound, lambda: client.get('/api/v1/journals/404/'))
+
+        self.assertEqual(len(calls), 2)
+
+    def test_dangling_relations_raise_by_default(self):
+        client = self._makeOne([])
+        self.assertRaises(exceptions.NotFound,
+            lambda: client.fetch_relations({'journal': '/api/v1/journals/404/'}))
+
+    def test_dangling_relations_kept(self):
+        client = self._makeOne([])
+        data = {'journal': '/api/v1/journals/404/',
+                'journals': ['/api/v1/journals/1/', '/api/v1/journals/404/']}
+
+        self.assertEqual(client.fetch_relations(data, dangling='keep'), {
+            'journal': '/api/v1/journals/404/',
+            'journals': [{'title': 'journals 1'}, '/api/v1/journals/404/']})
+
+    def test_dangling_relations_nulled(self):
+        client = self._makeOne([])
+        data = [{'journal': '/api/v1/journals/404/'}, {'journal': '/api/v1/journals/1/'}]
+
+        self.assertEqual(client.fetch_relations_many(data, dangling='null'),
+                         [{'journal': None}, {'journal': {'title': 'journals 1'}}])
+
+    def test_dangling_relations_are_counted(self):
+        client = self._makeOne([])
+        client.fetch_relations({'journal': '/api/v1/journals/404/'}, dangling='keep')
+        client.fetch_relations_many([{'journal': '/api/v1/journals/404/'}], dangling='keep')
+
+        self.assertEqual(self.metrics.counter('dangling_relations_total',
+                                              endpoint='journals', method='GET'), 2)
+
+    def test_unknown_dangling_strategy(self):
+        client = self._makeOne([])
+        self.assertRaises(ValueError, lambda: client.fetch_relations({}, dangling='ignore'))
+        self.assertRaises(ValueError, lambda: client.fetch_relations_many([], dangling='ignore'))
+
+    def test_invalid_uris_are_rejected_without_requests(self):
+        calls = []
+        client = self._makeOne(calls)
+        for _ in range(2):
+            self.assertRaises(ValueError, lambda: client.get('/api/v2/journals/1/'))
+            self.assertRaises(ValueError, lambda: client.get('/foo/'))
+
+        self.assertEqual(calls, [])
+
+    def test_only_resource_uris_are_kept_parsed(self):
+        client = self._makeOne([])
+        client.fetch_relations({'title': 'foo', 'url': 'http://foo.org/',
+                                'other': '/api/v2/journals/2/',
+                                'journal': '/api/v1/journals/1/'})
+        self.assertRaises(ValueError, lambda: client.get('/foo/'))
+
+        self.assertEqual(sorted(client._resource_paths),
+                         ['/api/v1/journals/1/', '/api/v2/journals/2/'])
+
+
+class ConnectorIterPagesTests(unittest.TestCase):
+
+    def _makeOne(self, *args, **kwargs):
+        from scieloapi.core import Connector
+        return Connector(*args, **kwargs)
+
+    def test_pages_carry_meta(self):
+        from scieloapi.core import ITEMS_PER_REQUEST as ITEMS
+        conn = self._makeOne('any.user', 'any.apikey',
+                             http_broker=doubles.PagedBrokerStub(120, trashed=(3,)))
+        pages = list(conn.iter_pages('journals'))
+
+        self.assertEqual([page.meta['offset'] for page in pages], [0, ITEMS, ITEMS * 2])
+        self.assertEqual([page.meta['limit'] for page in pages], [ITEMS] * 3)
+        self.assertTrue(all(page.meta['total_count'] == 120 for page in pages))
+        self.assertTrue(all(page.meta['elapsed'] >= 0 for page in pages))
+
+    def test_trashed_docs_are_dropped_from_pages(self):
+        conn = self._makeOne('any.user', 'any.apikey',
+                             http_broker=doubles.PagedBrokerStub(120, trashed=(3,)))
+        pages = list(conn.iter_pages('journals'))
+
+        self.assertEqual([len(page) for page in pages], [49, 50, 20])
+        self.assertEqual([doc['id'] for page in pages for doc in page],
+                         [doc['id'] for doc in conn.iter_docs('journals')])
+
+    def test_pages_of_a_shard(self):
+        from scieloapi.sharding import Shard
+        conn = self._makeOne('any.user', 'any.apikey',
+                             http_broker=doubles.PagedBrokerStub(120))
+        pages = list(conn.iter_pages('journals', shard=Shard(1, 2)))
+
+        self.assertEqual([page.meta['offset'] for page in pages], [60, 110])
+        self.assertEqual(sum(len(page) for page in pages), 60)
+
+
+class KeysetBrokerStub(doubles.PagedBrokerStub):
+    """
+    Serves documents ordered by id, honoring the `id__gt` filter.
+    """
+    schema = {'filtering': {'id': ['exact', 'gt']}, 'ordering': ['id']}
+
+    def __init__(self, *args, **kwargs):
+        super(KeysetBrokerStub, self).__init__(*args, **kwargs)
+        self.requests = []
+
+    def get(self, api_uri, endpoint=None, resource_id=None, params=None, **kwargs):
+        if resource_id == 'schema':
+            return self.schema
+
+        self.requests.append(params)
+        ids = [i for i in range(1, self.count + 1) if i > params.get('id__gt', 0)]
+        objects = [{'id': i, 'is_trashed': i in self.trashed}
+                   for i in ids[:params['limit']]]
+        return {'objects': objects,
+                'meta': {'next': 'more' if len(ids) > params['limit'] else None,
+                         'total_count': len(ids)}}
+
+
+class ConnectorKeysetPaginationTests(unittest.TestCase):
+
+    def _makeOne(self, *args, **kwargs):
+        from scieloapi.core import Connector
+        return Connector(*args, **kwargs)
+
+    def test_pages_are_requested_after_the_last_id(self):
+        from scieloapi.core import ITEMS_PER_REQUEST as ITEMS
+        broker = KeysetBrokerStub(120, trashed=(3,))
+        conn = self._makeOne('any.user', 'any.apikey', http_broker=broker,
+                             pagination={'journals': 'keyset'})
+        pages = list(conn.iter_pages('journals'))
+
+        self.assertEqual([doc['id'] for page in pages for doc in page],
+                         [i for i in range(1, 121) if i != 3])
+        self.assertEqual([params.get('id__gt') for params in broker.requests],
+                         [None, ITEMS, ITEMS * 2])
+        self.assertTrue(all('offset' not in params and params['order_by'] == 'id'
+                            for params in broker.requests))
+
+    def test_pages_carry_meta(self):
+        conn = self._makeOne('any.user', 'any.apikey', http_broker=KeysetBrokerStub(120),
+                             pagination={'journals': 'keyset'})
+        pages = list(conn.iter_pages('journals'))
+
+        self.assertEqual([page.meta['offset'] for page in pages], [0, 50, 100])
+        self.assertEqual([page.meta['total_count'] for page in pages], [120] * 3)
+        self.assertEqual([page.meta['last_id'] for page in pages], [50, 100, 120])
+
+    def test_other_endpoints_use_offsets(self):
+        broker = KeysetBrokerStub(10)
+        conn = self._makeOne('any.user', 'any.apikey', http_broker=broker,
+                             pagination={'issues': 'keyset'})
+        list(conn.iter_docs('journals'))
+
+        self.assertEqual(broker.requests[0]['offset'], 0)
+
+    def test_auto_uses_keyset_if_supported_by_the_schema(self):
+        broker = KeysetBrokerStub(10)
+        conn = self._makeOne('any.user', 'any.apikey', http_broker=broker,
+                             pagination={'journals': 'auto'})
+        list(conn.iter_docs('journals'))
+
+        self.assertTrue('id__gt' not in broker.requests[0])
+        self.assertEqual(conn.pagination['journals'], 'keyset')
+
+    def test_auto_uses_offsets_if_not_supported_by_the_schema(self):
+        broker = KeysetBrokerStub(10)
+        broker.schema = {'filtering': {'id': ['exact']}, 'ordering': ['id']}
+        conn = self._makeOne('any.user', 'any.apikey', http_broker=broker,
+                             pagination={'journals': 'auto'})
+        list(conn.iter_docs('journals'))
+
+        self.assertEqual(broker.requests[0]['offset'], 0)
+
+    def test_pagination_strategy(self):
+        conn = self._makeOne('any.user', 'any.apikey', http_broker=KeysetBrokerStub(10),
+                             pagination={'journals': 'auto'})
+
+        self.assertEqual(conn.pagination_strategy('journals'), 'keyset')
+        self.assertEqual(conn.pagination_strategy('issues'), 'offset')
+
+    def test_offset_shards_are_not_supported(self):
+        from scieloapi.sharding import Shard
+        conn = self._makeOne('any.user', 'any.apikey', http_broker=KeysetBrokerStub(10),
+                             pagination={'journals': 'keyset'})
+
+        self.assertRaises(ValueError,
+            lambda: list(conn.iter_docs('journals', shard=Shard(1, 2))))
+
+    def test_unknown_strategy(self):
+        self.assertRaises(ValueError,
+            lambda: self._makeOne('any.user', 'any.apikey', pagination={'journals': 'cursor'}))
+
+    def test_other_orderings_are_not_supported(self):
+        broker = KeysetBrokerStub(10)
+        conn = self._makeOne('any.user', 'any.apikey', http_broker=broker,
+                             pagination={'journals': 'keyset'})
+
+        self.assertRaises(ValueError,
+            lambda: list(conn.iter_docs('journals', order_by='-id')))
+        self.assertEqual(broker.requests, [])
+        self.assertEqual(len(list(conn.iter_docs('journals', order_by='id'))), 10)
+
+    def test_offset_pagination_can_be_forced(self):
+        broker = KeysetBrokerStub(10)
+        conn = self._makeOne('any.user', 'any.apikey', http_broker=broker,
+                             pagination={'journals': 'keyset'})
+        list(conn.iter_docs('journals', pagination='offset'))
+
+        self.assertEqual(broker.requests[0]['offset'], 0)
+
+
+class TrashFilteringBrokerStub(doubles.PagedBrokerStub):
+    """
+    Honors the `is_trashed` filter, if its schema allows.
+    """
+    schema = {'filtering': {'is_trashed': ['exact']}}
+
+    def __init__(self, *args, **kwargs):
+        super(TrashFilteringBrokerStub, self).__init__(*args, **kwargs)
+        self.requests = []
+
+    def get(self, api_uri, endpoint=None, resource_id=None, params=None, **kwargs):
+        if resource_id == 'schema':
+            return self.schema
+
+        self.requests.append(params)
+        page = super(TrashFilteringBrokerStub, self).get(api_uri, endpoint, params=params)
+        if params.get('is_trashed') == 'false':
+            page['objects'] = [obj for obj in page['objects'] if not obj['is_trashed']]
+        return page
+
+
+class ConnectorTrashFilteringTests(unittest.TestCase):
+
+    def _makeOne(self, *args, **kwargs):
+        from scieloapi.core import Connector
+        return Connector(*args, **kwargs)
+
+    def test_trashed_docs_are_dropped_client_side_by_default(self):
+        broker = TrashFilteringBrokerStub(60, trashed=(3, 55))
+        conn = self._makeOne('any.user', 'any.apikey', http_broker=broker)
+        pages = list(conn.iter_pages('journals'))
+
+        self.assertTrue(all('is_trashed' not in params for params in broker.requests))
+        self.assertEqual([page.meta['dropped'] for page in pages], [1, 1])
+        self.assertEqual(sum(len(page) for page in pages), 58)
+
+    def test_trashed_docs_are_filtered_server_side(self):
+        broker = TrashFilteringBrokerStub(60, trashed=(3, 55))
+        conn = self._makeOne('any.user', 'any.apikey', http_broker=broker,
+                             trash_filtering='server')
+        pages = list(conn.iter_pages('journals'))
+
+        self.assertTrue(all(params['is_trashed'] == 'false' for params in broker.requests))
+        self.assertEqual([page.meta['dropped'] for page in pages], [0, 0])
+        self.assertEqual(sum(len(page) for page in pages), 58)
+
+    def test_auto_filters_server_side_if_supported_by_the_schema(self):
+        broker = TrashFilteringBrokerStub(10)
+        conn = self._makeOne('any.user', 'any.apikey', http_broker=broker,
+                             trash_filtering='auto')
+        list(conn.iter_docs('journals'))
+        self.assertEqual(broker.requests[0]['is_trashed'], 'false')
+
+    def test_auto_filters_client_side_if_not_supported_by_the_schema(self):
+        broker = TrashFilteringBrokerStub(10)
+        broker.schema = {'filtering': {}}
+        conn = self._makeOne('any.user', 'any.apikey', http_broker=broker,
+                             trash_filtering='auto')
+        list(conn.iter_docs('journals'))
+        self.assertTrue('is_trashed' not in broker.requests[0])
+
+    def test_include_trashed(self):
+        broker = TrashFilteringBrokerStub(10, trashed=(3,))
+        conn = self._makeOne('any.user', 'any.apikey', http_broker=broker,
+                             trash_filtering='server')
+        docs = list(conn.iter_docs('journals', include_trashed=True))
+
+        self.assertEqual(len(docs), 10)
+        self.assertTrue('is_trashed' not in broker.requests[0])
+
+    def test_dropped_docs_are_reported_to_instrumentation(self):
+        from scieloapi.instrumentation import MetricsCollector
+        metrics = MetricsCollector()
+        conn = self._makeOne('any.user', 'any.apikey',
+                             http_broker=TrashFilteringBrokerStub(60, trashed=(3, 55, 56)),
+                             instrumentation=[metrics])
+        list(conn.iter_docs('journals'))
+
+        self.assertEqual(metrics.counter('dropped_objects_total',
+                                         endpoint='journals', method='GET'), 3)
+
+    def test_unknown_strategy(self):
+        self.assertRaises(ValueError,
+            lambda: self._makeOne('any.user', 'any.apikey', trash_filtering='nowhere'))
+
+
+class OverloadedBrokerStub(doubles.PagedBrokerStub):
+    """
+    Answers 503 to the first `overloaded` GET requests.
+    """
+    def __init__(self, count, overloaded=0):
+        super(OverloadedBrokerStub, self).__init__(count)
+        self.overloaded = overloaded
+
+    def get(self, *args, **kwargs):
+        if self.overloaded:
+            self.overloaded -= 1
+            raise exceptions.ServiceUnavailable()
+        return super(OverloadedBrokerStub, self).get(*args, **kwargs)
+
+
+class EndpointSchemaTests(unittest.TestCase):
+
+    def test_schemas_are_shared_with_the_connector(self):
+        from scieloapi.core import Connector, Endpoint
+        schemas = []
+
+        class SchemaBrokerStub(TrashFilteringBrokerStub):
+            def get(self, api_uri, endpoint=None, resource_id=None, params=None, **kwargs):
+                if resource_id == 'schema':
+                    schemas.append(endpoint)
+                return super(SchemaBrokerStub, self).get(api_uri, endpoint, resource_id,
+                                                         params, **kwargs)
+
+        conn = Connector('any.user', 'any.apikey', http_broker=SchemaBrokerStub(10),
+                         trash_filtering='auto')
+        endpoint = Endpoint('journals', conn)
+        list(endpoint.all())
+        other = Endpoint('journals', conn)
+
+        self.assertTrue(endpoint.schema() is other.schema())
+        self.assertEqual(schemas, ['journals'])
+
+
+class ConnectorConcurrencyTests(unittest.TestCase):
+
+    def _makeOne(self, broker, **kwargs):
+        from scieloapi.core import Connector
+        from scieloapi.concurrency import AIMDController
+        from scieloapi.instrumentation import MetricsCollector
+
+        self.metrics = MetricsCollector()
+        self.controller = AIMDController(initial=8, instrumentation=[self.metrics])
+        conn = Connector('any.user', 'any.apikey', http_broker=broker,
+                         concurrency=self.controller, **kwargs)
+        conn._time = doubles.TimeStub()
+        return conn
+
+    def test_overloads_cut_the_limit(self):
+        conn = self._makeOne(OverloadedBrokerStub(10, overloaded=1))
+        self.assertEqual(len(list(conn.iter_docs('journals'))), 10)
+
+        self.assertEqual(self.controller.limit, 4)
+        self.assertEqual(self.controller.in_flight, 0)
+        self.assertEqual(self.metrics.gauge('concurrency_limit', controller='default'), 4)
+
+    def test_healthy_requests_raise_the_limit(self):
+        conn = self._makeOne(OverloadedBrokerStub(1000))
+        self.assertEqual(len(list(conn.iter_docs('journals'))), 1000)
+        self.assertTrue(self.controller.limit > 8)
+
+    def test_posts_are_limited(self):
+        from scieloapi.core import Endpoint
+        conn = self._makeOne(OverloadedBrokerStub(0))
+        self.assertEqual(Endpoint('journals', conn).post_many([{}] * 20), ['1'] * 20)
+        self.assertEqual(self.controller.limit, 10)
+
+    def test_pools_default_to_the_max_limit(self):
+        from scieloapi.core import Client
+        from scieloapi.concurrency import AIMDController
+
+        class ConnectorStub(doubles.ConnectorStub):
+            def __init__(self, *args, **kwargs):
+                self.concurrency = kwargs.get('concurrency')
+
+        client = Client('any.user', 'any.apikey', connector_dep=ConnectorStub,
+                        concurrency=AIMDController(maximum=16))
+        self.assertEqual(client.harvest(['journals']).workers, 16)
+        self.assertEqual(client.harvest(['journals'], workers=2).workers, 2)
@@ -0,0 +1,256 @@
+# coding: utf-8
+import io
+import os
+import sys
+import csv
+import json
+import gzip
+import shutil
+import tempfile
+import unittest
+
+from scieloapi import exporters, records
+from scieloapi.core import Page
+from . import doubles
+
+
+def read_csv(data):
+    if sys.version_info[0] == 2:
+        return [[cell.decode('utf-8') for cell in row] for row in csv.reader(io.BytesIO(data))]
+    return list(csv.reader(io.StringIO(data.decode('utf-8'))))
+
+
+def has_lzma():
+    try:
+        exporters._lzma()
+    except ValueError:
+        return False
+    return True
+
+
+class FlattenTests(unittest.TestCase):
+
+    def test_nested_objects_are_flattened(self):
+        self.assertEqual(exporters.flatten({'a': {'b': 1, 'c': {'d': [1]}}, 'e': 2, 'f': {}}),
+                         {'a.b': 1, 'a.c.d': [1], 'e': 2, 'f': {}})
+
+    def test_separator(self):
+        self.assertEqual(exporters.flatten({'a': {'b': 1}}, separator='__'), {'a__b': 1})
+
+
+class ExporterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _path(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def _read(self, name, opener=open):
+        with opener(self._path(name), 'rb') as output:
+            return output.read()
+
+    def _read_jsonl(self, name, opener=open):
+        return [json.loads(line) for line in self._read(name, opener).decode('utf-8').splitlines()]
+
+
+class JSONLinesExporterTests(ExporterTestCase):
+
+    def test_documents_and_pages_are_exported(self):
+        docs = [{'id': i} for i in range(5)]
+        with exporters.JSONLinesExporter(self._path('out.jsonl')) as exporter:
+            exporter.export([docs[0], Page(docs[1:3], {}), docs[3]])
+            exporter.write(docs[4])
+
+        self.assertEqual(self._read_jsonl('out.jsonl'), docs)
+
+    def test_records_are_exported(self):
+        doc = {'id': 1, 'title': u'São Paulo', 'extra': [1, 2]}
+        record = records.make_record_type('journals', ['id', 'title']).from_dict(doc)
+        lazy = records.LazyRecord(u'{"title": "S\\u00e3o Paulo", "id": 1, "extra": [1, 2]}')
+        with exporters.JSONLinesExporter(self._path('out.jsonl')) as exporter:
+            exporter.export([record, Page([lazy], {})])
+
+        self.assertEqual(self._read_jsonl('out.jsonl'), [doc, doc])
+
+    def test_documents_are_written_in_batches(self):
+        exporter = exporters.JSONLinesExporter(self._path('out.jsonl'), batch_size=3)
+        exporter.write_many({'id': i} for i in range(4))
+
+        self.assertEqual(len(self._read_jsonl('out.jsonl')), 3)
+        exporter.close()
+        self.assertEqual(len(self._read_jsonl('out.jsonl')), 4)
+
+    def test_iterators_are_consumed_lazily(self):
+        exporter = exporters.JSONLinesExporter(self._path('out.jsonl'), batch_size=10)
+        consumed = []
+
+        def docs():
+            for i in range(100):
+                # at most a batch is buffered.
+                self.assertTrue(len(exporter._buffer) < 10)
+                consumed.append(i)
+                yield {'id': i}
+
+        exporter.export(docs())
+        exporter.close()
+        self.assertEqual(len(consumed), 100)
+
+    def test_gzip(self):
+        with exporters.JSONLinesExporter(self._path('out.jsonl.gz'), compression='gzip') as exporter:
+            exporter.export([{'title': u'São Paulo'}])
+
+        self.assertEqual(self._read_jsonl('out.jsonl.gz', gzip.open), [{'title': u'São Paulo'}])
+
+    @unittest.skipIf(not has_lzma(), 'lzma is not available')
+    def test_xz(self):
+        with exporters.JSONLinesExporter(self._path('out.jsonl.xz'), compression='xz') as exporter:
+            exporter.export([{'id': 1}])
+
+        self.assertEqual(self._read_jsonl('out.jsonl.xz', exporters._lzma().open), [{'id': 1}])
+
+    def test_unknown_compression(self):
+        self.assertRaises(ValueError,
+            lambda: exporters.JSONLinesExporter(self._path('out.jsonl'), compression='zip'))
+
+    def test_rotation_by_records(self):
+        with exporters.JSONLinesExporter(self._path('out.jsonl.gz'), compression='gzip',
+                                         max_records=4, batch_size=3) as exporter:
+            exporter.export({'id': i} for i in range(10))
+
+        self.assertEqual(exporter.stats['files'], [self._path('out-%05d.jsonl.gz' % i)
+                                                   for i in range(3)])
+        self.assertEqual([[doc['id'] for doc in self._read_jsonl('out-%05d.jsonl.gz' % i, gzip.open)]
+                          for i in range(3)],
+                         [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]])
+
+    def test_rotation_by_bytes(self):
+        with exporters.JSONLinesExporter(self._path('out.jsonl'), max_bytes=20,
+                                         batch_size=2) as exporter:
+            exporter.export({'id': i} for i in range(6))
+
+        # each document is 9 bytes long.
+        self.assertEqual(len(exporter.files), 2)
+        self.assertEqual(len(self._read_jsonl('out-00000.jsonl')), 4)
+
+    def test_append(self):
+        with exporters.JSONLinesExporter(self._path('out.jsonl')) as exporter:
+            exporter.export([{'id': 1}])
+        with exporters.JSONLinesExporter(self._path('out.jsonl'), append=True) as exporter:
+            exporter.export([{'id': 2}])
+
+        self.assertEqual(self._read_jsonl('out.jsonl'), [{'id': 1}, {'id': 2}])
+
+    def test_append_continues_at_the_last_rotated_file(self):
+        with exporters.JSONLinesExporter(self._path('out.jsonl'), max_records=2) as exporter:
+            exporter.export({'id': i} for i in range(3))
+        with exporters.JSONLinesExporter(self._path('out.jsonl'), max_records=2,
+                                         append=True) as exporter:
+            exporter.export({'id': i} for i in range(3, 6))
+
+        self.assertEqual([len(self._read_jsonl('out-%05d.jsonl' % i)) for i in range(3)],
+                         [2, 3, 1])
+
+    def test_stats(self):
+        exporter = exporters.JSONLinesExporter(self._path('out.jsonl'))
+        exporter._time = clock = doubles.ClockStub(10.0)
+        exporter.export([{'id': 1}, {'id': 2}])
+        clock.now = 12.0
+        exporter.close()
+
+        self.assertEqual(exporter.stats, {
+            'records': 2, 'bytes': 18, 'files': [self._path('out.jsonl')], 'elapsed': 2.0,
+            'records_per_second': 1.0, 'bytes_per_second': 9.0})
+
+    def test_empty_exports_produce_a_file(self):
+        exporters.JSONLinesExporter(self._path('out.jsonl')).close()
+        self.assertEqual(self._read('out.jsonl'), b'')
+
+
+class CSVExporterTests(ExporterTestCase):
+
+    def test_nested_fields_are_flattened(self):
+        docs = [{'id': 1, 'journal': {'title': u'Revista São Paulo', 'issns': ['1234-5678']},
+                 'is_trashed': False, 'volume': None}]
+        with exporters.CSVExporter(self._path('out.csv')) as exporter:
+            exporter.export(docs)
+
+        self.assertEqual(read_csv(self._read('out.csv')), [
+            [u'id', u'is_trashed', u'journal.issns', u'journal.title', u'volume', u'_extra'],
+            [u'1', u'false', u'["1234-5678"]', u'Revista São Paulo', u'', u''],
+        ])
+
+    def test_records_are_exported(self):
+        record = records.make_record_type('journals', ['id']).from_dict({'id': 1, 'a': {'b': 2}})
+        lazy = records.LazyRecord(u'{"id": 2, "a": {"b": 3}}')
+        with exporters.CSVExporter(self._path('out.csv')) as exporter:
+            exporter.export([record, lazy])
+
+        self.assertEqual(read_csv(self._read('out.csv')), [['a.b', 'id', '_extra'], ['2', '1', ''], ['3', '2', '']])
+
+    def test_fields(self):
+        with exporters.CSVExporter(self._path('out.csv'), fields=['title', 'id']) as exporter:
+            exporter.export([{'id': 1, 'title': 'foo', 'other': 'bar'}, {'id': 2}])
+
+        self.assertEqual(read_csv(self._read('out.csv')),
+                         [['title', 'id', '_extra'], ['foo', '1', '{"other": "bar"}'],
+                          ['', '2', '']])
+
+    def test_fields_missing_from_the_columns_are_written_at_the_extra_field(self):
+        exporter = exporters.CSVExporter(self._path('out.csv'), batch_size=1)
+        with exporter:
+            exporter.export([{'id': 1}, {'id': 2, 'title': 'foo', 'journal': {'id': 3}},
+                             {'id': 3, 'title': 'bar'}])
+
+        self.assertEqual(exporter.unknown_fields, set(['title', 'journal.id']))
+        self.assertEqual(read_csv(self._read('out.csv')),
+                         [['id', '_extra'], ['1', ''],
+                          ['2', '{"journal.id": 3, "title": "foo"}'],
+                          ['3', '{"title": "bar"}']])
+
+    def test_fields_missing_from_the_columns_are_dropped_without_extra_field(self):
+        exporter = exporters.CSVExporter(self._path('out.csv'), batch_size=1,
+                                         extra_field=None)
+        with exporter:
+            exporter.export([{'id': 1}, {'id': 2, 'title': 'foo'}])
+
+        self.assertEqual(exporter.unknown_fields, set(['title']))
+        self.assertEqual(read_csv(self._read('out.csv')), [['id'], ['1'], ['2']])
+
+    def test_nested_objects_at_columns_are_encoded(self):
+        with exporters.CSVExporter(self._path('out.csv'), fields=['id', 'journal']) as exporter:
+            exporter.export([{'id': 1, 'journal': {'id': 3}}])
+
+        self.assertEqual(exporter.unknown_fields, set())
+        self.assertEqual(read_csv(self._read('out.csv')),
+                         [['id', 'journal', '_extra'], ['1', '{"id": 3}', '']])
+
+    def test_rotated_files_have_headers(self):
+        with exporters.CSVExporter(self._path('out.csv.gz'), compression='gzip',
+                                   max_records=1) as exporter:
+            exporter.export([{'id': 1}, {'id': 2}])
+
+        self.assertEqual(read_csv(self._read('out-00001.csv.gz', gzip.open)), [['id', '_extra'], ['2', '']])
+
+    def test_append_keeps_the_columns(self):
+        with exporters.CSVExporter(self._path('out.csv.gz'), compression='gzip') as exporter:
+            exporter.export([{'id': 1, 'title': 'foo'}])
+        with exporters.CSVExporter(self._path('out.csv.gz'), compression='gzip',
+                                   append=True) as exporter:
+            exporter.export([{'id': 2, 'volume': '3'}])
+
+        self.assertEqual(read_csv(self._read('out.csv.gz', gzip.open)),
+                         [['id', 'title', '_extra'], ['1', 'foo', ''],
+                          ['2', '', '{"volume": "3"}']])
+
+    def test_append_to_files_without_extra_field(self):
+        with exporters.CSVExporter(self._path('out.csv'), extra_field=None) as exporter:
+            exporter.export([{'id': 1}])
+        with exporters.CSVExporter(self._path('out.csv'), append=True) as exporter:
+            exporter.export([{'id': 2, 'volume': '3'}])
+
+        self.assertEqual(exporter.unknown_fields, set(['volume']))
+        self.assertEqual(read_csv(self._read('out.csv')), [['id'], ['1'], ['2']])
@@ -0,0 +1,285 @@
+# coding: utf-8
+import threading
+import unittest
+
+from scieloapi import exceptions
+from scieloapi.harvest import Harvester
+from . import doubles
+
+
+class PagedConnectorStub(object):
+    """
+    Serves `datasets` (a mapping of endpoint names to lists of documents)
+    in pages, as the SciELO Manager API does.
+    """
+    def __init__(self, datasets, total_count=True, pagination=None):
+        self.datasets = datasets
+        self.total_count = total_count
+        self.pagination = pagination or {}
+        self.calls = []
+        self.in_flight = 0
+        self.max_seen_in_flight = 0
+        self._lock = threading.Lock()
+
+    def trash_params(self, endpoint):
+        return {}
+
+    def pagination_strategy(self, endpoint):
+        return self.pagination.get(endpoint, 'offset')
+
+    def fetch_data(self, endpoint, resource_id=None, **kwargs):
+        with self._lock:
+            self.calls.append((endpoint, kwargs))
+            self.in_flight += 1
+            self.max_seen_in_flight = max(self.max_seen_in_flight, self.in_flight)
+
+        try:
+            docs = self.datasets[endpoint]
+            limit = kwargs['limit']
+            if 'offset' in kwargs:
+                offset, total_count = kwargs['offset'], len(docs)
+            else:
+                # keyset pagination, where ids are the positions of the
+                # documents, counting only the remaining ones.
+                offset = kwargs.get('id__gt', -1) + 1
+                total_count = len(docs) - offset
+            meta = {'next': 'more' if offset + limit < len(docs) else None}
+            if self.total_count:
+                meta['total_count'] = total_count
+
+            return {'objects': docs[offset:offset+limit], 'meta': meta}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def make_docs(endpoint, count):
+    return [{'resource_uri': '/api/v1/%s/%s/' % (endpoint, i)} for i in range(count)]
+
+
+class HarvesterTests(unittest.TestCase):
+
+    def _makeOne(self, connector, endpoints, **kwargs):
+        kwargs.setdefault('limit', 2)
+        return Harvester(connector, endpoints, **kwargs)
+
+    def test_all_docs_of_all_endpoints_are_harvested(self):
+        datasets = {'journals': make_docs('journals', 5),
+                    'issues': make_docs('issues', 3)}
+        conn = PagedConnectorStub(datasets)
+
+        res = list(self._makeOne(conn, ['journals', 'issues']))
+
+        self.assertEqual(
+            sorted(res),
+            sorted([('journals', d) for d in datasets['journals']] +
+                   [('issues', d) for d in datasets['issues']]))
+
+    def test_following_meta_next_when_total_count_is_missing(self):
+        datasets = {'journals': make_docs('journals', 5)}
+        conn = PagedConnectorStub(datasets, total_count=False)
+
+        res = [doc for ep, doc in self._makeOne(conn, ['journals'])]
+
+        self.assertEqual(res, datasets['journals'])
+
+    def test_each_page_is_fetched_once(self):
+        datasets = {'journals': make_docs('journals', 5)}
+        conn = PagedConnectorStub(datasets)
+
+        list(self._makeOne(conn, ['journals'], workers=3))
+
+        self.assertEqual(sorted(kw['offset'] for ep, kw in conn.calls), [0, 2, 4])
+
+    def test_trashed_items_are_ignored(self):
+        datasets = {'journals': [{'title': 'foo', 'is_trashed': True},
+                                 {'title': 'bar'}]}
+        conn = PagedConnectorStub(datasets)
+
+        self.assertEqual(list(self._makeOne(conn, ['journals'])),
+                         [('journals', {'title': 'bar'})])
+
+    def test_filters_are_passed_as_query_string_params(self):
+        datasets = {'journals': make_docs('journals', 1),
+                    'issues': make_docs('issues', 1)}
+        conn = PagedConnectorStub(datasets)
+
+        list(self._makeOne(conn, ['journals', 'issues'],
+                           filters={'journals': {'collection': 'saude-publica'}}))
+
+        self.assertEqual(
+            sorted((ep, kw.get('collection')) for ep, kw in conn.calls),
+            [('issues', None), ('journals', 'saude-publica')])
+
+    def test_filters_for_unknown_endpoints_raises_ValueError(self):
+        conn = PagedConnectorStub({})
+        self.assertRaises(ValueError,
+            lambda: self._makeOne(conn, ['journals'], filters={'issues': {}}))
+
+    def test_workers_must_be_positive(self):
+        conn = PagedConnectorStub({})
+        self.assertRaises(ValueError,
+            lambda: self._makeOne(conn, ['journals'], workers=0))
+
+    def test_progress_is_reported_per_page(self):
+        datasets = {'journals': make_docs('journals', 3)}
+        conn = PagedConnectorStub(datasets)
+        reports = []
+
+        list(self._makeOne(conn, ['journals'],
+                           progress=lambda *args: reports.append(args)))
+
+        self.assertEqual(sorted(reports),
+                         [('journals', 2, 3), ('journals', 3, 3)])
+
+    def test_endpoints_are_scheduled_in_round_robin(self):
+        datasets = {'journals': make_docs('journals', 6),
+                    'issues': make_docs('issues', 6)}
+        conn = PagedConnectorStub(datasets)
+
+        list(self._makeOne(conn, ['journals', 'issues'], workers=1))
+
+        self.assertEqual([ep for ep, kw in conn.calls],
+                         ['journals', 'issues'] * 3)
+
+    def test_in_flight_requests_are_capped(self):
+        datasets = {'journals': make_docs('journals', 40),
+                    'issues': make_docs('issues', 40)}
+        conn = PagedConnectorStub(datasets)
+
+        list(self._makeOne(conn, ['journals', 'issues'],
+                           workers=8, max_in_flight=2))
+
+        self.assertTrue(conn.max_seen_in_flight <= 2)
+
+    def test_errors_are_propagated_to_the_consumer(self):
+        conn = PagedConnectorStub({})
+
+        def fetch_data(*args, **kwargs):
+            raise exceptions.NotFound()
+        conn.fetch_data = fetch_data
+
+        self.assertRaises(exceptions.NotFound,
+            lambda: list(self._makeOne(conn, ['journals'])))
+
+    def test_pages_are_produced_with_their_offsets(self):
+        datasets = {'journals': make_docs('journals', 5)}
+        conn = PagedConnectorStub(datasets)
+
+        pages = sorted(self._makeOne(conn, ['journals']).pages())
+
+        self.assertEqual(pages, [('journals', 0, datasets['journals'][0:2]),
+                                 ('journals', 2, datasets['journals'][2:4]),
+                                 ('journals', 4, datasets['journals'][4:5])])
+
+    def test_skipped_pages_are_neither_fetched_nor_produced(self):
+        datasets = {'journals': make_docs('journals', 5)}
+        conn = PagedConnectorStub(datasets)
+
+        res = [doc for ep, doc in self._makeOne(conn, ['journals'], skip={'journals': [0, 2]})]
+
+        self.assertEqual(res, datasets['journals'][4:])
+        # the first page is fetched anyway, to get the total count.
+        self.assertEqual(sorted(kwargs['offset'] for ep, kwargs in conn.calls), [0, 4])
+
+    def test_skipped_pages_without_total_count(self):
+        datasets = {'journals': make_docs('journals', 5)}
+        conn = PagedConnectorStub(datasets, total_count=False)
+
+        res = [doc for ep, doc in self._makeOne(conn, ['journals'], skip={'journals': [2]})]
+
+        self.assertEqual(res, datasets['journals'][0:2] + datasets['journals'][4:])
+
+    def test_keyset_endpoints_are_paged_after_the_last_id(self):
+        datasets = {'journals': [{'id': i} for i in range(5)],
+                    'issues': make_docs('issues', 3)}
+        conn = PagedConnectorStub(datasets, pagination={'journals': 'keyset'})
+        reports = []
+
+        pages = sorted(self._makeOne(conn, ['journals', 'issues'], workers=3,
+                                     progress=lambda *args: reports.append(args)).pages())
+
+        self.assertEqual([page for page in pages if page[0] == 'journals'],
+                         [('journals', 0, datasets['journals'][0:2]),
+                          ('journals', 2, datasets['journals'][2:4]),
+                          ('journals', 4, datasets['journals'][4:5])])
+        self.assertEqual([kw for ep, kw in conn.calls if ep == 'journals'],
+                         [{'limit': 2, 'order_by': 'id'},
+                          {'limit': 2, 'order_by': 'id', 'id__gt': 1},
+                          {'limit': 2, 'order_by': 'id', 'id__gt': 3}])
+        self.assertEqual([report for report in reports if report[0] == 'journals'],
+                         [('journals', 2, 5), ('journals', 4, 5), ('journals', 5, 5)])
+
+    def test_keyset_endpoints_cannot_be_ordered_otherwise(self):
+        conn = PagedConnectorStub({'journals': []}, pagination={'journals': 'keyset'})
+        harvester = self._makeOne(conn, ['journals'],
+                                  filters={'journals': {'order_by': '-id'}})
+
+        self.assertRaises(ValueError, lambda: list(harvester))
+
+
+class ClientHarvestTests(unittest.TestCase):
+
+    def _makeOne(self, *args, **kwargs):
+        from scieloapi.core import Client
+        return Client(*args, **kwargs)
+
+    def test_unknown_endpoints_raises_ValueError(self):
+        client = self._makeOne('any.user', 'any.apikey',
+                               connector_dep=doubles.ConnectorStub)
+        self.assertRaises(ValueError, lambda: client.harvest(['foo']))
+
+    def test_all_endpoints_are_harvested_by_default(self):
+        client = self._makeOne('any.user', 'any.apikey',
+                               connector_dep=doubles.ConnectorStub)
+        self.assertEqual(client.harvest().endpoints, ['journals'])
+
+
+def double_id(doc):
+    return doc['id'] * 2
+
+
+class ProcessHarvesterTests(unittest.TestCase):
+
+    def _makeOne(self, connector, endpoint, **kwargs):
+        from scieloapi.harvest import ProcessHarvester
+        kwargs.setdefault('limit', 3)
+        kwargs.setdefault('processes', 2)
+        return ProcessHarvester(connector, endpoint, **kwargs)
+
+    def _makeConnector(self, broker):
+        from scieloapi.core import Connector
+        return Connector('any.user', 'any.apikey', http_broker=broker)
+
+    def test_documents_are_transformed_in_order(self):
+        conn = self._makeConnector(doubles.PagedBrokerStub(10))
+
+        self.assertEqual(list(self._makeOne(conn, 'journals', transform=double_id)),
+                         [i * 2 for i in range(10)])
+
+    def test_documents_as_completed(self):
+        conn = self._makeConnector(doubles.PagedBrokerStub(10))
+
+        self.assertEqual(
+            sorted(self._makeOne(conn, 'journals', transform=double_id, ordered=False)),
+            [i * 2 for i in range(10)])
+
+    def test_documents_are_not_transformed_by_default(self):
+        conn = self._makeConnector(doubles.PagedBrokerStub(2))
+
+        self.assertEqual([doc['id'] for doc in self._makeOne(conn, 'journals')],
+                         [0, 1])
+
+    def test_trashed_items_are_ignored(self):
+        conn = self._makeConnector(doubles.PagedBrokerStub(5, trashed=(1, 4)))
+
+        self.assertEqual(list(self._makeOne(conn, 'journals', transform=double_id)),
+                         [0, 4, 6])
+
+    def test_endpoint_map(self):
+        from scieloapi.core import Endpoint
+        conn = self._makeConnector(doubles.PagedBrokerStub(60))
+        journals = Endpoint('journals', conn)
+
+        self.assertEqual(list(journals.map(double_id, processes=2)),
+                         [i * 2 for i in range(60)])
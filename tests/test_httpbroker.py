@@ -71,6 +71,15 @@ class CheckHttpStatusTests(unittest.TestCase):
         self.assertRaises(exceptions.ServiceUnavailable,
             lambda: httpbroker.check_http_status(response))
 
+    def test_exceptions_carry_the_status_code(self):
+        response = doubles.RequestsResponseStub()
+        response.status_code = 404
+
+        try:
+            httpbroker.check_http_status(response)
+        except exceptions.APIError as e:
+            self.assertEqual(e.status_code, 404)
+
     def test_200_returns_None(self):
         response = doubles.RequestsResponseStub()
         response.status_code = 200
@@ -237,6 +246,157 @@ class GetFunctionTests(mocker.MockerTestCase):
         )
 
 
+    def test_session_is_used_when_given(self):
+        import requests
+        mock_response = self.mocker.mock(requests.Response)
+        mock_response.json()
+        self.mocker.result({'title': 'foo'})
+        mock_response.status_code
+        self.mocker.result(200)
+
+        mock_session = self.mocker.mock()
+        mock_session.get('http://manager.scielo.org/api/v1/journals/70/',
+                         headers=mocker.ANY,
+                         params=None)
+        self.mocker.result(mock_response)
+
+        self.mocker.replay()
+
+        self.assertEqual(
+            httpbroker.get('http://manager.scielo.org/api/v1/',
+                endpoint='journals', resource_id='70', session=mock_session),
+            {'title': 'foo'}
+        )
+
+
+    def _trace_get(self, headers, raw):
+        import requests
+        mock_response = self.mocker.mock(requests.Response)
+        mock_response.json()
+        self.mocker.result({'title': 'foo'})
+        mock_response.status_code
+        self.mocker.result(200)
+        self.mocker.count(2)
+        mock_response.content
+        self.mocker.result('{"title": "foo"}')
+        self.mocker.count(1, None)
+        mock_response.headers
+        self.mocker.result(headers)
+        mock_response.raw
+        self.mocker.result(raw)
+        self.mocker.count(0, 1)
+
+        mock_requests_get = self.mocker.mock()
+        mock_requests_get('http://manager.scielo.org/api/v1/journals/70/',
+                          headers=mocker.ANY,
+                          params=None,
+                          stream=True)
+        self.mocker.result(mock_response)
+
+        mock_requests = self.mocker.replace('requests')
+        mock_requests.get
+        self.mocker.result(mock_requests_get)
+
+        self.mocker.replay()
+
+        trace = {}
+        httpbroker.get('http://manager.scielo.org/api/v1/',
+            endpoint='journals', resource_id='70', trace=trace)
+        return trace
+
+    def test_trace_is_filled_when_given(self):
+        trace = self._trace_get({'content-length': '16'}, None)
+        self.assertEqual(trace['status'], 200)
+        self.assertEqual(trace['bytes'], 16)
+        self.assertEqual(sorted(trace['timings']), ['decode', 'download', 'ttfb'])
+
+    def test_trace_bytes_are_taken_before_decompression(self):
+        trace = self._trace_get({'content-length': '12',
+                                 'content-encoding': 'gzip'}, None)
+        self.assertEqual(trace['bytes'], 12)
+
+    def test_trace_bytes_are_counted_by_the_raw_stream_if_chunked(self):
+        class RawStream(object):
+            def tell(self):
+                return 14
+
+        trace = self._trace_get({'transfer-encoding': 'chunked'}, RawStream())
+        self.assertEqual(trace['bytes'], 14)
+
+    def test_trace_bytes_fall_back_to_the_decoded_body(self):
+        trace = self._trace_get({'transfer-encoding': 'chunked'}, object())
+        self.assertEqual(trace['bytes'], 16)
+
+    def test_object_pairs_hook_is_passed_to_the_decoder(self):
+        import requests
+        hook = lambda pairs: dict(pairs)
+        mock_response = self.mocker.mock(requests.Response)
+        mock_response.json(object_pairs_hook=hook)
+        self.mocker.result({'title': 'foo'})
+        mock_response.status_code
+        self.mocker.result(200)
+
+        mock_session = self.mocker.mock()
+        mock_session.get('http://manager.scielo.org/api/v1/journals/70/',
+                         headers=mocker.ANY,
+                         params=None)
+        self.mocker.result(mock_response)
+
+        self.mocker.replay()
+
+        self.assertEqual(
+            httpbroker.get('http://manager.scielo.org/api/v1/', endpoint='journals',
+                resource_id='70', session=mock_session, object_pairs_hook=hook),
+            {'title': 'foo'}
+        )
+
+    def test_raw_body_is_not_decoded(self):
+        import requests
+        mock_response = self.mocker.mock(requests.Response)
+        mock_response.status_code
+        self.mocker.result(200)
+        mock_response.content
+        self.mocker.result(b'{"title": "foo"}')
+
+        mock_session = self.mocker.mock()
+        mock_session.get('http://manager.scielo.org/api/v1/journals/70/',
+                         headers=mocker.ANY,
+                         params=None)
+        self.mocker.result(mock_response)
+
+        self.mocker.replay()
+
+        self.assertEqual(
+            httpbroker.get('http://manager.scielo.org/api/v1/',
+                endpoint='journals', resource_id='70', session=mock_session, raw=True),
+            u'{"title": "foo"}'
+        )
+
+
+class NewSessionFunctionTests(unittest.TestCase):
+
+    def test_returns_a_requests_session_per_thread(self):
+        import threading
+        import requests
+        session = httpbroker.new_session()
+        sessions = []
+
+        def use():
+            sessions.append(session._session())
+        thread = threading.Thread(target=use)
+        thread.start()
+        thread.join()
+        use()
+
+        self.assertTrue(all(isinstance(s, requests.Session) for s in sessions))
+        self.assertFalse(sessions[0] is sessions[1])
+        self.assertTrue(session._session() is sessions[1])
+
+    def test_attributes_of_the_session_of_the_thread(self):
+        session = httpbroker.new_session()
+        self.assertEqual(session.get.__self__, session._session())
+
+
 class PostFunctionTests(mocker.MockerTestCase):
 
     def test_user_agent_is_properly_set(self):
@@ -359,6 +519,61 @@ class PostFunctionTests(mocker.MockerTestCase):
         )
 
 
+class PatchFunctionTests(mocker.MockerTestCase):
+
+    def test_response_body_is_returned(self):
+        import requests
+        mock_response = self.mocker.mock(requests.Response)
+        mock_response.status_code
+        self.mocker.result(202)
+        self.mocker.count(1, None)
+        mock_response.content
+        self.mocker.result('{"objects": []}')
+        mock_response.json()
+        self.mocker.result({'objects': []})
+
+        mock_requests_patch = self.mocker.mock()
+        mock_requests_patch(url='http://manager.scielo.org/api/v1/journals/',
+                            headers=mocker.MATCH(lambda x: x['Content-Type'] == 'application/json'),
+                            data='{"objects": []}')
+        self.mocker.result(mock_response)
+
+        mock_requests = self.mocker.replace('requests')
+        mock_requests.patch
+        self.mocker.result(mock_requests_patch)
+
+        self.mocker.replay()
+
+        self.assertEqual(
+            httpbroker.patch('http://manager.scielo.org/api/v1/',
+                endpoint='journals', data={'objects': []}),
+            {'objects': []}
+        )
+
+    def test_no_content_returns_None(self):
+        import requests
+        mock_response = self.mocker.mock(requests.Response)
+        mock_response.status_code
+        self.mocker.result(204)
+        self.mocker.count(1, None)
+
+        mock_requests_patch = self.mocker.mock()
+        mock_requests_patch(url='http://manager.scielo.org/api/v1/journals/',
+                            headers=mocker.ANY,
+                            data='{"objects": []}')
+        self.mocker.result(mock_response)
+
+        mock_requests = self.mocker.replace('requests')
+        mock_requests.patch
+        self.mocker.result(mock_requests_patch)
+
+        self.mocker.replay()
+
+        self.assertIsNone(
+            httpbroker.patch('http://manager.scielo.org/api/v1/',
+                endpoint='journals', data={'objects': []}))
+
+
 class MakeFullUrlFunctionTests(unittest.TestCase):
 
     def test_missing_trailing_slash(self):
@@ -0,0 +1,273 @@
+# coding: utf-8
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from scieloapi import exceptions
+from scieloapi.instrumentation import Instrumentation, MetricsCollector
+from . import doubles
+
+
+class RecordingInstrumentation(Instrumentation):
+
+    def __init__(self):
+        self.events = []
+
+    def before_request(self, event):
+        self.events.append(('before_request', dict(event)))
+
+    def after_response(self, event):
+        self.events.append(('after_response', dict(event)))
+
+    def retry(self, event):
+        self.events.append(('retry', dict(event)))
+
+    def cache_hit(self, event):
+        self.events.append(('cache_hit', dict(event)))
+
+    def error(self, event):
+        self.events.append(('error', dict(event)))
+
+
+class TracingBrokerStub(doubles.PagedBrokerStub):
+    """
+    Fills the trace, as the reference http broker does.
+    """
+    def __init__(self, count, errors=()):
+        super(TracingBrokerStub, self).__init__(count)
+        self.errors = list(errors)
+
+    def get(self, *args, **kwargs):
+        if self.errors:
+            kwargs['trace'].update(status=503, bytes=0)
+            raise self.errors.pop(0)
+
+        kwargs['trace'].update(status=200, bytes=42)
+        return super(TracingBrokerStub, self).get(*args, **kwargs)
+
+
+class ConnectorInstrumentationTests(unittest.TestCase):
+
+    def _makeOne(self, broker, *instrumentation):
+        from scieloapi.core import Connector
+        conn = Connector('any.user', 'any.apikey', http_broker=broker,
+                         instrumentation=instrumentation)
+        conn._time = doubles.TimeStub()
+        return conn
+
+    def test_request_lifecycle_events(self):
+        recorder = RecordingInstrumentation()
+        conn = self._makeOne(TracingBrokerStub(3), recorder)
+
+        conn.fetch_data('journals', limit=2, offset=0)
+
+        self.assertEqual([name for name, event in recorder.events],
+                         ['before_request', 'after_response'])
+        event = recorder.events[1][1]
+        self.assertEqual(event['endpoint'], 'journals')
+        self.assertEqual(event['attempt'], 1)
+        self.assertEqual(event['status'], 200)
+        self.assertEqual(event['bytes'], 42)
+        self.assertEqual(event['objects'], 2)
+        self.assertTrue(event['elapsed'] >= 0)
+
+    def test_retry_events(self):
+        recorder = RecordingInstrumentation()
+        broker = TracingBrokerStub(1, errors=[exceptions.ServiceUnavailable()])
+        conn = self._makeOne(broker, recorder)
+
+        conn.fetch_data('journals')
+
+        self.assertEqual([name for name, event in recorder.events],
+                         ['before_request', 'error', 'retry',
+                          'before_request', 'after_response'])
+        self.assertEqual(recorder.events[1][1]['status'], 503)
+        self.assertEqual(recorder.events[3][1]['attempt'], 2)
+
+    def test_status_comes_from_the_exception_if_not_traced(self):
+        recorder = RecordingInstrumentation()
+        broker = doubles.PagedBrokerStub(1)
+
+        def get(*args, **kwargs):
+            raise exceptions.NotFound()
+        broker.get = get
+
+        conn = self._makeOne(broker, recorder)
+        self.assertRaises(exceptions.NotFound, lambda: conn.fetch_data('journals'))
+        self.assertEqual(recorder.events[-1][1]['status'], 404)
+
+    def test_post_events(self):
+        recorder = RecordingInstrumentation()
+        conn = self._makeOne(TracingBrokerStub(1), recorder)
+
+        conn.post_data('journals', {'title': 'foo'})
+
+        self.assertEqual([(name, event['method']) for name, event in recorder.events],
+                         [('before_request', 'POST'), ('after_response', 'POST')])
+
+    def test_cache_hit_events(self):
+        from scieloapi.core import Connector
+        recorder = RecordingInstrumentation()
+        conn = self._makeOne(TracingBrokerStub(1), recorder)
+
+        with doubles.Patch(Connector, '_cache', {'v1': {}}):
+            conn.get_endpoints()
+
+        self.assertEqual([name for name, event in recorder.events], ['cache_hit'])
+
+    def test_trace_is_not_requested_without_instrumentation(self):
+        conn = self._makeOne(doubles.httpbroker_stub)
+        self.assertEqual(conn.fetch_data('journals'), {})
+
+
+class ConnectorTracingTests(unittest.TestCase):
+
+    def _makeOne(self, broker, **kwargs):
+        from scieloapi.core import Connector
+        conn = Connector('any.user', 'any.apikey', http_broker=broker, **kwargs)
+        conn._time = doubles.TimeStub()
+        return conn
+
+    def test_last_trace_without_instrumentation(self):
+        conn = self._makeOne(TracingBrokerStub(1), tracing=True)
+        conn.fetch_data('journals')
+
+        self.assertEqual(conn.last_trace['status'], 200)
+        self.assertTrue('total' in conn.last_trace['timings'])
+
+    def test_last_trace_is_None_when_tracing_is_disabled(self):
+        conn = self._makeOne(doubles.httpbroker_stub)
+        conn.fetch_data('journals')
+
+        self.assertIsNone(conn.last_trace)
+
+    def test_last_trace_is_per_thread(self):
+        import threading
+        conn = self._makeOne(TracingBrokerStub(1), tracing=True)
+        thread = threading.Thread(target=lambda: conn.fetch_data('journals'))
+        thread.start()
+        thread.join()
+
+        self.assertIsNone(conn.last_trace)
+
+    def test_trace_is_attached_to_exceptions(self):
+        broker = TracingBrokerStub(1, errors=[exceptions.NotFound()])
+        conn = self._makeOne(broker, tracing=True)
+
+        try:
+            conn.fetch_data('journals')
+        except exceptions.NotFound as e:
+            self.assertEqual(e.trace['status'], 503)
+            self.assertTrue('total' in e.trace['timings'])
+        else:
+            self.fail('NotFound not raised')
+
+
+class MetricsCollectorTests(unittest.TestCase):
+
+    def _response_event(self, **kwargs):
+        event = {'method': 'GET', 'endpoint': 'journals', 'status': 200,
+                 'bytes': 100, 'objects': 2, 'elapsed': 0.2}
+        event.update(kwargs)
+        return event
+
+    def test_counters(self):
+        metrics = MetricsCollector()
+        metrics.after_response(self._response_event())
+        metrics.after_response(self._response_event())
+
+        self.assertEqual(metrics.counter('requests_total', endpoint='journals',
+                                         method='GET', status=200), 2)
+        self.assertEqual(metrics.counter('response_bytes_total',
+                                         endpoint='journals', method='GET'), 200)
+        self.assertEqual(metrics.counter('objects_total',
+                                         endpoint='journals', method='GET'), 4)
+
+    def test_errors_and_retries(self):
+        metrics = MetricsCollector()
+        event = self._response_event(status=503, error=exceptions.ServiceUnavailable())
+        metrics.error(event)
+        metrics.retry(event)
+
+        self.assertEqual(metrics.counter('errors_total', endpoint='journals',
+                                         method='GET', error='ServiceUnavailable'), 1)
+        self.assertEqual(metrics.counter('requests_total', endpoint='journals',
+                                         method='GET', status=503), 1)
+        self.assertEqual(metrics.counter('retries_total', endpoint='journals',
+                                         method='GET'), 1)
+
+    def test_latency_histogram(self):
+        metrics = MetricsCollector(buckets=(0.1, 1.0))
+        metrics.after_response(self._response_event(elapsed=0.05))
+        metrics.after_response(self._response_event(elapsed=0.5))
+        metrics.after_response(self._response_event(elapsed=5))
+
+        histogram = metrics.to_dict()['histograms']['request_duration_seconds'][0]
+        self.assertEqual(histogram['buckets'], [[0.1, 1], [1.0, 2]])
+        self.assertEqual(histogram['count'], 3)
+        self.assertAlmostEqual(histogram['sum'], 5.55)
+
+    def test_phase_histograms(self):
+        metrics = MetricsCollector()
+        metrics.after_response(self._response_event(
+            timings={'ttfb': 0.1, 'download': 0.2, 'decode': 0.01, 'total': 0.31}))
+
+        phases = sorted(h['labels']['phase'] for h in
+                        metrics.to_dict()['histograms']['request_phase_seconds'])
+        self.assertEqual(phases, ['decode', 'download', 'ttfb'])
+
+    def test_prometheus_format(self):
+        metrics = MetricsCollector(buckets=(0.1, 1.0))
+        metrics.after_response(self._response_event(elapsed=0.5))
+
+        lines = metrics.to_prometheus().splitlines()
+        self.assertTrue('# TYPE scieloapi_requests_total counter' in lines)
+        self.assertTrue('scieloapi_requests_total{endpoint="journals",method="GET",status="200"} 1' in lines)
+        self.assertTrue('scieloapi_request_duration_seconds_bucket{endpoint="journals",method="GET",le="0.1"} 0' in lines)
+        self.assertTrue('scieloapi_request_duration_seconds_bucket{endpoint="journals",method="GET",le="+Inf"} 1' in lines)
+        self.assertTrue('scieloapi_request_duration_seconds_count{endpoint="journals",method="GET"} 1' in lines)
+
+    def test_unknown_status_is_left_out(self):
+        metrics = MetricsCollector()
+        metrics.after_response(self._response_event())
+        event = self._response_event()
+        del event['status']
+        metrics.after_response(event)
+
+        self.assertEqual(metrics.counter('requests_total', endpoint='journals',
+                                         method='GET'), 1)
+        lines = metrics.to_prometheus().splitlines()
+        self.assertTrue('scieloapi_requests_total{endpoint="journals",method="GET"} 1' in lines)
+        self.assertTrue('scieloapi_requests_total{endpoint="journals",method="GET",status="200"} 1' in lines)
+        series = json.loads(metrics.to_json())['counters']['requests_total']
+        self.assertEqual([s['labels'].get('status') for s in series], [None, 200])
+
+    def test_concurrency_limit_gauge(self):
+        metrics = MetricsCollector()
+        self.assertEqual(metrics.gauge('concurrency_limit', controller='default'), None)
+        metrics.concurrency_limit({'controller': 'default', 'limit': 4, 'previous': 8,
+                                   'in_flight': 6, 'reason': 'decrease'})
+
+        self.assertEqual(metrics.gauge('concurrency_limit', controller='default'), 4)
+        lines = metrics.to_prometheus().splitlines()
+        self.assertTrue('# TYPE scieloapi_concurrency_limit gauge' in lines)
+        self.assertTrue('scieloapi_concurrency_limit{controller="default"} 4' in lines)
+
+    def test_dump(self):
+        metrics = MetricsCollector()
+        metrics.after_response(self._response_event())
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'metrics.json')
+            metrics.dump(path, format='json')
+            with open(path) as f:
+                self.assertEqual(json.load(f), json.loads(metrics.to_json()))
+            self.assertEqual(os.listdir(tmpdir), ['metrics.json'])
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_dump_unknown_format_raises_ValueError(self):
+        self.assertRaises(ValueError,
+            lambda: MetricsCollector().dump('/tmp/foo', format='xml'))
@@ -0,0 +1,54 @@
+# coding: utf-8
+import json
+import pickle
+import unittest
+
+from scieloapi.interning import InternTable
+
+
+class InternTableTests(unittest.TestCase):
+
+    def test_equal_strings_are_shared(self):
+        table = InternTable()
+        first = table.intern(u''.join([u'/api/v1/', u'collections/1/']))
+        second = table.intern(u''.join([u'/api/v1/collections/', u'1/']))
+
+        self.assertTrue(first is second)
+
+    def test_long_strings_are_not_interned(self):
+        table = InternTable(max_length=4)
+        table.intern(u'abcde')
+        self.assertEqual(table.size, 0)
+
+    def test_non_strings_are_returned_as_is(self):
+        table = InternTable()
+        self.assertEqual(table.intern(10), 10)
+        self.assertEqual(table.intern(None), None)
+        self.assertEqual(table.size, 0)
+
+    def test_table_is_bounded(self):
+        table = InternTable(maxsize=2)
+        for value in (u'a', u'b', u'c'):
+            table.intern(value)
+
+        self.assertEqual(table.size, 2)
+        self.assertEqual(table.intern(u'c'), u'c')
+
+    def test_decoded_keys_and_values_are_interned(self):
+        table = InternTable()
+        docs = json.loads(json.dumps([
+            {'collection': 'brasil', 'sections': ['/api/v1/sections/1/']},
+            {'collection': 'brasil', 'sections': ['/api/v1/sections/1/']},
+        ]), object_pairs_hook=table)
+
+        self.assertTrue(docs[0]['collection'] is docs[1]['collection'])
+        self.assertTrue(docs[0]['sections'][0] is docs[1]['sections'][0])
+        self.assertTrue(list(docs[0].keys())[0] is list(docs[1].keys())[0])
+
+    def test_pickling_keeps_the_configuration_only(self):
+        table = InternTable(maxsize=10, max_length=5)
+        table.intern(u'foo')
+        new_table = pickle.loads(pickle.dumps(table))
+
+        self.assertEqual((new_table.maxsize, new_table.max_length), (10, 5))
+        self.assertEqual(new_table.size, 0)
@@ -0,0 +1,32 @@
+import os
+import sys
+import subprocess
+import unittest
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(code):
+    """
+    Runs `code` in a fresh interpreter, from the project root.
+    """
+    return subprocess.call([sys.executable, '-c', code], cwd=PROJECT_ROOT)
+
+
+class ImportTimeTests(unittest.TestCase):
+
+    def test_requests_is_not_imported_at_import_time(self):
+        self.assertEqual(
+            run_python("import sys, scieloapi; sys.exit('requests' in sys.modules)"),
+            0)
+
+    def test_pkg_resources_is_not_imported_at_import_time(self):
+        self.assertEqual(
+            run_python("import sys, scieloapi; sys.exit('pkg_resources' in sys.modules)"),
+            0)
+
+    def test_user_agent_carries_the_version(self):
+        import scieloapi
+        self.assertEqual(scieloapi.__user_agent__,
+                         'scieloapi/%s' % scieloapi.__version__)
@@ -0,0 +1,302 @@
+# coding: utf-8
+import unittest
+
+from scieloapi.core import Connector, Endpoint, ITEMS_PER_REQUEST as ITEMS
+from scieloapi.query import QuerySet
+from scieloapi import records
+from . import doubles
+
+
+class RecordingBrokerStub(doubles.PagedBrokerStub):
+    """
+    Records the params of each request.
+    """
+    def __init__(self, *args, **kwargs):
+        super(RecordingBrokerStub, self).__init__(*args, **kwargs)
+        self.requests = []
+
+    def get(self, api_uri, endpoint=None, resource_id=None, params=None, **kwargs):
+        self.requests.append(params)
+        return super(RecordingBrokerStub, self).get(api_uri, endpoint, resource_id,
+                                                    params, **kwargs)
+
+
+class QuerySetTests(unittest.TestCase):
+
+    def _makeOne(self, count=1000, trashed=(), **kwargs):
+        self.broker = RecordingBrokerStub(count, trashed=trashed)
+        conn = Connector('any.user', 'any.apikey', http_broker=self.broker, **kwargs)
+        return Endpoint('journals', conn).all()
+
+    def test_no_requests_until_iterated(self):
+        query = self._makeOne().filter(collection='brasil').order_by('id')[10:20]
+        self.assertEqual(self.broker.requests, [])
+
+    def test_slices_fetch_only_the_covering_pages(self):
+        docs = list(self._makeOne()[120:230])
+
+        self.assertEqual([doc['id'] for doc in docs], list(range(120, 230)))
+        self.assertEqual([(params['offset'], params['limit']) for params in self.broker.requests],
+                         [(120, ITEMS), (170, ITEMS), (220, 10)])
+
+    def test_slices_are_relative(self):
+        docs = list(self._makeOne()[100:200][10:20])
+        self.assertEqual([doc['id'] for doc in docs], list(range(110, 120)))
+
+    def test_slices_are_bounded_by_the_outer_slice(self):
+        docs = list(self._makeOne()[100:110][5:50])
+        self.assertEqual([doc['id'] for doc in docs], list(range(105, 110)))
+
+    def test_empty_slices_dispatch_no_requests(self):
+        self.assertEqual(list(self._makeOne()[10:10]), [])
+        self.assertEqual(self.broker.requests, [])
+
+    def test_index(self):
+        self.assertEqual(self._makeOne()[42]['id'], 42)
+        self.assertEqual(self.broker.requests[0]['limit'], 1)
+
+    def test_index_out_of_range(self):
+        query = self._makeOne(count=10)
+        self.assertRaises(IndexError, lambda: query[10])
+
+    def test_negative_indices_and_steps_are_not_supported(self):
+        query = self._makeOne()
+        self.assertRaises(ValueError, lambda: query[-1])
+        self.assertRaises(ValueError, lambda: query[0:10:2])
+
+    def test_count_dispatches_a_single_request(self):
+        self.assertEqual(self._makeOne(count=1000).count(), 1000)
+        self.assertEqual(self.broker.requests, [{'limit': 1, 'offset': 0}])
+
+    def test_count_of_chained_filters_including_trashed(self):
+        query = self._makeOne(trash_filtering='server').filter(collection='brasil',
+                                                              include_trashed=True)
+        query.count()
+
+        self.assertEqual(self.broker.requests,
+                         [{'collection': 'brasil', 'limit': 1, 'offset': 0}])
+
+    def test_count_of_chained_filters_excluding_trashed(self):
+        self._makeOne(trash_filtering='server').filter(collection='brasil').count()
+
+        self.assertEqual(self.broker.requests,
+                         [{'collection': 'brasil', 'limit': 1, 'offset': 0,
+                           'is_trashed': 'false'}])
+
+    def test_count_of_a_slice(self):
+        query = self._makeOne(count=1000)
+        self.assertEqual(query[990:1200].count(), 10)
+        self.assertEqual(query[100:200].count(), 100)
+
+    def test_count_with_server_side_trash_filtering(self):
+        self._makeOne(trash_filtering='server').count()
+        self.assertEqual(self.broker.requests[0]['is_trashed'], 'false')
+
+    def test_first(self):
+        self.assertEqual(self._makeOne(trashed=(0,)).first()['id'], 1)
+        self.assertEqual(len(self.broker.requests), 1)
+
+    def test_first_of_nothing(self):
+        self.assertEqual(self._makeOne(count=0).first(), None)
+
+    def test_first_requests_a_single_document_if_trash_is_filtered_by_the_server(self):
+        self.assertEqual(self._makeOne(trash_filtering='server').first()['id'], 0)
+        self.assertEqual(self.broker.requests,
+                         [{'limit': 1, 'offset': 0, 'is_trashed': 'false'}])
+
+    def test_first_requests_a_single_document_if_trash_is_included(self):
+        query = self._makeOne(trashed=(0,))
+        self.assertEqual(query._clone(include_trashed=True).first()['id'], 0)
+        self.assertEqual(self.broker.requests, [{'limit': 1, 'offset': 0}])
+
+    def test_first_of_a_slice(self):
+        query = self._makeOne(trash_filtering='server')[10:20]
+        self.assertEqual(query.first()['id'], 10)
+        self.assertEqual(self.broker.requests[0]['limit'], 1)
+
+    def test_exists(self):
+        self.assertTrue(self._makeOne(count=1).exists())
+        self.assertFalse(self._makeOne(count=0).exists())
+
+    def test_exists_counts_if_trash_is_filtered_by_the_server(self):
+        self.assertTrue(self._makeOne(trash_filtering='server').exists())
+        self.assertFalse(self._makeOne(count=0, trash_filtering='server').exists())
+        self.assertEqual(self.broker.requests,
+                         [{'limit': 1, 'offset': 0, 'is_trashed': 'false'}])
+
+    def test_exists_scans_a_page_if_trash_is_filtered_by_the_client(self):
+        self.assertTrue(self._makeOne(trashed=(0,)).exists())
+        self.assertEqual(self.broker.requests[0]['limit'], ITEMS)
+
+    def test_filters_are_chained(self):
+        query = self._makeOne().filter(collection='brasil').filter(is_trashed='false')
+        list(query[:1])
+
+        self.assertEqual(self.broker.requests[0]['collection'], 'brasil')
+        self.assertEqual(self.broker.requests[0]['is_trashed'], 'false')
+
+    def test_special_kwargs_of_chained_filters_are_not_params(self):
+        query = self._makeOne().filter(collection='brasil', include_trashed=True,
+                                       lazy=True, compact=False)
+        list(query[:1])
+
+        self.assertTrue(query.include_trashed and query.lazy)
+        self.assertEqual(self.broker.requests[0],
+                         {'collection': 'brasil', 'offset': 0, 'limit': 1})
+
+    def test_order_by(self):
+        query = self._makeOne()
+        list(query.order_by('-id')[:1])
+        list(query.order_by('title', 'id')[:1])
+
+        self.assertEqual(self.broker.requests[0]['order_by'], '-id')
+        self.assertEqual(self.broker.requests[1]['order_by'], ['title', 'id'])
+
+    def test_sliced_queries_cannot_be_filtered(self):
+        query = self._makeOne()[10:20]
+        self.assertRaises(TypeError, lambda: query.filter(collection='brasil'))
+        self.assertRaises(TypeError, lambda: query.order_by('id'))
+
+    def test_sharded_queries_cannot_be_sliced(self):
+        from scieloapi.sharding import Shard
+        query = QuerySet(Endpoint('journals', None), shard=Shard(0, 2))
+        self.assertRaises(TypeError, lambda: query[10:20])
+
+
+class KeysetRecordingBrokerStub(RecordingBrokerStub):
+    """
+    Serves the documents after `id__gt`, if given, or from `offset`.
+    """
+    def get(self, api_uri, endpoint=None, resource_id=None, params=None, **kwargs):
+        if 'id__gt' in params:
+            self.requests.append(params)
+            params = dict(params, offset=params['id__gt'] + 1)
+            return doubles.PagedBrokerStub.get(self, api_uri, endpoint, resource_id,
+                                               params, **kwargs)
+
+        return super(KeysetRecordingBrokerStub, self).get(api_uri, endpoint, resource_id,
+                                                          params, **kwargs)
+
+
+class QuerySetKeysetPaginationTests(unittest.TestCase):
+
+    def _makeOne(self, count=1000, **kwargs):
+        self.broker = KeysetRecordingBrokerStub(count)
+        conn = Connector('any.user', 'any.apikey', http_broker=self.broker,
+                         pagination={'journals': 'keyset'}, **kwargs)
+        return Endpoint('journals', conn).all()
+
+    def test_slices_are_paged_by_offsets_ordered_by_id(self):
+        docs = list(self._makeOne()[60:62])
+
+        self.assertEqual([doc['id'] for doc in docs], [60, 61])
+        self.assertEqual(self.broker.requests,
+                         [{'offset': 60, 'limit': 2, 'order_by': 'id'}])
+
+    def test_slices_keep_the_ordering(self):
+        list(self._makeOne().order_by('title')[60:62])
+        self.assertEqual(self.broker.requests[0]['order_by'], 'title')
+
+    def test_index(self):
+        self.assertEqual(self._makeOne()[5]['id'], 5)
+        self.assertEqual(self.broker.requests,
+                         [{'offset': 5, 'limit': 1, 'order_by': 'id'}])
+
+    def test_long_index(self):
+        try:
+            index = long(5)
+        except NameError:
+            index = 5
+        self.assertEqual(self._makeOne()[index]['id'], 5)
+
+    def test_first_requests_a_single_document(self):
+        self.assertEqual(self._makeOne(trash_filtering='server').first()['id'], 0)
+        self.assertEqual(self.broker.requests,
+                         [{'offset': 0, 'limit': 1, 'order_by': 'id', 'is_trashed': 'false'}])
+
+    def test_whole_queries_are_paged_by_keyset(self):
+        docs = list(self._makeOne(count=120))
+
+        self.assertEqual([doc['id'] for doc in docs], list(range(120)))
+        self.assertEqual([params.get('id__gt') for params in self.broker.requests],
+                         [None, ITEMS - 1, ITEMS * 2 - 1])
+
+
+class QuerySetRelationsTests(unittest.TestCase):
+
+    def _makeOne(self, count, dangling=()):
+        from scieloapi.core import Client
+        from scieloapi import exceptions
+
+        class IssuesBrokerStub(doubles.PagedBrokerStub):
+            def get(self, api_uri, endpoint=None, resource_id=None, params=None, **kwargs):
+                if resource_id is not None:
+                    if int(resource_id) in dangling:
+                        raise exceptions.NotFound()
+                    return {'title': 'journal %s' % resource_id}
+
+                page = super(IssuesBrokerStub, self).get(api_uri, endpoint, resource_id,
+                                                         params, **kwargs)
+                for obj in page['objects']:
+                    obj['journal'] = '/api/v1/journals/%s/' % (obj['id'] % 3)
+                return page
+
+        broker = IssuesBrokerStub(count)
+
+        class ConnectorStub(Connector):
+            def __init__(self, *args, **kwargs):
+                super(ConnectorStub, self).__init__(*args, http_broker=broker, **kwargs)
+
+            def get_endpoints(self):
+                return {'issues': None, 'journals': None}
+
+        return Client('any.user', 'any.apikey', connector_dep=ConnectorStub).query('issues')
+
+    def test_documents_are_enriched(self):
+        docs = list(self._makeOne(120).all(with_relations=['journal']))
+
+        self.assertEqual([doc['id'] for doc in docs], list(range(120)))
+        self.assertEqual(docs[4]['journal'], {'title': 'journal 1'})
+
+    def test_relations_of_chained_filters(self):
+        docs = list(self._makeOne(120).all().filter(with_relations=['journal'])[:3])
+
+        self.assertEqual([doc['journal'] for doc in docs],
+                         [{'title': 'journal 0'}, {'title': 'journal 1'},
+                          {'title': 'journal 2'}])
+
+    def test_dangling_relations_raise_NotFound_by_default(self):
+        from scieloapi import exceptions
+        query = self._makeOne(120, dangling=(2,)).all(with_relations=['journal'])
+        self.assertRaises(exceptions.NotFound, lambda: list(query))
+
+    def test_dangling_relations_are_kept(self):
+        docs = list(self._makeOne(120, dangling=(2,)).all(with_relations=['journal'],
+                                                          dangling='keep'))
+
+        self.assertEqual([doc['id'] for doc in docs], list(range(120)))
+        self.assertEqual(docs[2]['journal'], '/api/v1/journals/2/')
+        self.assertEqual(docs[100]['journal'], {'title': 'journal 1'})
+
+    def test_dangling_relations_of_chained_filters_are_nulled(self):
+        query = self._makeOne(120, dangling=(2,)).all().filter(with_relations=['journal'],
+                                                              dangling='null')
+        docs = list(query)
+
+        self.assertEqual(len(docs), 120)
+        self.assertEqual([doc['journal'] for doc in docs[:3]],
+                         [{'title': 'journal 0'}, {'title': 'journal 1'}, None])
+        self.assertEqual(docs[119]['journal'], None)
+
+    def test_slices_and_compact_records(self):
+        endpoint = self._makeOne(120)
+        endpoint._record_type = records.make_record_type('IssuesRecord', ['id', 'journal'])
+        docs = list(endpoint.filter(compact=True, with_relations=['journal'])[60:62])
+
+        self.assertEqual([(doc.id, doc.journal) for doc in docs],
+                         [(60, {'title': 'journal 0'}), (61, {'title': 'journal 1'})])
+
+    def test_relations_require_a_client(self):
+        endpoint = Endpoint('issues', Connector('any.user', 'any.apikey',
+                                                http_broker=doubles.PagedBrokerStub(1)))
+        self.assertRaises(ValueError, lambda: list(endpoint.all(with_relations=['journal'])))
@@ -0,0 +1,163 @@
+# coding: utf-8
+import sys
+import json
+import pickle
+import unittest
+
+from scieloapi import records
+
+
+JOURNAL_SCHEMA = {
+    'fields': {
+        'id': {'type': 'integer'},
+        'title': {'type': 'string'},
+        'issns': {'type': 'list'},
+        'resource_uri': {'type': 'string'},
+        'items': {'type': 'string'},  # shadows Record.items
+        'non-identifier': {'type': 'string'},
+    }
+}
+
+
+class RecordTests(unittest.TestCase):
+
+    def setUp(self):
+        self.Journal = records.record_type_from_schema('journals', JOURNAL_SCHEMA)
+        self.data = {'id': 1, 'title': u'Foo', 'issns': ['1234-5678'],
+                     'items': 'shadowed', 'non-identifier': 'x', 'extra': True}
+
+    def test_type_name(self):
+        self.assertEqual(self.Journal.__name__, 'JournalsRecord')
+
+    def test_types_are_cached(self):
+        self.assertTrue(records.record_type_from_schema('journals', JOURNAL_SCHEMA) is self.Journal)
+
+    def test_records_have_no_dict(self):
+        record = self.Journal.from_dict(self.data)
+        self.assertFalse(hasattr(record, '__dict__'))
+
+    def test_attribute_and_mapping_access(self):
+        record = self.Journal.from_dict(self.data)
+
+        self.assertEqual(record.title, u'Foo')
+        self.assertEqual(record['title'], u'Foo')
+        self.assertEqual(record['non-identifier'], 'x')
+        self.assertEqual(record['extra'], True)
+        self.assertEqual(record.get('resource_uri', 'missing'), 'missing')
+        self.assertRaises(KeyError, lambda: record['resource_uri'])
+        self.assertTrue('id' in record)
+        self.assertFalse('resource_uri' in record)
+
+    def test_shadowing_fields_do_not_break_methods(self):
+        record = self.Journal.from_dict(self.data)
+
+        self.assertEqual(record['items'], 'shadowed')
+        self.assertEqual(len(record.items()), len(self.data))
+
+    def test_conversion_to_dict(self):
+        record = self.Journal.from_dict(self.data)
+
+        self.assertEqual(record.to_dict(), self.data)
+        self.assertEqual(sorted(record.keys()), sorted(self.data.keys()))
+        self.assertEqual(len(record), len(self.data))
+        self.assertEqual(dict(record), self.data)
+
+    def test_equality(self):
+        self.assertEqual(self.Journal.from_dict(self.data), self.data)
+        self.assertEqual(self.Journal.from_dict(self.data), self.Journal.from_dict(self.data))
+        self.assertNotEqual(self.Journal.from_dict(self.data), {'id': 2})
+
+    def test_pickling(self):
+        record = self.Journal.from_dict(self.data)
+        unpickled = pickle.loads(pickle.dumps(record, pickle.HIGHEST_PROTOCOL))
+
+        self.assertTrue(type(unpickled) is self.Journal)
+        self.assertEqual(unpickled, record)
+
+    def test_records_are_smaller_than_dicts(self):
+        record = self.Journal.from_dict({'id': 1, 'title': u'Foo', 'issns': []})
+        self.assertTrue(sys.getsizeof(record) < sys.getsizeof({'id': 1, 'title': u'Foo', 'issns': []}))
+
+
+class LazyRecordTests(unittest.TestCase):
+    page = json.dumps({
+        'meta': {'limit': 2, 'next': None, 'total_count': 2},
+        'objects': [
+            {'id': 1, 'title': u'São "Paulo" [1]', 'issns': [['1234-5678', 'print']],
+             'sections': {'a': [1, {'b': '}'}]}, 'is_trashed': False, 'price': -1.5e3},
+            {'id': 2, 'title': None, 'issns': [], 'sections': {}, 'is_trashed': True,
+             'price': 0},
+        ],
+    })
+
+    def test_meta_is_decoded(self):
+        page = records.parse_page(self.page)
+        self.assertEqual(page['meta']['total_count'], 2)
+
+    def test_objects_are_lazy_records(self):
+        objects = records.parse_page(self.page)['objects']
+
+        self.assertEqual(len(objects), 2)
+        self.assertTrue(all(isinstance(obj, records.LazyRecord) for obj in objects))
+        self.assertEqual(objects, json.loads(self.page)['objects'])
+
+    def test_fields_are_decoded_on_access(self):
+        record = records.parse_page(self.page)['objects'][0]
+
+        self.assertEqual(record['title'], u'São "Paulo" [1]')
+        self.assertEqual(record['sections'], {'a': [1, {'b': '}'}]})
+        self.assertEqual(record['price'], -1500.0)
+        self.assertEqual(record.get('missing'), None)
+        self.assertTrue('issns' in record)
+        self.assertEqual(len(record), 6)
+
+    def test_decoded_fields_are_cached(self):
+        record = records.parse_page(self.page)['objects'][0]
+        self.assertTrue(record['sections'] is record['sections'])
+
+    def test_pickling(self):
+        record = records.parse_page(self.page)['objects'][1]
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+
+    def test_invalid_json_raises_ValueError(self):
+        self.assertRaises(ValueError, lambda: records.parse_page('{"objects": [}'))
+
+    def test_keys_of_nested_objects_are_skipped(self):
+        raw = json.dumps({'other_titles': [{'id': 5, 'title': 'Other'}],
+                          'use_license': {'title': 'BY'}, 'id': 1, 'title': 'Journal'},
+                         sort_keys=True)
+        page = '{"objects": [%s]}' % raw
+
+        for record in (records.LazyRecord(raw), records.parse_page(page)['objects'][0]):
+            self.assertEqual(record['title'], 'Journal')
+            self.assertEqual(record['id'], 1)
+            self.assertRaises(KeyError, lambda: record['category'])
+
+    def test_strings_that_look_like_keys(self):
+        raws = ['{"a":":] ",":":-2.5}',
+                '{"a": ":", ":": 1, "b": {":": 2}}',
+                '{"t": "x\\":", "x\\":":3, "x": 4}',
+                '{"a": [":", {"b": 1}], "b": "\\"b\\":", "c": 5}']
+
+        for raw in raws:
+            doc = json.loads(raw)
+            page = '{"objects": [%s]}' % raw
+            for record in (records.LazyRecord(raw), records.parse_page(page)['objects'][0]):
+                # failed lookups must not spoil the following ones.
+                for key in [':', 'missing', 'x', 'b', 'c', 'a', 't', 'x":']:
+                    self.assertEqual(record.get(key, KeyError), doc.get(key, KeyError))
+
+    def test_brackets_and_quotes_in_strings(self):
+        docs = [
+            {'title': u'{"id": 2} [', 'notes': '"}', 'id': 1, 'sections': [{'a': '{'}]},
+            {'path': 'C:\\dir\\', 'nested': {'id': '}\\'}, 'id': 3},
+            {'deep': [[[[[[[{'id': ']'}]]]]]]], 'id': 4, 'after': {'b': None}},
+        ]
+        page = json.dumps({'objects': docs})
+
+        parsed = records.parse_page(page)['objects']
+        self.assertEqual(parsed, docs)
+        for doc, record in zip(docs, parsed):
+            for lazy in (record, records.LazyRecord(record._raw)):
+                for key in doc:
+                    self.assertEqual(lazy[key], doc[key])
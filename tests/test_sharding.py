@@ -0,0 +1,119 @@
+# coding: utf-8
+import unittest
+
+from scieloapi import sharding
+from . import doubles
+
+
+class CollectionBrokerStub(doubles.PagedBrokerStub):
+    """
+    Serves documents with its collection, and honors the `collection` filter.
+    """
+    collections = ('brasil', 'chile', 'cuba', 'mexico', 'saude-publica')
+
+    def get(self, api_uri, endpoint=None, resource_id=None, params=None, **kwargs):
+        docs = [{'id': i, 'collection': self.collections[i % len(self.collections)]}
+                for i in range(self.count)]
+        if 'collection' in params:
+            docs = [d for d in docs if d['collection'] == params['collection']]
+
+        offset, limit = params['offset'], params['limit']
+        return {'objects': docs[offset:offset+limit],
+                'meta': {'next': 'more' if offset + limit < len(docs) else None,
+                         'total_count': len(docs)}}
+
+
+class ShardTests(unittest.TestCase):
+
+    def test_index_must_be_lower_than_count(self):
+        self.assertRaises(ValueError, lambda: sharding.Shard(4, 4))
+
+    def test_count_must_be_positive(self):
+        self.assertRaises(ValueError, lambda: sharding.Shard(0, 0))
+
+    def test_offset_ranges_cover_all_items(self):
+        ranges = [sharding.Shard(i, 3).offset_range(10) for i in range(3)]
+        self.assertEqual([(r.start, r.stop) for r in ranges],
+                         [(0, 3), (3, 6), (6, 10)])
+
+    def test_from_string(self):
+        shard = sharding.Shard.from_string('1/4')
+        self.assertEqual((shard.index, shard.count), (1, 4))
+
+    def test_from_invalid_string_raises_ValueError(self):
+        self.assertRaises(ValueError, lambda: sharding.Shard.from_string('1-4'))
+
+
+class OffsetRangeTests(unittest.TestCase):
+
+    def test_stop_lower_than_start_raises_ValueError(self):
+        self.assertRaises(ValueError, lambda: sharding.OffsetRange(10, 5))
+
+    def test_negative_start_raises_ValueError(self):
+        self.assertRaises(ValueError, lambda: sharding.OffsetRange(-1))
+
+
+class FieldPartitionTests(unittest.TestCase):
+
+    def test_values_are_distributed_in_round_robin(self):
+        part = sharding.FieldPartition('collection', ['c', 'a', 'b', 'd'], 1, 2)
+        self.assertEqual(part.slices(None, 'journals', {}),
+                         [({'collection': 'b'}, 0, None),
+                          ({'collection': 'd'}, 0, None)])
+
+    def test_field_already_used_as_filter_raises_ValueError(self):
+        part = sharding.FieldPartition('collection', ['a'], 0, 1)
+        self.assertRaises(ValueError,
+            lambda: part.slices(None, 'journals', {'collection': 'a'}))
+
+
+class ShardedIterDocsTests(unittest.TestCase):
+
+    def _makeConnector(self, broker):
+        from scieloapi.core import Connector
+        return Connector('any.user', 'any.apikey', http_broker=broker)
+
+    def _ids(self, docs):
+        return [doc['id'] for doc in docs]
+
+    def test_union_of_shards_equals_full_harvest(self):
+        conn = self._makeConnector(doubles.PagedBrokerStub(123))
+
+        full = self._ids(conn.iter_docs('issues'))
+        shards = [self._ids(conn.iter_docs('issues', shard=sharding.Shard(i, 4)))
+                  for i in range(4)]
+
+        self.assertEqual(sum(shards, []), full)
+
+    def test_offset_range(self):
+        conn = self._makeConnector(doubles.PagedBrokerStub(200))
+
+        self.assertEqual(
+            self._ids(conn.iter_docs('issues', shard=sharding.OffsetRange(40, 112))),
+            list(range(40, 112)))
+
+    def test_open_offset_range(self):
+        conn = self._makeConnector(doubles.PagedBrokerStub(60))
+
+        self.assertEqual(
+            self._ids(conn.iter_docs('issues', shard=sharding.OffsetRange(55))),
+            list(range(55, 60)))
+
+    def test_union_of_field_partitions_equals_full_harvest(self):
+        conn = self._makeConnector(CollectionBrokerStub(130))
+        collections = CollectionBrokerStub.collections
+
+        shards = [self._ids(conn.iter_docs('issues',
+                      shard=sharding.FieldPartition('collection', collections, i, 2)))
+                  for i in range(2)]
+
+        self.assertEqual(sorted(sum(shards, [])), list(range(130)))
+
+    def test_endpoint_filter_accepts_shards(self):
+        from scieloapi.core import Endpoint
+        conn = self._makeConnector(doubles.PagedBrokerStub(10))
+        issues = Endpoint('issues', conn)
+
+        self.assertEqual(
+            self._ids(issues.filter(shard=sharding.Shard(1, 2))),
+            list(range(5, 10)))
@@ -0,0 +1,97 @@
+# coding: utf-8
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from scieloapi import snapshot, records, core
+from . import doubles
+
+
+class SnapshotTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'issues.snapshot')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _create(self, docs):
+        count = snapshot.create(self.path, docs)
+        self.snapshot = snapshot.Snapshot(self.path)
+        self.addCleanup(self.snapshot.close)
+        return count
+
+    def test_get_by_id(self):
+        docs = [{'id': i * 3, 'title': u'São Paulo %s' % i} for i in range(100)]
+        self.assertEqual(self._create(reversed(docs)), 100)
+
+        self.assertEqual(self.snapshot.get(42), {'id': 42, 'title': u'São Paulo 14'})
+        self.assertEqual(self.snapshot['297'], docs[-1])
+        self.assertEqual(self.snapshot.get(43), None)
+        self.assertRaises(KeyError, lambda: self.snapshot[-1])
+        self.assertRaises(KeyError, lambda: self.snapshot['foo'])
+        self.assertTrue(0 in self.snapshot)
+        self.assertFalse(1 in self.snapshot)
+
+    def test_iteration_is_ordered_by_id(self):
+        self._create([{'id': 3}, {'id': 1}, {'id': 2}])
+
+        self.assertEqual(list(self.snapshot), [{'id': 1}, {'id': 2}, {'id': 3}])
+        self.assertEqual(list(self.snapshot.ids()), [1, 2, 3])
+        self.assertEqual(len(self.snapshot), 3)
+
+    def test_the_last_duplicate_wins(self):
+        self.assertEqual(self._create([{'id': 1, 'v': 1}, {'id': 2}, {'id': 1, 'v': 2}]), 2)
+        self.assertEqual(self.snapshot[1], {'id': 1, 'v': 2})
+
+    def test_empty_snapshot(self):
+        self._create([])
+        self.assertEqual(len(self.snapshot), 0)
+        self.assertEqual(self.snapshot.get(1), None)
+
+    def test_lazy_records(self):
+        self._create([{'id': 1, 'title': 'foo'}])
+        lazy = snapshot.Snapshot(self.path, lazy=True)
+        self.addCleanup(lazy.close)
+
+        self.assertTrue(isinstance(lazy[1], records.LazyRecord))
+        self.assertEqual(lazy[1]['title'], 'foo')
+
+    def test_pickling(self):
+        self._create([{'id': 1}])
+        unpickled = pickle.loads(pickle.dumps(self.snapshot))
+        self.addCleanup(unpickled.close)
+
+        self.assertEqual(unpickled[1], {'id': 1})
+
+    def test_invalid_ids(self):
+        self.assertRaises(ValueError, lambda: snapshot.create(self.path, [{'id': 'foo'}]))
+        self.assertFalse(os.path.exists(self.path))
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_not_a_snapshot(self):
+        with open(self.path, 'wb') as not_a_snapshot:
+            not_a_snapshot.write(b'{"id": 1}' * 10)
+        self.assertRaises(ValueError, lambda: snapshot.Snapshot(self.path))
+
+    def test_harvest_to_snapshot(self):
+        conn = core.Connector('any.user', 'any.apikey',
+                              http_broker=doubles.PagedBrokerStub(120, trashed=(5,)))
+        self.assertEqual(self._create(conn.iter_docs('issues')), 119)
+        self.assertEqual(self.snapshot[100], {'id': 100, 'is_trashed': False})
+
+    def test_records_are_written(self):
+        record = records.make_record_type('issues', ['id']).from_dict({'id': 1, 'volume': '2'})
+        self._create([record, records.LazyRecord(u'{"id": 2, "volume": "3"}')])
+
+        self.assertEqual(self.snapshot[1], {'id': 1, 'volume': '2'})
+        self.assertEqual(self.snapshot[2], {'id': 2, 'volume': '3'})
+
+    def test_harvest_lazy_records_to_snapshot(self):
+        conn = core.Connector('any.user', 'any.apikey',
+                              http_broker=doubles.PagedBrokerStub(60))
+        self.assertEqual(self._create(conn.iter_docs('issues', lazy=True)), 60)
+        self.assertEqual(self.snapshot[59], {'id': 59, 'is_trashed': False})